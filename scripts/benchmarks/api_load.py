@@ -0,0 +1,573 @@
+"""Load test the API against a SQLite stand-in of the database.
+
+For each size, a synthetic catalogue of recipes is written to a SQLite
+database (a temporary file by default, or `--database sqlite://` in memory
+with `--concurrency 1`), and a mix of requests over all the read and write
+entrypoints is sent to the WSGI app from `--concurrency` threads, after one
+untimed warm-up request per entrypoint (which builds the indexes of the
+workers). The payloads of the
+`api_examples` folder and the requests of `--replay`, a JSONL file of
+`{"method": ..., "path": ..., "json": ...}` objects, are sent first, in order
+and one at a time by default (`--replay-concurrency`), since each request may
+depend on the previous ones (e.g. the PUT of a recipe after its POST).
+
+The throughput, the p50/p95/p99 latency, and the SQL statements per request
+of each entrypoint are saved as JSON, named after the current commit, and can
+be compared with the results of another commit with `--compare`.
+
+Run from the root of the repository with:
+    export PYTHONPATH=${PWD} && poetry run python scripts/benchmarks/api_load.py
+"""
+import argparse
+import glob
+import importlib
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.exceptions import HTTPException
+
+from scripts.benchmarks.suite import environment
+from src.api.sqlite import in_memory
+from src.base.utils import clean_string, name_ids
+
+
+RESULTS_DIR = os.path.join("scripts", "benchmarks", "results")
+EXAMPLES_DIR = "api_examples"
+# Units of measure of the synthetic ingredients
+UNITS = ("g", "kg", "ml", "l", "tsp", "tbsp", "unit")
+# Relative frequency of each kind of request in the mix
+MIX = {
+    "recipe": 20,
+    "recipe_unit": 5,
+    "recipes_page": 5,
+    "ingredients_page": 3,
+    "recipes_by_ingredient": 8,
+    "cookable": 8,
+    "using": 5,
+    "search": 10,
+    "shopping_list": 5,
+    "cost": 5,
+    "convert": 3,
+    "put_recipe": 5,
+}
+
+# Statements executed by the current thread, see `count_statements`
+_local = threading.local()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def count_statements(conn, cursor, statement, parameters, context, executemany):
+    """Count the SQL statements executed by the current thread."""
+    _local.statements = getattr(_local, "statements", 0) + 1
+
+
+def load_app(database_url: str):
+    """Import the App, configured to use a database other than MySQL.
+
+    Args:
+        database_url (str): URI of the database
+
+    Returns:
+        module: The `src.api.app` module
+    """
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    return importlib.import_module("src.api.app")
+
+
+def word(i: int) -> str:
+    """Spell a number with letters only, as the names of the API are cleaned.
+
+    Args:
+        i (int): Number
+
+    Returns:
+        str: Letters, e.g. `b` for 1 and `ba` for 26
+    """
+    letters = ""
+    while True:
+        letters = chr(ord("a") + i % 26) + letters
+        i //= 26
+        if i == 0:
+            return letters
+
+
+class Catalogue:
+    """Synthetic recipes and ingredients, written to the database of the App."""
+
+    def __init__(self, n_recipes: int, n_ingredients: int, seed: int) -> None:
+        """Generate the catalogue.
+
+        Each recipe has 3 to 12 ingredients, some of them much more popular
+        than the others (Zipf distribution).
+
+        Args:
+            n_recipes (int): Number of recipes
+            n_ingredients (int): Number of ingredients
+            seed (int): Seed of the generator
+        """
+        rng = np.random.default_rng(seed)
+        self.recipes = [f"Dish{word(i)}" for i in range(n_recipes)]
+        self.ingredients = [f"Food{word(i)}" for i in range(n_ingredients)]
+        # The recipe entrypoints are called with the cleaned name, and clean
+        # it again to get the ID (see `src/api/bulk.py`)
+        self.paths = [clean_string(name) for name in self.recipes]
+        self.recipe_ids = np.array(name_ids.ids(self.paths), dtype=np.int64)
+        self.ingredient_ids = np.array(name_ids.ids(self.ingredients), dtype=np.int64)
+
+        counts = rng.integers(3, 13, n_recipes)
+        recipes = np.repeat(np.arange(n_recipes), counts)
+        ingredients = (rng.zipf(1.3, len(recipes)) - 1) % n_ingredients
+        pairs = np.unique(recipes * n_ingredients + ingredients)
+        self.link_recipes, self.link_ingredients = np.divmod(pairs, n_ingredients)
+        self.link_units = rng.integers(0, len(UNITS), len(pairs))
+        self.link_quantities = rng.integers(1, 1000, len(pairs)) / 4
+        # Position of the first ingredient of each recipe
+        self.first = np.searchsorted(self.link_recipes, np.arange(n_recipes))
+        self.rng = rng
+
+    def write(self, app, batch_size: int = 20000) -> None:
+        """Replace the content of the database with the catalogue.
+
+        Args:
+            app (module): The `src.api.app` module
+            batch_size (int, optional): Number of rows inserted at a time.
+                Defaults to 20000
+        """
+        db = app.db
+        with app.app.app_context():
+            db.drop_all()
+            app.create_schema()
+            tables = [
+                (
+                    app.Ingredient.__table__,
+                    len(self.ingredients),
+                    lambda i: {
+                        "id": int(self.ingredient_ids[i]),
+                        "name": self.ingredients[i],
+                        "ref_unit_of_measure": UNITS[i % len(UNITS)],
+                        "ref_price": float(i % 20 + 1),
+                    },
+                ),
+                (
+                    app.Recipe.__table__,
+                    len(self.recipes),
+                    lambda i: {
+                        "id": int(self.recipe_ids[i]),
+                        "name": self.recipes[i],
+                        "method": f"Mix the ingredients of {self.recipes[i]}.",
+                    },
+                ),
+                (
+                    app.RecipeIngredients.__table__,
+                    len(self.link_recipes),
+                    lambda i: {
+                        "recipe_id": int(self.recipe_ids[self.link_recipes[i]]),
+                        "ingredient_id": int(
+                            self.ingredient_ids[self.link_ingredients[i]]
+                        ),
+                        "unit_of_measure": UNITS[self.link_units[i]],
+                        "quantity": float(self.link_quantities[i]),
+                    },
+                ),
+            ]
+            for table, n_rows, row in tables:
+                for start in range(0, n_rows, batch_size):
+                    stop = min(start + batch_size, n_rows)
+                    db.session.execute(
+                        table.insert(), [row(i) for i in range(start, stop)]
+                    )
+                db.session.commit()
+
+        # The caches and the indexes of the worker are stale
+        app.response_cache.clear()
+        app.search_index.invalidate()
+        app.bitmap_index.invalidate()
+        app.unit_converter.invalidate()
+
+    def request(self, kind: str) -> dict:
+        """Generate a request of the mix.
+
+        Args:
+            kind (str): Kind of request, one of `MIX`
+
+        Returns:
+            dict: Method, path, and JSON payload of the request
+        """
+        rng = self.rng
+        r = int(rng.integers(len(self.recipes)))
+        ing = self.ingredients[int(rng.zipf(1.3) - 1) % len(self.ingredients)]
+        if kind == "recipe":
+            return {"method": "GET", "path": f"/recipes/{self.paths[r]}"}
+        if kind == "recipe_unit":
+            return {"method": "GET", "path": f"/recipes/{self.paths[r]}?unit=g,ml"}
+        if kind == "recipes_page":
+            after = int(self.recipe_ids[r])
+            return {"method": "GET", "path": f"/recipes?limit=100&after={after}"}
+        if kind == "ingredients_page":
+            return {"method": "GET", "path": "/ingredients?limit=100"}
+        if kind == "recipes_by_ingredient":
+            return {"method": "GET", "path": f"/ingredients/{ing}/recipes?limit=100"}
+        if kind in ("cookable", "using"):
+            n = 8 if kind == "cookable" else 2
+            names = [
+                self.ingredients[int(i)]
+                for i in (rng.zipf(1.3, n) - 1) % len(self.ingredients)
+            ]
+            query = f"ingredients={','.join(names)}"
+            if kind == "cookable":
+                return {"method": "GET", "path": f"/recipes:cookable?{query}&missing=1"}
+            return {"method": "GET", "path": f"/recipes:using?{query}"}
+        if kind == "search":
+            # A misspelt name, with a letter left out
+            name = self.recipes[r] if rng.random() < 0.5 else ing
+            cut = int(rng.integers(1, len(name)))
+            return {"method": "GET", "path": f"/search?q={name[:cut]}{name[cut + 1:]}"}
+        if kind == "shopping_list":
+            plan = [
+                {"name": self.paths[int(i)], "servings": 2}
+                for i in rng.integers(len(self.recipes), size=3)
+            ]
+            return {"method": "POST", "path": "/shopping-list", "json": plan}
+        if kind == "cost":
+            return {
+                "method": "GET",
+                "path": f"/recipes/{self.paths[r]}/cost?servings=2",
+            }
+        if kind == "convert":
+            return {"method": "GET", "path": "/convert?quantity=2&from=kg&to=g"}
+        if kind == "put_recipe":
+            first = self.first[r]
+            ingredient = {
+                "name": self.ingredients[self.link_ingredients[first]],
+                "unit_of_measure": UNITS[self.link_units[first]],
+                "quantity": float(rng.integers(1, 1000)) / 4,
+            }
+            return {
+                "method": "PUT",
+                "path": f"/recipes/{self.paths[r]}",
+                "json": {"method": "Mix again.", "ingredients": [ingredient]},
+            }
+        raise ValueError(f"Unknown kind of request {kind}.")
+
+    def mix(self, n_requests: int) -> List[dict]:
+        """Generate a mix of requests.
+
+        Args:
+            n_requests (int): Number of requests
+
+        Returns:
+            List[dict]: Requests, in random order
+        """
+        kinds = list(MIX)
+        weights = np.array([MIX[k] for k in kinds], dtype=float)
+        picks = self.rng.choice(len(kinds), n_requests, p=weights / weights.sum())
+        return [self.request(kinds[i]) for i in picks]
+
+
+def examples(folder: str = EXAMPLES_DIR) -> List[dict]:
+    """Read the example payloads, as sent by the Makefile.
+
+    Args:
+        folder (str, optional): Folder of the `<method>_<recipe-name>.json`
+            files. Defaults to EXAMPLES_DIR
+
+    Returns:
+        List[dict]: Requests, the POSTs before the PUTs
+    """
+    requests = []
+    for file_name in sorted(glob.glob(os.path.join(folder, "*.json"))):
+        method, _, name = os.path.basename(file_name)[:-5].partition("_")
+        with open(file_name) as f:
+            payload = json.load(f)
+        requests.append(
+            {"method": method.upper(), "path": f"/recipes/{name}", "json": payload}
+        )
+    return requests
+
+
+def replay(file_name: str) -> List[dict]:
+    """Read recorded requests.
+
+    Args:
+        file_name (str): Path of a JSONL file, one request per line with its
+            `method`, its `path` (with the query string), and optionally its
+            `json` payload
+
+    Returns:
+        List[dict]: Requests, in the order of the file
+
+    Raises:
+        ValueError: If a line is not a request
+    """
+    requests = []
+    with open(file_name) as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict) or not {"method", "path"} <= set(record):
+                raise ValueError(
+                    f"Line {line_no} of {file_name} is not a request with a "
+                    f"method and a path."
+                )
+            requests.append(record)
+    return requests
+
+
+def endpoint(app, request: dict) -> str:
+    """Get the entrypoint of a request, as its method and route.
+
+    Args:
+        app (module): The `src.api.app` module
+        request (dict): Request
+
+    Returns:
+        str: e.g. `GET /recipes/<recipe_name>`
+    """
+    path = request["path"].partition("?")[0]
+    try:
+        rule, _ = app.app.url_map.bind("localhost").match(
+            path, method=request["method"], return_rule=True
+        )
+        route = rule.rule
+    except HTTPException:
+        route = "<unmatched>"
+    return f"{request['method']} {route}"
+
+
+def send(app, requests: List[dict], concurrency: int) -> Tuple[List[dict], float]:
+    """Send requests to the App from several threads.
+
+    The threads take the requests in order, each one waiting for the
+    response before sending its next request.
+
+    Args:
+        app (module): The `src.api.app` module
+        requests (List[dict]): Requests
+        concurrency (int): Number of threads
+
+    Returns:
+        Tuple[List[dict], float]: Endpoint, status, latency, and SQL
+            statements of each request, and wall time of all of them
+    """
+    results = [None] * len(requests)
+    counter = itertools.count()
+
+    def worker() -> None:
+        client = app.app.test_client()
+        while True:
+            i = next(counter)
+            if i >= len(requests):
+                return
+            req = requests[i]
+            _local.statements = 0
+            start = time.perf_counter()
+            response = client.open(
+                req["path"], method=req["method"], json=req.get("json")
+            )
+            response.close()
+            results[i] = {
+                "endpoint": endpoint(app, req),
+                "status": response.status_code,
+                "seconds": time.perf_counter() - start,
+                "statements": _local.statements,
+            }
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def summarise(results: List[dict], wall_time: float) -> List[dict]:
+    """Aggregate the results of the requests by entrypoint.
+
+    Args:
+        results (List[dict]): Results of the requests
+        wall_time (float): Wall time of all the requests, in seconds
+
+    Returns:
+        List[dict]: Requests, errors, throughput, latency percentiles in
+            milliseconds, and mean SQL statements per request of each
+            entrypoint
+    """
+    by_endpoint: Dict[str, List[dict]] = {}
+    for res in results:
+        by_endpoint.setdefault(res["endpoint"], []).append(res)
+    summary = []
+    for name, group in sorted(by_endpoint.items()):
+        ms = np.array([r["seconds"] for r in group]) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        statuses = {}
+        for r in group:
+            statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+        summary.append(
+            {
+                "endpoint": name,
+                "requests": len(group),
+                "statuses": statuses,
+                "throughput": len(group) / wall_time,
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+                "statements": float(np.mean([r["statements"] for r in group])),
+            }
+        )
+    return summary
+
+
+def run_size(app, n_recipes: int, args, recorded: List[dict]) -> List[dict]:
+    """Run the load test on one size of the catalogue.
+
+    Args:
+        app (module): The `src.api.app` module
+        n_recipes (int): Number of recipes
+        args (argparse.Namespace): Options of the load test
+        recorded (List[dict]): Examples and recorded requests, sent first
+
+    Returns:
+        List[dict]: Summary of each entrypoint, for each phase
+    """
+    n_ingredients = max(50, min(args.ingredients, n_recipes))
+    start = time.perf_counter()
+    catalogue = Catalogue(n_recipes, n_ingredients, args.seed)
+    catalogue.write(app)
+    logger.info(
+        f"Wrote {n_recipes:,} recipes, {n_ingredients:,} ingredients, and "
+        f"{len(catalogue.link_recipes):,} links in "
+        f"{time.perf_counter() - start:.1f}s ."
+    )
+
+    # One request of each kind, to build the indexes
+    send(app, [catalogue.request(kind) for kind in MIX], concurrency=1)
+
+    summary = []
+    phases = [
+        ("replay", recorded, args.replay_concurrency),
+        ("mix", catalogue.mix(args.requests), args.concurrency),
+    ]
+    for phase, requests, concurrency in phases:
+        if not requests:
+            continue
+        results, wall_time = send(app, requests, concurrency)
+        logger.info(
+            f"{phase}: {len(requests):,} requests in {wall_time:.2f}s, "
+            f"{len(requests) / wall_time:.1f} requests/s ."
+        )
+        for res in summarise(results, wall_time):
+            summary.append({"phase": phase, "n_recipes": n_recipes, **res})
+    return summary
+
+
+def compare(results: List[dict], baseline_file: str, tolerance: float) -> bool:
+    """Compare the p95 latency with the results of a previous run.
+
+    Args:
+        results (List[dict]): Results of the current run
+        baseline_file (str): Path of the results of the previous run
+        tolerance (float): Maximum ratio between the current and the previous
+            p95 latency before an entrypoint is flagged as a regression
+
+    Returns:
+        bool: True if no entrypoint regressed
+    """
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    previous = {
+        (r["phase"], r["endpoint"], r["n_recipes"]): r for r in baseline["results"]
+    }
+    ok = True
+    for res in results:
+        prev = previous.get((res["phase"], res["endpoint"], res["n_recipes"]))
+        if prev is None:
+            continue
+        ratio = res["p95_ms"] / max(prev["p95_ms"], 1e-6)
+        regressed = ratio > tolerance
+        ok &= not regressed
+        (logger.warning if regressed else logger.info)(
+            f"{res['endpoint']:<45} N={res['n_recipes']:>9,} "
+            f"p95 x{ratio:6.2f} statements {prev['statements']:.1f} -> "
+            f"{res['statements']:.1f} (vs {baseline['commit']})"
+        )
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=lambda v: int(float(v)),
+        default=[10**3, 10**4, 10**5],
+        help="Numbers of recipes, from 1e3 to 1e6 (default: 1e3 to 1e5)",
+    )
+    parser.add_argument("--ingredients", type=lambda v: int(float(v)), default=2000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--database",
+        help="URI of the SQLite database (default: a temporary file)",
+    )
+    parser.add_argument("--replay", help="Path of a JSONL file of requests")
+    parser.add_argument("--replay-concurrency", type=int, default=1)
+    parser.add_argument("--examples", default=EXAMPLES_DIR)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Path of the JSON results")
+    parser.add_argument("--compare", help="Path of the JSON results of another run")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    args = parser.parse_args()
+    if args.database and in_memory(args.database) and args.concurrency > 1:
+        parser.error("An in-memory database only serves one request at a time.")
+
+    env = environment()
+    tmp_dir = tempfile.TemporaryDirectory()
+    database = args.database or f"sqlite:///{os.path.join(tmp_dir.name, 'api.db')}"
+    app = load_app(database)
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+    recorded = examples(args.examples) + (replay(args.replay) if args.replay else [])
+
+    results = []
+    for n_recipes in args.sizes:
+        for res in run_size(app, n_recipes, args, recorded):
+            logger.info(
+                f"{res['phase']:<6} {res['endpoint']:<45} N={n_recipes:>9,} "
+                f"{res['throughput']:8.1f}/s p50={res['p50_ms']:8.2f}ms "
+                f"p95={res['p95_ms']:8.2f}ms p99={res['p99_ms']:8.2f}ms "
+                f"statements={res['statements']:5.1f} {res['statuses']}"
+            )
+            results.append(res)
+    tmp_dir.cleanup()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"api-{env['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(
+            {
+                **env,
+                "database": args.database or "sqlite (temporary file)",
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    logger.info(f"Saved the load test results to {output} .")
+
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
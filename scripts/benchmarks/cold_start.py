@@ -0,0 +1,100 @@
+"""Benchmark the cold start of the preprocessing module.
+
+Each measurement runs in a fresh interpreter and reports the time to import
+`src.base.preprocessing` and the time of the first transform, which includes
+the compilation (or the loading from cache) of the numba kernels.
+
+Run from the root of the repository with:
+    export PYTHONPATH=${PWD} && poetry run python scripts/benchmarks/cold_start.py
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from loguru import logger
+
+
+MEASURE = """
+import json, time
+t0 = time.perf_counter()
+import src.base.preprocessing as pp
+t1 = time.perf_counter()
+import numpy as np
+doy = np.arange(1, 367, dtype=np.int64)
+rbf = pp.RepeatingRadialBasisFunction(n_periods=12)
+rbf.fit(doy)
+rbf.transform(doy)
+pp.sin_transformer(doy, 52.0)
+pp.cos_transformer(doy, 52.0)
+t2 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "first_call": t2 - t1}))
+"""
+
+BASELINE = """
+import json, time
+t0 = time.perf_counter()
+import numba, pandas
+print(json.dumps({"import": time.perf_counter() - t0}))
+"""
+
+
+WARMUP = """
+import json
+from src.base.preprocessing import warmup
+warmup()
+print(json.dumps({}))
+"""
+
+
+def run(code: str, env: dict) -> dict:
+    """Run a snippet in a fresh interpreter and parse its timings.
+
+    Args:
+        code (str): Code printing a JSON object with the timings
+        env (dict): Additional environment variables
+
+    Returns:
+        dict: Timings in seconds
+    """
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        env={**os.environ, **env},
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = {"NUMBA_CACHE_DIR": cache_dir}
+        cases = {
+            # What the module used to pay at import time
+            "eager numba + pandas import": (BASELINE, {}),
+            "numba, cold cache": (MEASURE, cache),
+            "numba, warm cache": (MEASURE, cache),
+            "numpy fallback": (MEASURE, {"NUMBA_DISABLE_JIT": "1"}),
+        }
+        for name, (code, env) in cases.items():
+            if name == "numba, cold cache":
+                # Only the first run compiles, the others hit the cache
+                timings = [run(code, env)]
+            else:
+                if name == "numba, warm cache":
+                    run(WARMUP, env)
+                timings = [run(code, env) for _ in range(args.repeats)]
+            best = {k: min(t[k] for t in timings) for k in timings[0]}
+            logger.info(
+                f"{name:<28} " + " ".join(f"{k}={v:6.3f}s" for k, v in best.items())
+            )
@@ -0,0 +1,73 @@
+"""Benchmark the fit time of the `LinearRegression` solvers.
+
+Run from the root of the repository with:
+    export PYTHONPATH=${PWD} && poetry run python scripts/benchmarks/solvers.py
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+from loguru import logger
+
+from src.base.model import SOLVERS, LinearRegression
+
+
+def make_data(n: int, p: int, seed: int = 0) -> tuple:
+    """Generate a random regression problem.
+
+    Args:
+        n (int): Number of samples
+        p (int): Number of features
+        seed (int, optional): Seed of the random generator. Defaults to 0
+
+    Returns:
+        tuple: (n, p) Input data and (n, ) target variable
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((n, p))
+    y = X @ rng.standard_normal(p) + rng.standard_normal(n)
+    return X, y
+
+
+def time_fit(solver: str, X: np.ndarray, y: np.ndarray, repeats: int) -> float:
+    """Time the fit of a model with a given solver.
+
+    Args:
+        solver (str): Name of the solver
+        X (np.ndarray): (N, p) Training input data
+        y (np.ndarray): (N, ) Training target variable
+        repeats (int): Number of repetitions, the best time is returned
+
+    Returns:
+        float: Best fit time in seconds
+    """
+    best = np.inf
+    for _ in range(repeats):
+        model = LinearRegression(solver=solver)
+        start = time.perf_counter()
+        model.fit(X, y)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--shapes",
+        nargs="+",
+        default=["20000x300", "1000000x20"],
+        help="Shapes of the problems as NxP (default: wide and tall)",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+
+    for shape in args.shapes:
+        n, p = (int(v) for v in shape.lower().split("x"))
+        X, y = make_data(n, p)
+        for solver in SOLVERS:
+            elapsed = time_fit(solver, X, y, args.repeats)
+            logger.info(f"N={n:>9,} p={p:>4} solver={solver:<8} fit={elapsed:8.4f}s")
@@ -0,0 +1,289 @@
+"""Benchmark the numeric core on synthetic avocado data.
+
+Every operation is timed (best of `--repeats`) and then run once more under
+`tracemalloc` to measure its peak memory. Sizes larger than `--chunk-size` are
+processed chunk by chunk: the model is fitted with `fit_from_iterator` and the
+other operations are summed over the chunks. The results are saved as JSON,
+named after the current commit, and can be compared with the results of
+another commit with `--compare`.
+
+Run from the root of the repository with:
+    export PYTHONPATH=${PWD} && poetry run python scripts/benchmarks/suite.py
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+from loguru import logger
+
+from scripts.benchmarks.synthetic import NUM_COLS, TARGET_COL, iter_avocados
+from src.base.metrics import RegressionMetrics
+from src.base.model import LinearRegression, r2, rmse
+from src.base.preprocessing import (
+    FeaturePipeline,
+    RepeatingRadialBasisFunction,
+    cos_transformer,
+    day_of_year,
+    sin_transformer,
+    warmup,
+)
+
+
+RESULTS_DIR = os.path.join("scripts", "benchmarks", "results")
+
+
+def measure(fn: Callable[[], None], repeats: int) -> Tuple[float, float]:
+    """Measure the wall time and the peak memory of a function.
+
+    Args:
+        fn (Callable[[], None]): Function to be measured
+        repeats (int): Number of timed runs, the best time is returned
+
+    Returns:
+        Tuple[float, float]: Best time in seconds and peak memory in MB
+    """
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    # Tracing slows down the allocations, so the memory is measured separately
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak / 2**20
+
+
+def environment() -> dict:
+    """Describe the commit and the machine the benchmarks run on.
+
+    `git` and `platform` spawn subprocesses, and forking after the numba
+    threads have started can hang, so this must run before any kernel.
+
+    Returns:
+        dict: Commit, time, and versions of the platform and the libraries
+    """
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        commit = f"{sha}-dirty" if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def features(
+    pipeline: FeaturePipeline, n_rows: int, chunk_size: int, seed: int
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Generate the model features of the synthetic data in chunks.
+
+    Args:
+        pipeline (FeaturePipeline): Fitted feature pipeline
+        n_rows (int): Total number of rows
+        chunk_size (int): Maximum number of rows of each chunk
+        seed (int): Seed of the data generator
+
+    Yields:
+        Tuple[np.ndarray, np.ndarray]: (N_c, p) Features and (N_c, ) target
+    """
+    for chunk in iter_avocados(n_rows, chunk_size, seed):
+        yield pipeline.transform(chunk), chunk[TARGET_COL]
+
+
+def run_size(n_rows: int, chunk_size: int, repeats: int, seed: int) -> List[dict]:
+    """Run all the benchmarks on one size of the data.
+
+    Args:
+        n_rows (int): Number of rows
+        chunk_size (int): Maximum number of rows processed at once
+        repeats (int): Number of timed runs of each operation
+        seed (int): Seed of the data generator
+
+    Returns:
+        List[dict]: Time and peak memory of each operation
+    """
+    totals: Dict[str, List[float]] = {}
+
+    def record(name: str, fn: Callable[[], None], repeats: int = repeats) -> None:
+        seconds, peak_mb = measure(fn, repeats)
+        total = totals.setdefault(name, [0.0, 0.0])
+        total[0] += seconds
+        total[1] = max(total[1], peak_mb)
+
+    streaming = n_rows > chunk_size
+    first = next(iter_avocados(n_rows, chunk_size, seed))
+    pipeline = FeaturePipeline(num_cols=NUM_COLS)
+    record("FeaturePipeline.fit", lambda: pipeline.fit(first))
+
+    # The fit is a single pass over all the chunks when streaming, the time
+    # spent generating and transforming the data is not included
+    model = LinearRegression(solver="auto")
+    if streaming:
+        generation = [0.0]
+
+        def timed_chunks() -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+            chunks = features(pipeline, n_rows, chunk_size, seed)
+            while True:
+                start = time.perf_counter()
+                chunk = next(chunks, None)
+                generation[0] += time.perf_counter() - start
+                if chunk is None:
+                    return
+                yield chunk
+
+        # A single traced pass, the data is too large to be fitted repeatedly
+        tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            model.fit_from_iterator(timed_chunks())
+            elapsed = time.perf_counter() - start - generation[0]
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+        totals["LinearRegression.fit_from_iterator"] = [elapsed, peak]
+    else:
+        X, y = pipeline.transform(first), first[TARGET_COL]
+        record("LinearRegression.fit", lambda: model.fit(X, y))
+
+    metrics = RegressionMetrics()
+    for chunk in iter_avocados(n_rows, chunk_size, seed):
+        out = np.empty((len(chunk[TARGET_COL]), pipeline.n_features))
+        record("FeaturePipeline.transform", lambda: pipeline.transform(chunk, out=out))
+        doy = day_of_year(chunk["Date"])
+        rbf = RepeatingRadialBasisFunction(n_periods=12, input_range=(1, 366))
+        record("RepeatingRadialBasisFunction.fit", lambda: rbf.fit(doy))
+        record("RepeatingRadialBasisFunction.transform", lambda: rbf.transform(doy))
+        doy = doy.astype(float)
+        record("sin_transformer", lambda: sin_transformer(doy, 52.0))
+        record("cos_transformer", lambda: cos_transformer(doy, 52.0))
+
+        y_true = chunk[TARGET_COL]
+        y_pred = model.predict(out)
+        record("LinearRegression.predict", lambda: model.predict(out))
+        record("RegressionMetrics.update", lambda: metrics.update(y_true, y_pred))
+        if not streaming:
+            record("rmse", lambda: rmse(y_true, y_pred))
+            record("r2", lambda: r2(y_true, y_pred))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for ext in ("joblib", "bin"):
+            file_name = os.path.join(tmp_dir, f"model.{ext}")
+            record(f"save_model[{ext}]", lambda: model.save_model(file_name))
+            record(f"load_model[{ext}]", lambda: LinearRegression.load_model(file_name))
+
+    return [
+        {"operation": name, "n_rows": n_rows, "seconds": t, "peak_mb": m}
+        for name, (t, m) in totals.items()
+    ]
+
+
+def compare(results: List[dict], baseline_file: str, tolerance: float) -> bool:
+    """Compare the results with the results of a previous run.
+
+    Args:
+        results (List[dict]): Results of the current run
+        baseline_file (str): Path of the results of the previous run
+        tolerance (float): Maximum ratio between the current and the previous
+            time (or memory) before an operation is flagged as a regression
+
+    Returns:
+        bool: True if no operation regressed
+    """
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    previous = {(r["operation"], r["n_rows"]): r for r in baseline["results"]}
+    ok = True
+    for res in results:
+        prev = previous.get((res["operation"], res["n_rows"]))
+        if prev is None:
+            continue
+        t_ratio = res["seconds"] / max(prev["seconds"], 1e-9)
+        m_ratio = (res["peak_mb"] + 1) / (prev["peak_mb"] + 1)
+        regressed = t_ratio > tolerance or m_ratio > tolerance
+        ok &= not regressed
+        (logger.warning if regressed else logger.info)(
+            f"{res['operation']:<40} N={res['n_rows']:>11,} "
+            f"time x{t_ratio:6.2f} memory x{m_ratio:6.2f} "
+            f"(vs {baseline['commit']})"
+        )
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=lambda v: int(float(v)),
+        default=[10**3, 10**4, 10**5, 10**6],
+        help="Numbers of rows, from 1e3 to 1e8 (default: 1e3 to 1e6)",
+    )
+    parser.add_argument("--chunk-size", type=lambda v: int(float(v)), default=10**6)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Path of the JSON results")
+    parser.add_argument("--compare", help="Path of the JSON results of another run")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+
+    # The kernels are compiled (or loaded from cache) before timing them
+    env = environment()
+    warmup()
+
+    results = []
+    for n_rows in args.sizes:
+        for res in run_size(n_rows, args.chunk_size, args.repeats, args.seed):
+            logger.info(
+                f"{res['operation']:<40} N={n_rows:>11,} "
+                f"time={res['seconds']:10.4f}s peak={res['peak_mb']:10.1f}MB"
+            )
+            results.append(res)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{env['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(
+            {
+                **env,
+                "chunk_size": args.chunk_size,
+                "repeats": args.repeats,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    logger.info(f"Saved the benchmark results to {output} .")
+
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
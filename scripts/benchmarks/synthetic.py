@@ -0,0 +1,185 @@
+"""Generate a synthetic dataset with the same schema as the avocado dataset.
+
+The data is fully determined by the seed, the number of rows, and the chunk
+size, so it can replace `make download-data` where the network is not
+available (e.g. in CI). Run from the root of the repository with:
+    export PYTHONPATH=${PWD} && poetry run python scripts/benchmarks/synthetic.py
+"""
+import argparse
+import os
+import sys
+from typing import Dict, Iterator, Sequence, Union
+
+import numpy as np
+from loguru import logger
+
+
+REGIONS = (
+    "Albany",
+    "Atlanta",
+    "BaltimoreWashington",
+    "Boise",
+    "Boston",
+    "BuffaloRochester",
+    "California",
+    "Charlotte",
+    "Chicago",
+    "CincinnatiDayton",
+    "Columbus",
+    "DallasFtWorth",
+    "Denver",
+    "Detroit",
+    "GrandRapids",
+    "GreatLakes",
+    "HarrisburgScranton",
+    "HartfordSpringfield",
+    "Houston",
+    "Indianapolis",
+    "Jacksonville",
+    "LasVegas",
+    "LosAngeles",
+    "Louisville",
+    "MiamiFtLauderdale",
+    "Midsouth",
+    "Nashville",
+    "NewOrleansMobile",
+    "NewYork",
+    "Northeast",
+    "NorthernNewEngland",
+    "Orlando",
+    "Philadelphia",
+    "PhoenixTucson",
+    "Pittsburgh",
+    "Plains",
+    "Portland",
+    "RaleighGreensboro",
+    "RichmondNorfolk",
+    "Roanoke",
+    "Sacramento",
+    "SanDiego",
+    "SanFrancisco",
+    "Seattle",
+    "SouthCarolina",
+    "SouthCentral",
+    "Southeast",
+    "Spokane",
+    "StLouis",
+    "Syracuse",
+    "Tampa",
+    "TotalUS",
+    "West",
+    "WestTexNewMexico",
+)
+TYPES = ("conventional", "organic")
+TARGET_COL = "AveragePrice"
+NUM_COLS = (
+    "Total Volume",
+    "4046",
+    "4225",
+    "4770",
+    "Total Bags",
+    "Small Bags",
+    "Large Bags",
+    "XLarge Bags",
+)
+# The original data has one row per week, type, and region over 169 weeks
+FIRST_DATE = np.datetime64("2015-01-04")
+N_WEEKS = 169
+
+
+def make_avocados(
+    n_rows: int, seed: Union[int, Sequence[int]] = 0
+) -> Dict[str, np.ndarray]:
+    """Generate a chunk of synthetic avocado data.
+
+    Args:
+        n_rows (int): Number of rows
+        seed (Union[int, Sequence[int]], optional): Seed of the random
+            generator. Defaults to 0
+
+    Returns:
+        Dict[str, np.ndarray]: Mapping from the columns of the avocado dataset
+            to (n_rows, ) arrays
+    """
+    rng = np.random.default_rng(seed)
+    regions = rng.integers(0, len(REGIONS), n_rows)
+    types = rng.integers(0, len(TYPES), n_rows)
+    dates = FIRST_DATE + 7 * rng.integers(0, N_WEEKS, n_rows).astype("timedelta64[D]")
+
+    # Volumes are log-normal, larger for the conventional avocados and with a
+    # fixed scale for each region
+    region_scale = np.random.default_rng(len(REGIONS)).normal(12, 1, len(REGIONS))
+    log_scale = region_scale[regions] - 3 * types
+    plu = np.exp(log_scale[:, np.newaxis] + rng.normal(-1, 0.5, (n_rows, 3)))
+    bags = np.exp(
+        log_scale[:, np.newaxis] + rng.normal([-1, -2.5, -5], 0.5, (n_rows, 3))
+    )
+    total_bags = bags.sum(axis=1)
+
+    # Organic avocados are more expensive, and prices peak in the autumn
+    doy = (dates - dates.astype("datetime64[Y]")).astype(int) + 1
+    region_premium = np.random.default_rng(len(TYPES)).normal(0, 0.15, len(REGIONS))
+    price = (
+        1.1
+        + 0.5 * types
+        + region_premium[regions]
+        + 0.15 * np.sin(2 * np.pi * (doy - 180) / 365)
+        - 0.02 * (log_scale - 12)
+        + rng.normal(0, 0.2, n_rows)
+    )
+
+    return {
+        "Date": dates,
+        TARGET_COL: np.clip(price, 0.44, 3.25).round(2),
+        "Total Volume": plu.sum(axis=1) + total_bags,
+        "4046": plu[:, 0],
+        "4225": plu[:, 1],
+        "4770": plu[:, 2],
+        "Total Bags": total_bags,
+        "Small Bags": bags[:, 0],
+        "Large Bags": bags[:, 1],
+        "XLarge Bags": bags[:, 2],
+        "type": np.asarray(TYPES)[types],
+        "year": dates.astype("datetime64[Y]").astype(int) + 1970,
+        "region": np.asarray(REGIONS)[regions],
+    }
+
+
+def iter_avocados(
+    n_rows: int, chunk_size: int = 1_000_000, seed: int = 0
+) -> Iterator[Dict[str, np.ndarray]]:
+    """Generate synthetic avocado data in chunks.
+
+    Each chunk has its own seed derived from `seed`, so arbitrarily large
+    datasets can be generated in bounded memory.
+
+    Args:
+        n_rows (int): Total number of rows
+        chunk_size (int, optional): Maximum number of rows of each chunk.
+            Defaults to 1,000,000
+        seed (int, optional): Seed of the random generator. Defaults to 0
+
+    Yields:
+        Dict[str, np.ndarray]: Chunk of data, see `make_avocados`
+    """
+    for i, start in enumerate(range(0, n_rows, chunk_size)):
+        yield make_avocados(min(chunk_size, n_rows - start), seed=[seed, i])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=18249)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=os.path.join("data", "avocado.csv"))
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+
+    for i, chunk in enumerate(iter_avocados(args.rows, seed=args.seed)):
+        pd.DataFrame(chunk).to_csv(
+            args.output, mode="w" if i == 0 else "a", header=i == 0, index=True
+        )
+    logger.info(f"Saved {args.rows:,} synthetic rows to {args.output} .")
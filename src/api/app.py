@@ -1,10 +1,41 @@
 import os
+import re
+import sys
+import json
+import threading
+from typing import Callable, Iterable, Optional, Tuple, TypeVar
 
+import click
+import numpy as np
 from loguru import logger
-from flask import Flask, render_template, request, jsonify
+from flask import (
+    Flask,
+    Response,
+    abort,
+    render_template,
+    request,
+    jsonify,
+    make_response,
+    stream_with_context,
+    url_for,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query, Session, selectinload
 
-from src.base.utils import hash_string, clean_string
-from src.api.database import db, ma
+from src.base.telemetry import REGISTRY, Gauge, timed, timer
+from src.base.utils import name_ids
+from src.api.bulk import import_recipes
+from src.api.bitmap import RecipeBitmapIndex
+from src.api.cache import LRUCache, RedisCache, ResponseCache
+from src.api.database import db, ma, upsert
+from src.api.export import export_ingredients, export_recipes
+from src.api.instrumentation import instrument
+from src.api.search import SearchIndex
+from src.api.serving import MicroBatcher, ModelHolder
+from src.api.shopping import shopping_list
+from src.api.sqlite import create_schema, engine_options
+from src.api.units import UnitConverter, UnknownUnitError
 from src.api.models import (
     Recipe,
     RecipeSchema,
@@ -20,24 +51,458 @@ mysql_pwd = os.environ.get("MYSQL_PASSWORD")
 mysql_host = os.environ.get("MYSQL_HOST", "localhost")
 mysql_port = os.environ.get("MYSQL_PORT", 3306)
 mysql_db = os.environ.get("MYSQL_DATABASE", "recipes")
+database_url = os.environ.get("DATABASE_URL")
+model_path = os.environ.get("MODEL_PATH", "model/model.joblib")
+predict_batch_wait_ms = float(os.environ.get("PREDICT_BATCH_WAIT_MS", 0))
+model_reload_seconds = float(os.environ.get("MODEL_RELOAD_SECONDS", 0))
+page_size = int(os.environ.get("PAGE_SIZE", 100))
+max_page_size = int(os.environ.get("MAX_PAGE_SIZE", 1000))
+bulk_batch_size = int(os.environ.get("BULK_BATCH_SIZE", 500))
+export_batch_size = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+cache_ttl_seconds = float(os.environ.get("CACHE_TTL_SECONDS", 300))
+cache_max_entries = int(os.environ.get("CACHE_MAX_ENTRIES", 1024))
+cache_max_mb = float(os.environ.get("CACHE_MAX_MB", 64))
+cache_redis_url = os.environ.get("CACHE_REDIS_URL")
+index_rebuild_seconds = float(os.environ.get("INDEX_REBUILD_SECONDS", 300))
+units_reload_seconds = float(os.environ.get("UNITS_RELOAD_SECONDS", 60))
+log_level = os.environ.get("LOG_LEVEL", "INFO")
+sqlalchemy_echo = os.environ.get("SQLALCHEMY_ECHO", "0") != "0"
+name_id_registry = os.environ.get("NAME_ID_REGISTRY", "1") != "0"
+
+# Log through a queue consumed by a background thread, so that the requests
+# never wait for the log I/O
+logger.remove()
+logger.add(sys.stderr, level=log_level, enqueue=True)
+
+# Keep the names written by each worker, to detect the IDs shared by two names
+name_ids.registry = name_id_registry
 
 # Create the app
 app = Flask(__name__)
-app.config[
-    "SQLALCHEMY_DATABASE_URI"
-] = f"mysql+pymysql://{mysql_user}:{mysql_pwd}@{mysql_host}:{mysql_port}/{mysql_db}"
-app.config["SQLALCHEMY_ECHO"] = True
+# MySQL, unless another database is given (e.g. SQLite to run the App locally)
+app.config["SQLALCHEMY_DATABASE_URI"] = (
+    database_url
+    or f"mysql+pymysql://{mysql_user}:{mysql_pwd}@{mysql_host}:{mysql_port}/{mysql_db}"
+)
+app.config["SQLALCHEMY_ECHO"] = sqlalchemy_echo
+if app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(
+        app.config["SQLALCHEMY_DATABASE_URI"]
+    )
 
 # Create the extension and initialise the app with the extension
 db.init_app(app)
 ma.init_app(app)
 
+# SQLite has no setup script, so the tables are created when missing
+if app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+    with app.app_context():
+        create_schema()
+
+# Record the duration and the SQL statements of each request, see /metrics
+instrument(app)
+
 # Initialise the schema objects
 recipe_schema = RecipeSchema()
 recipes_schema = RecipeSchema(many=True)
 ingredient_schema = IngredientSchema()
 ingredients_schema = IngredientSchema(many=True)
 
+# Load the model once per worker, and hot reload it if enabled. If
+# micro-batching is enabled, concurrent prediction requests are scored
+# together with a single matrix product
+model_holder = ModelHolder(model_path, reload_interval=model_reload_seconds)
+batcher = (
+    MicroBatcher(max_wait_ms=predict_batch_wait_ms)
+    if predict_batch_wait_ms > 0
+    else None
+)
+
+# Cache the responses of the read entrypoints, in Redis if configured (shared
+# by all the workers) or else in each worker, and disabled if the maximum
+# number of entries is 0
+if cache_redis_url:
+    cache_backend = RedisCache.from_url(cache_redis_url)
+elif cache_max_entries > 0:
+    cache_backend = LRUCache(
+        max_entries=cache_max_entries, max_bytes=int(cache_max_mb * 2**20)
+    )
+else:
+    cache_backend = None
+response_cache = ResponseCache(cache_backend, ttl=cache_ttl_seconds)
+
+# Full-text index of the recipes and the ingredients, and bitmap of the
+# ingredients of each recipe, built by each worker on their first query and
+# then updated by the write entrypoints
+search_index = SearchIndex()
+bitmap_index = RecipeBitmapIndex()
+# Factors between all the pairs of units of measure, loaded by each worker
+unit_converter = UnitConverter()
+
+# Export the state of the caches and the indexes with the other metrics
+for name, help, callback in [
+    ("response_cache_hits", "Hits of the response cache.", lambda: response_cache.hits),
+    (
+        "response_cache_misses",
+        "Misses of the response cache.",
+        lambda: response_cache.misses,
+    ),
+    (
+        "search_index_documents",
+        "Documents in the search index.",
+        lambda: len(search_index),
+    ),
+    ("bitmap_index_recipes", "Recipes in the bitmap index.", lambda: len(bitmap_index)),
+    (
+        "name_id_collisions",
+        "Distinct pairs of names written with the same ID.",
+        lambda: len(name_ids.collisions),
+    ),
+]:
+    REGISTRY.register(Gauge(name, help, callback))
+
+
+# Load the ingredients of the recipes with one query per level rather than one
+# query per recipe (and per ingredient) when the recipes are serialised
+recipe_ingredients_loader = selectinload(Recipe.ingredients).selectinload(
+    RecipeIngredients.ingredient
+)
+
+
+def paginate(query: Query, key) -> Tuple[list, Optional[str]]:
+    """Get a page of results with keyset pagination.
+
+    The rows are sorted by `key`, and a page contains at most `limit` rows
+    with a key greater than `after` (both read from the query string). Unlike
+    offset pagination, the cost of a page does not depend on its position.
+
+    Args:
+        query (Query): Query to be paginated
+        key (Column): Unique column used to sort and paginate the rows
+
+    Returns:
+        Tuple[list, Optional[str]]: Rows of the page and URL of the next page,
+            or None if this is the last page
+    """
+    limit = int(request.args.get("limit", page_size))
+    if not 0 < limit <= max_page_size:
+        raise ValueError(f"limit must be between 1 and {max_page_size}.")
+    after = request.args.get("after")
+    if after is not None:
+        query = query.filter(key > int(after))
+    # Fetch one more row to know whether there is a next page
+    rows = query.order_by(key).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    next_url = url_for(
+        request.endpoint,
+        **request.view_args,
+        limit=limit,
+        after=getattr(rows[-1], key.key),
+    )
+    return rows, next_url
+
+
+def paginated_response(query: Query, key, dump: Callable[[list], list]):
+    """Serialise a page of results, with a link to the next page if any.
+
+    Args:
+        query (Query): Query to be paginated
+        key (Column): Unique column used to sort and paginate the rows
+        dump (Callable[[list], list]): Function serialising the rows
+
+    Returns:
+        Response: JSON list of the rows, with a `Link` header pointing to the
+            next page
+    """
+    try:
+        rows, next_url = paginate(query, key)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid pagination parameters: {e}"}), 400
+    headers = {"Link": f'<{next_url}>; rel="next"'} if next_url else {}
+    return jsonify(dump(rows)), 200, headers
+
+
+def preferred_units() -> Optional[list]:
+    """Get the comma-separated units of measure of `?unit=`, if any.
+
+    Returns:
+        Optional[list]: Units of measure in order of preference, or None if
+            the quantities are returned in their original units
+    """
+    units = [u for u in request.args.get("unit", "").split(",") if u.strip()]
+    if not units:
+        return None
+    try:
+        with_converter(lambda converter: converter.indices(units))
+    except ValueError as e:
+        abort(make_response(jsonify({"error": str(e)}), 400))
+    return units
+
+
+def dump_recipes(recipes: list) -> list:
+    """Serialise some recipes, converting the ingredients to `?unit=`.
+
+    Each ingredient is converted to the first unit of `?unit=` (e.g.
+    `?unit=g,ml`) its unit of measure can be converted to, and is left as it
+    is otherwise. The ingredients of all the recipes are converted at once.
+
+    Args:
+        recipes (list): Recipes to be serialised
+
+    Returns:
+        list: Serialised recipes
+    """
+    with timer("RecipeSchema.dump"):
+        results = recipes_schema.dump(recipes)
+    units = preferred_units()
+    ingredients = [ing for res in results for ing in res["ingredients"]]
+    if units is None or not ingredients:
+        return results
+    try:
+        quantities, uoms = with_converter(
+            lambda converter: converter.to_preferred(
+                [ing["quantity"] for ing in ingredients],
+                [ing["unit_of_measure"] for ing in ingredients],
+                units,
+            )
+        )
+    except UnknownUnitError as e:
+        abort(make_response(jsonify({"error": str(e)}), 400))
+    for ing, quantity, uom in zip(ingredients, quantities.tolist(), uoms):
+        ing["quantity"], ing["unit_of_measure"] = quantity, uom
+    return results
+
+
+def get_converter() -> UnitConverter:
+    """Get the unit converter, loading the conversions if needed.
+
+    Returns:
+        UnitConverter: The unit converter
+    """
+    if unit_converter.is_stale(units_reload_seconds):
+        unit_converter.rebuild()
+    return unit_converter
+
+
+# Result of a function of the unit converter
+T = TypeVar("T")
+
+
+def with_converter(fn: Callable[[UnitConverter], T]) -> T:
+    """Run a function of the unit converter, reloading it if a unit is unknown.
+
+    A unit created by another worker (or outside the App) is only known
+    after the conversions are reloaded, so they are reloaded once, at most
+    once per second, before giving up.
+
+    Args:
+        fn (Callable[[UnitConverter], T]): Function of the converter
+
+    Returns:
+        T: Result of the function
+
+    Raises:
+        UnknownUnitError: If a unit is still not known after the reload
+    """
+    try:
+        return fn(get_converter())
+    except UnknownUnitError:
+        if not unit_converter.is_stale(1):
+            raise
+        unit_converter.rebuild()
+    return fn(unit_converter)
+
+
+# Statements writing to the units of measure or to the conversions, whether
+# issued by the ORM, by a bulk statement, or as raw SQL
+UNITS_WRITE = re.compile(
+    r"\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)"
+    r"\s+[`\"]?(?:unit_of_measure|uom_conversion)\b",
+    re.IGNORECASE,
+)
+# Whether the current thread wrote to the units since its last commit
+_units_written = threading.local()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def units_written(conn, cursor, statement, parameters, context, executemany):
+    """Flag the writes to the units of measure and to the conversions."""
+    if UNITS_WRITE.match(statement):
+        _units_written.flag = True
+
+
+def units_changed() -> None:
+    """Reload the conversions if the current thread wrote to the units."""
+    if getattr(_units_written, "flag", False):
+        unit_converter.invalidate()
+        response_cache.clear()
+
+
+@event.listens_for(Engine, "commit")
+def units_committing(conn) -> None:
+    """Reload the conversions, for the writes committed outside a session."""
+    units_changed()
+
+
+@event.listens_for(Session, "after_commit")
+def units_committed(session: Session) -> None:
+    """Reload the conversions again once the writes are visible to the others.
+
+    A conversion reloaded by another thread between the two invalidations
+    could still read the units before the commit.
+    """
+    units_changed()
+    _units_written.flag = False
+
+
+@event.listens_for(Session, "after_rollback")
+def units_rolled_back(session: Session) -> None:
+    """Forget the writes to the units that were rolled back."""
+    _units_written.flag = False
+
+
+def load_recipe(recipe_id: int) -> Recipe:
+    """Load a recipe together with its ingredients.
+
+    Args:
+        recipe_id (int): ID of the recipe
+
+    Returns:
+        Recipe: The recipe, with its ingredients already loaded
+    """
+    return (
+        Recipe.query.options(recipe_ingredients_loader)
+        .filter(Recipe.id == recipe_id)
+        .one()
+    )
+
+
+def invalidate_recipe(
+    recipe_id: int, ingredient_ids: Iterable[int], new_ingredients: bool = False
+) -> None:
+    """Invalidate the cached responses that include a recipe.
+
+    Args:
+        recipe_id (int): ID of the recipe
+        ingredient_ids (Iterable[int]): IDs of the ingredients of the recipe,
+            before and after the change
+        new_ingredients (bool, optional): Whether ingredients were created.
+            Defaults to False
+    """
+    namespaces = [
+        "recipes",
+        f"recipe:{recipe_id}",
+        *(f"ingredient:{i}" for i in set(ingredient_ids)),
+    ]
+    if new_ingredients:
+        namespaces.append("ingredients")
+    response_cache.invalidate_namespace(*namespaces)
+
+
+def index_recipe(recipe: Recipe, new_ingredients: Optional[dict] = None) -> None:
+    """Add (or update) a recipe and its new ingredients in the indexes.
+
+    Args:
+        recipe (Recipe): The recipe
+        new_ingredients (Optional[dict], optional): Names of the ingredients
+            created with the recipe, by ID. Defaults to None
+    """
+    search_index.add(
+        "recipe",
+        recipe.id,
+        {"name": recipe.name, "method": recipe.method, "author": recipe.author},
+    )
+    for ing_id, ing_name in (new_ingredients or {}).items():
+        search_index.add("ingredient", ing_id, {"name": ing_name})
+    bitmap_index.set_recipe(recipe.id, [ri.ingredient_id for ri in recipe.ingredients])
+
+
+def update_ingredients(
+    recipe_id: int, ingredients: list, current: dict
+) -> Tuple[set, dict]:
+    """Add, update, or remove the ingredients of a recipe with bulk statements.
+
+    The changes are computed in memory against the current ingredients of the
+    recipe, the existing ingredients are resolved with a single query, and
+    each kind of change is applied with a single statement, so the number of
+    queries does not depend on the number of ingredients. An ingredient with
+    a quantity of 0 is removed from the recipe. The changes are not committed.
+
+    Args:
+        recipe_id (int): ID of the recipe
+        ingredients (list): Ingredients to be added, updated, or removed
+        current (dict): Rows of the mapping table for the recipe, by
+            ingredient ID
+
+    Returns:
+        Tuple[set, dict]: IDs of the ingredients in the payload, and names of
+            the ingredients created by ID
+    """
+    changes = {}
+    ing_ids = name_ids.ids([ing["name"] for ing in ingredients], register=True)
+    for ing_id, ing in zip(ing_ids, ingredients):
+        # The message is only formatted if the level is enabled
+        logger.debug(
+            "Ingredient Name: {}, Cleaned Ingredient Name: {}, Ingredient ID: {} .",
+            ing["name"],
+            name_ids.name(ing_id),
+            ing_id,
+        )
+        changes[ing_id] = ing
+
+    # Ingredients that are not part of the recipe anymore must exist in the
+    # mapping table, or return 404 Not Found
+    removed = [i for i, ing in changes.items() if ing.get("quantity") == 0]
+    if any(i not in current for i in removed):
+        abort(404)
+    kept = {i: ing for i, ing in changes.items() if ing.get("quantity") != 0}
+    if not kept and not removed:
+        return set(), {}
+
+    # Completely new ingredients are added to the list of ingredients, and
+    # the mapping table is updated (or added to) with the new quantities
+    known = set(
+        db.session.execute(
+            db.select(Ingredient.id).where(Ingredient.id.in_(list(kept)))
+        ).scalars()
+    )
+    new_ingredients = [
+        {"id": i, "name": ing["name"], "ref_unit_of_measure": ing["unit_of_measure"]}
+        for i, ing in kept.items()
+        if i not in known
+    ]
+    links = []
+    for i, ing in kept.items():
+        old = current.get(i)
+        links.append(
+            {
+                "recipe_id": recipe_id,
+                "ingredient_id": i,
+                "unit_of_measure": ing["unit_of_measure"]
+                if old is None
+                else ing.get("unit_of_measure", old.unit_of_measure),
+                "quantity": ing["quantity"]
+                if old is None
+                else ing.get("quantity", old.quantity),
+            }
+        )
+
+    if removed:
+        n_rows = RecipeIngredients.query.filter(
+            RecipeIngredients.recipe_id == recipe_id,
+            RecipeIngredients.ingredient_id.in_(removed),
+        ).delete(synchronize_session=False)
+        logger.debug("{} rows deleted from the `recipe_ingredients` table.", n_rows)
+    if new_ingredients:
+        db.session.execute(upsert(Ingredient.__table__, new_ingredients, ["id"]))
+    if links:
+        db.session.execute(
+            upsert(RecipeIngredients.__table__, links, ["unit_of_measure", "quantity"])
+        )
+    return set(changes), {ing["id"]: ing["name"] for ing in new_ingredients}
+
 
 @app.route("/")
 def hello():
@@ -47,10 +512,12 @@ def hello():
 
 @app.route("/recipes", methods=["GET"])
 def get_recipes():
-    """Get all the recipes."""
-    all_recipes = Recipe.query.all()
-    result = recipes_schema.dump(all_recipes)
-    return jsonify(result), 200
+    """Get a page of recipes."""
+    query = Recipe.query.options(recipe_ingredients_loader)
+    key = response_cache.key(f"recipes?{request.query_string.decode()}", "recipes")
+    return response_cache.respond(
+        key, lambda: make_response(paginated_response(query, Recipe.id, dump_recipes))
+    )
 
 
 @app.route("/recipes/<recipe_name>", methods=["GET", "PUT", "POST", "DELETE"])
@@ -61,9 +528,12 @@ def recipe(recipe_name: str):
         recipe_name (str): Name of the recipe
     """
     # Get the name of the recipe and the corresponding ID
-    logger.debug(f"Recipe Name: {recipe_name} .")
-    recipe_id = hash_string(clean_string(recipe_name), 18)
-    logger.debug(f"Recipe ID: {recipe_id} .")
+    logger.debug("Recipe Name: {} .", recipe_name)
+    if request.method in ("POST", "PUT"):
+        recipe_id = name_ids.register(recipe_name)
+    else:
+        recipe_id = name_ids.id(recipe_name)
+    logger.debug("Recipe ID: {} .", recipe_id)
 
     # If POST, create a new recipe
     if request.method == "POST":
@@ -74,49 +544,42 @@ def recipe(recipe_name: str):
                 ingredients = request.json.pop("ingredients")
                 recipe = Recipe(id=recipe_id, **request.json)
                 db.session.add(recipe)
-                # If any of the ingredients does not exist, create it and set
-                # the ref_unit_of_measure to the UOM specified in the recipe.
-                # Finally, add the recipe and the ingredients to the mapping
-                # table
-                for ing in ingredients:
-                    ing_name = ing["name"]
-                    ing_id = hash_string(clean_string(ing_name), 18)
-                    logger.debug(
-                        f"Ingredient Name: {ing_name}, "
-                        f"Cleaned Ingredient Name: {clean_string(ing_name)}, "
-                        f"Ingredient ID: {ing_id} ."
-                    )
-                    ing_uom = ing["unit_of_measure"]
-                    ing_qty = ing["quantity"]
-                    ingredient = Ingredient(
-                        id=ing_id, name=ing_name, ref_unit_of_measure=ing_uom
-                    )
-                    if Ingredient.query.get(ing_id) is None:
-                        db.session.add(ingredient)
-                    # Add the recipe and the ingredient to the mapping table
-                    recipe_ingredient = RecipeIngredients(
-                        recipe_id=recipe_id,
-                        ingredient_id=ing_id,
-                        unit_of_measure=ing_uom,
-                        quantity=ing_qty,
-                    )
-                    db.session.add(recipe_ingredient)
-                # Commit all the changes to the database
-                db.session.commit()
-                return recipe_schema.jsonify(recipe), 201
+                db.session.flush()
+                # Create the missing ingredients, setting their
+                # ref_unit_of_measure to the UOM specified in the recipe, and
+                # add the recipe and the ingredients to the mapping table
+                ing_ids, created = update_ingredients(recipe_id, ingredients, {})
             # If the ingredients are not in the request, return an error (400)
             except KeyError as e:
-                jsonify(
-                    {"error:": f"Attribute {e} does not exist in the payload."}
-                ), 400
+                db.session.rollback()
+                return (
+                    jsonify({"error": f"Attribute {e} does not exist in the payload."}),
+                    400,
+                )
+            # Commit all the changes to the database
+            db.session.commit()
+            invalidate_recipe(recipe_id, ing_ids, new_ingredients=bool(created))
+            recipe = load_recipe(recipe_id)
+            index_recipe(recipe, created)
+            return recipe_schema.jsonify(recipe), 201
         # If the recipe exists already, return an error (409)
         else:
             return jsonify({"error": "This recipe already exists."}), 409
 
-    # If GET, get the recipe or return 404 Not Found
+    # If GET, get the recipe (from the cache if possible) or return 404 Not
+    # Found
     elif request.method == "GET":
-        recipe = db.get_or_404(Recipe, recipe_id)
-        return recipe_schema.jsonify(recipe), 200
+        # The key includes the generation of the recipe, read before the
+        # recipe: a response built from rows that a concurrent write has just
+        # changed is cached under a generation that is already invalidated
+        key = f"recipe:{recipe_id}"
+        key = response_cache.key(f"{key}?{request.query_string.decode()}", key)
+        query = Recipe.query.options(recipe_ingredients_loader).filter(
+            Recipe.id == recipe_id
+        )
+        return response_cache.respond(
+            key, lambda: jsonify(dump_recipes([query.first_or_404()])[0])
+        )
 
     # If PUT, update the recipe
     elif request.method == "PUT":
@@ -126,62 +589,33 @@ def recipe(recipe_name: str):
         # ingredients can be added, modified, or removed (using a special
         # keyword)
         ingredients = request.json.pop("ingredients", None)
+        current = {
+            ri.ingredient_id: ri
+            for ri in RecipeIngredients.query.filter(
+                RecipeIngredients.recipe_id == recipe_id
+            )
+        }
+        ing_ids, created = set(), {}
         if ingredients is not None:
             try:
-                for ing in ingredients:
-                    ing_name = ing.pop("name")
-                    ing_id = hash_string(clean_string(ing_name), 18)
-                    logger.debug(
-                        f"Ingredient Name: {ing_name}, "
-                        f"Cleaned Ingredient Name: {clean_string(ing_name)}, "
-                        f"Ingredient ID: {ing_id} ."
-                    )
-                    # If the ingredient is not part of the recipe anymore,
-                    # delete it from the mapping table
-                    if "quantity" in ing and ing["quantity"] == 0:
-                        recipe_ingredient = RecipeIngredients.query.get_or_404(
-                            (recipe_id, ing_id)
-                        )
-                        db.session.delete(recipe_ingredient)
-                    # Otherwise...
-                    else:
-                        # If the ingredient is completely new, add it to the list
-                        # of ingredients
-                        if Ingredient.query.get(ing_id) is None:
-                            ingredient = Ingredient(
-                                id=ing_id,
-                                name=ing_name,
-                                ref_unit_of_measure=ing["unit_of_measure"],
-                            )
-                            db.session.add(ingredient)
-                        # If the ingredient is new to the recipe, add it to the
-                        # mapping table
-                        if RecipeIngredients.query.get((recipe_id, ing_id)) is None:
-                            recipe_ingredient = RecipeIngredients(
-                                recipe_id=recipe_id,
-                                ingredient_id=ing_id,
-                                unit_of_measure=ing["unit_of_measure"],
-                                quantity=ing["quantity"],
-                            )
-                            db.session.add(recipe_ingredient)
-                        # If not, just update the mapping table
-                        else:
-                            recipe_ingredient = RecipeIngredients.query.get(
-                                (recipe_id, ing_id)
-                            )
-                            for k, v in ing.items():
-                                setattr(recipe_ingredient, k, v)
+                ing_ids, created = update_ingredients(recipe_id, ingredients, current)
             # If the ingredients do not contain enough information, return an error (400)
             except KeyError as e:
-                jsonify(
-                    {"error:": f"Attribute {e} does not exist in the payload."}
-                ), 400
+                db.session.rollback()
+                return (
+                    jsonify({"error": f"Attribute {e} does not exist in the payload."}),
+                    400,
+                )
         # Update all the other attributes of the recipe
         for k, v in request.json.items():
             setattr(recipe, k, v)
         # Commit all the changes to the database
-        db.session.merge(recipe)
         db.session.commit()
+        invalidate_recipe(
+            recipe_id, ing_ids.union(current), new_ingredients=bool(created)
+        )
+        recipe = load_recipe(recipe_id)
+        index_recipe(recipe, created)
         return recipe_schema.jsonify(recipe), 200
 
     # If DELETE, delete the recipe
@@ -189,48 +623,408 @@ def recipe(recipe_name: str):
         # Get the recipe or return 404 Not Found
         recipe = db.get_or_404(Recipe, recipe_id)
         # Get all the ingredients associated with the recipe in the mapping table
+        ing_ids = db.session.execute(
+            db.select(RecipeIngredients.ingredient_id).where(
+                RecipeIngredients.recipe_id == recipe_id
+            )
+        ).scalars()
+        ing_ids = list(ing_ids)
         n_rows = RecipeIngredients.query.filter(
             RecipeIngredients.recipe_id == recipe_id
         ).delete()
-        logger.debug(f"{n_rows} will be deleted from the `recipe_ingredients` table.")
+        logger.debug("{} will be deleted from the `recipe_ingredients` table.", n_rows)
         # Delete the recipe
         db.session.delete(recipe)
         # Apply the changes
         db.session.commit()
+        invalidate_recipe(recipe_id, ing_ids)
+        search_index.remove("recipe", recipe_id)
+        bitmap_index.remove_recipe(recipe_id)
         # Return confirmation of deletion
         return f"Recipe {recipe_name} was successfully deleted."
 
 
+@app.route("/recipes:bulk", methods=["POST"])
+def recipes_bulk():
+    """Create or update recipes in bulk.
+
+    The payload is NDJSON with one recipe per line, including its `name`, and
+    is read as a stream. The recipes are committed in batches of
+    `?batch_size=` recipes, and invalid records are reported without
+    stopping the import.
+    """
+    try:
+        batch_size = int(request.args.get("batch_size", bulk_batch_size))
+        report = import_recipes(request.stream, batch_size=batch_size)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # Any recipe or ingredient may have changed
+    response_cache.clear()
+    search_index.invalidate()
+    bitmap_index.invalidate()
+    return jsonify(report), 200
+
+
+@app.cli.command("import-recipes")
+@click.argument("file", type=click.File("rb"))
+@click.option("--batch-size", default=bulk_batch_size, show_default=True)
+def import_recipes_command(file, batch_size: int):
+    """Create or update the recipes in an NDJSON FILE (`-` for stdin)."""
+    report = import_recipes(file, batch_size=batch_size)
+    response_cache.clear()
+    search_index.invalidate()
+    bitmap_index.invalidate()
+    click.echo(json.dumps(report, indent=2))
+
+
+@app.route("/export/recipes.ndjson", methods=["GET"])
+def export_recipes_ndjson():
+    """Stream all the recipes with their ingredients as NDJSON.
+
+    The rows are read from a server-side cursor and written to the response as
+    they arrive, so the memory used does not depend on the number of recipes.
+    """
+    return Response(
+        stream_with_context(export_recipes(export_batch_size)),
+        mimetype="application/x-ndjson",
+    )
+
+
+@app.route("/export/ingredients.ndjson", methods=["GET"])
+def export_ingredients_ndjson():
+    """Stream all the ingredients as NDJSON."""
+    return Response(
+        stream_with_context(export_ingredients(export_batch_size)),
+        mimetype="application/x-ndjson",
+    )
+
+
 @app.route("/ingredients", methods=["GET"])
 def ingredients():
-    """Get all the ingredients."""
-    all_ingredients = Ingredient.query.all()
-    result = ingredients_schema.dump(all_ingredients)
-    return jsonify(result), 200
+    """Get a page of ingredients."""
+    key = response_cache.key(
+        f"ingredients?{request.query_string.decode()}", "ingredients"
+    )
+    return response_cache.respond(
+        key,
+        lambda: make_response(
+            paginated_response(
+                Ingredient.query,
+                Ingredient.id,
+                timed("IngredientSchema.dump")(ingredients_schema.dump),
+            )
+        ),
+    )
 
 
 @app.route("/ingredients/<ingredient_name>/recipes", methods=["GET"])
 def recipes_by_ingredient(ingredient_name: str):
-    """Get all the recipes given an ingredient.
+    """Get a page of recipes given an ingredient.
 
     Args:
         ingredient_name (str): Name of the ingredient
     """
-    # Get the ingredient ID
-    ing_id = hash_string(ingredient_name, 18)
-    logger.debug(
-        f"Cleaned Ingredient Name: {ingredient_name}, " f"Ingredient ID: {ing_id} ."
+    # Get the ingredient ID, from either the name or the cleaned name
+    ing_id = name_ids.lookup(ingredient_name)
+    logger.debug("Ingredient Name: {}, Ingredient ID: {} .", ingredient_name, ing_id)
+
+    def build():
+        # Return 404 Not Found is the ing_id does not exist
+        db.get_or_404(Ingredient, ing_id)
+        # Get the recipes associated with the ingredient ID in the mapping table
+        query = (
+            Recipe.query.join(Recipe.ingredients)
+            .filter(RecipeIngredients.ingredient_id == ing_id)
+            .options(recipe_ingredients_loader)
+        )
+        return make_response(paginated_response(query, Recipe.id, dump_recipes))
+
+    key = response_cache.key(
+        f"ingredient:{ing_id}:recipes?{request.query_string.decode()}",
+        f"ingredient:{ing_id}",
     )
-    # Return 404 Not Found is the ing_id does not exist
-    ingredient = db.get_or_404(Ingredient, ing_id)
-    # Get all the recipe ID from the mapping table that are associate with the ingredient ID
-    recipe_ids = db.select(RecipeIngredients.recipe_id).where(
-        RecipeIngredients.ingredient_id == ing_id
+    return response_cache.respond(key, build)
+
+
+def get_bitmap_index() -> RecipeBitmapIndex:
+    """Get the bitmap index, (re)building it if needed.
+
+    The index is only updated by the worker handling a write, so the others
+    rebuild theirs every `INDEX_REBUILD_SECONDS` to pick up the changes.
+
+    Returns:
+        RecipeBitmapIndex: The bitmap index
+    """
+    if bitmap_index.is_stale(index_rebuild_seconds):
+        bitmap_index.rebuild()
+    return bitmap_index
+
+
+def ingredient_ids_arg() -> list:
+    """Get the IDs of the comma-separated ingredients of `?ingredients=`.
+
+    Returns:
+        list: IDs of the ingredients
+    """
+    names = [n.strip() for n in request.args.get("ingredients", "").split(",")]
+    names = [n for n in names if n]
+    if not names:
+        raise ValueError("The list of ?ingredients= is missing.")
+    return [name_ids.lookup(name) for name in names]
+
+
+def recipes_response(recipe_ids: list, missing: Optional[list] = None):
+    """Serialise some recipes in the given order.
+
+    Args:
+        recipe_ids (list): IDs of the recipes
+        missing (Optional[list], optional): Number of missing ingredients of
+            each recipe, added to the recipes. Defaults to None
+
+    Returns:
+        Response: JSON list of the recipes
+    """
+    recipes = {
+        r.id: r
+        for r in Recipe.query.options(recipe_ingredients_loader).filter(
+            Recipe.id.in_(recipe_ids)
+        )
+    }
+    results = dump_recipes([recipes[i] for i in recipe_ids if i in recipes])
+    if missing is not None:
+        n_missing = dict(zip(recipe_ids, missing))
+        for res in results:
+            res["missing"] = n_missing[res["id"]]
+    return jsonify(results), 200
+
+
+@app.route("/recipes:cookable", methods=["GET"])
+def cookable_recipes():
+    """Get the recipes that can be made with some ingredients.
+
+    The available ingredients are given as `?ingredients=<name>,<name>`, and
+    recipes missing at most `?missing=` (default 0) of their ingredients are
+    also returned, sorted by number of missing ingredients (`missing`).
+    """
+    try:
+        ing_ids = ingredient_ids_arg()
+        max_missing = int(request.args.get("missing", 0))
+        limit = int(request.args.get("limit", page_size))
+        if max_missing < 0 or not 0 < limit <= max_page_size:
+            raise ValueError(
+                f"missing must be positive and limit between 1 and {max_page_size}."
+            )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    matches = get_bitmap_index().cookable(ing_ids, max_missing=max_missing)[:limit]
+    return recipes_response([i for i, _ in matches], [n for _, n in matches])
+
+
+@app.route("/recipes:using", methods=["GET"])
+def recipes_using():
+    """Get the recipes that use all the ingredients of `?ingredients=`."""
+    try:
+        ing_ids = ingredient_ids_arg()
+        limit = int(request.args.get("limit", page_size))
+        if not 0 < limit <= max_page_size:
+            raise ValueError(f"limit must be between 1 and {max_page_size}.")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return recipes_response(get_bitmap_index().using_all(ing_ids)[:limit])
+
+
+@app.route("/shopping-list", methods=["POST"])
+def post_shopping_list():
+    """Get the ingredients to buy for a meal plan, and their cost.
+
+    The payload is a JSON list of recipes with their `name` and optionally
+    their `servings`, a multiplier of the quantities of the recipe (1 by
+    default). The quantities of each ingredient are summed across the
+    recipes in the reference unit of measure of the ingredient, and priced
+    with its reference price.
+    """
+    payload = request.json
+    try:
+        if not isinstance(payload, list):
+            raise ValueError("Expected a JSON list.")
+        servings = {}
+        for rec in payload:
+            recipe_id = name_ids.id(rec["name"])
+            n_servings = float(rec.get("servings", 1))
+            if not n_servings > 0:
+                raise ValueError(f"Invalid servings for recipe {rec['name']}.")
+            servings[recipe_id] = servings.get(recipe_id, 0) + n_servings
+    except KeyError as e:
+        return jsonify({"error": f"Attribute {e} does not exist in the payload."}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid meal plan: {e}"}), 400
+    try:
+        report = with_converter(lambda converter: shopping_list(servings, converter))
+    except UnknownUnitError as e:
+        return jsonify({"error": f"Cannot price the meal plan: {e}"}), 400
+    if len(report["recipes"]) < len(servings):
+        found = {rec["id"] for rec in report["recipes"]}
+        missing = [
+            rec["name"] for rec in payload if name_ids.id(rec["name"]) not in found
+        ]
+        return jsonify({"error": f"Recipes {missing} do not exist."}), 404
+    return jsonify(report), 200
+
+
+@app.route("/recipes/<recipe_name>/cost", methods=["GET"])
+def recipe_cost(recipe_name: str):
+    """Get the cost of a recipe, scaled by `?servings=` (1 by default).
+
+    Args:
+        recipe_name (str): Name of the recipe
+    """
+    recipe_id = name_ids.id(recipe_name)
+    try:
+        n_servings = float(request.args.get("servings", 1))
+        if not n_servings > 0:
+            raise ValueError("servings must be positive.")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        report = with_converter(
+            lambda converter: shopping_list({recipe_id: n_servings}, converter)
+        )
+    except UnknownUnitError as e:
+        return jsonify({"error": f"Cannot price the recipe: {e}"}), 400
+    if not report["recipes"]:
+        abort(404)
+    return jsonify(report), 200
+
+
+@app.route("/convert", methods=["GET", "POST"])
+def convert():
+    """Convert quantities between units of measure.
+
+    A single quantity is converted with `GET /convert?quantity=1&from=l&to=ml`.
+    Many quantities are converted at once with a POST whose payload is a
+    JSON list of objects with `quantity`, `from`, and `to`. Quantities that
+    cannot be converted are null.
+    """
+    if request.method == "GET":
+        payload = [
+            {k: request.args.get(k) for k in ("quantity", "from", "to")},
+        ]
+    else:
+        payload = request.json
+    try:
+        if not isinstance(payload, list):
+            raise ValueError("Expected a JSON list.")
+        quantities = [float(row["quantity"]) for row in payload]
+        converted = with_converter(
+            lambda converter: converter.convert(
+                quantities,
+                [row["from"] for row in payload],
+                [row["to"] for row in payload],
+            )
+        )
+    except KeyError as e:
+        return jsonify({"error": f"Attribute {e} does not exist in the payload."}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid conversion: {e}"}), 400
+    results = [
+        {"quantity": q if np.isfinite(q) else None, "unit_of_measure": row["to"]}
+        for q, row in zip(converted.tolist(), payload)
+    ]
+    return jsonify(results[0] if request.method == "GET" else results), 200
+
+
+@app.route("/search", methods=["GET"])
+def search():
+    """Search the recipes and the ingredients.
+
+    The terms of `?q=` are matched against the names, methods, and authors
+    of the recipes and the names of the ingredients, allowing for misspelt
+    and partial terms, and the best `?limit=` results are returned. The
+    results can be restricted to one `?type=` (`recipe` or `ingredient`).
+    """
+    query = request.args.get("q", "")
+    kind = request.args.get("type")
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        limit = 0
+    if not query.strip():
+        return jsonify({"error": "The query ?q= is missing."}), 400
+    if kind not in (None, "recipe", "ingredient"):
+        return jsonify({"error": f"Unknown type {kind}."}), 400
+    if not 0 < limit <= max_page_size:
+        return (
+            jsonify({"error": f"limit must be between 1 and {max_page_size}."}),
+            400,
+        )
+    if search_index.is_stale(index_rebuild_seconds):
+        search_index.rebuild()
+    kinds = ("recipe", "ingredient") if kind is None else (kind,)
+    return jsonify(search_index.search(query, kinds=kinds, limit=limit)), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Get the metrics of this worker in the Prometheus text format."""
+    return (
+        REGISTRY.render(),
+        200,
+        {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
     )
-    # Return the recipes
-    recipes = Recipe.query.filter(Recipe.id.in_(recipe_ids)).all()
-    result = recipes_schema.dump(recipes)
-    return jsonify(result), 200
+
+
+@app.route("/cache", methods=["GET"])
+def cache_stats():
+    """Get the hits and misses of the response cache of this worker."""
+    return jsonify(response_cache.stats), 200
+
+
+@app.route("/predict", methods=["POST"])
+def predict():
+    """Predict the average price of avocados.
+
+    The payload can be a JSON list of features (single prediction), a JSON
+    list of lists of features, or NDJSON with a list of features per line
+    (batch predictions). If the model was saved with its feature pipeline,
+    raw records (JSON objects with the original columns) are also accepted
+    and transformed by the pipeline.
+    """
+    model = model_holder.model
+    if model is None:
+        return jsonify({"error": "No model is available."}), 503
+    try:
+        if request.mimetype == "application/x-ndjson":
+            lines = request.get_data(as_text=True).splitlines()
+            rows = [json.loads(line) for line in lines if line.strip()]
+            single = False
+        else:
+            rows = request.get_json()
+            single = isinstance(rows, dict) or (
+                isinstance(rows, list) and not isinstance(rows[0], (list, dict))
+            )
+            rows = [rows] if single else rows
+        # Raw records are transformed with the pipeline of the model
+        if isinstance(rows[0], dict):
+            pipeline = getattr(model, "pipeline", None)
+            if pipeline is None:
+                return jsonify({"error": "The model does not accept raw records."}), 400
+            X = pipeline.transform({k: [r[k] for r in rows] for k in rows[0]})
+        else:
+            X = np.array(rows, dtype=float)
+    # If the payload is not valid, return an error (400)
+    except (ValueError, TypeError, KeyError, IndexError) as e:
+        return jsonify({"error": f"Invalid payload: {e}"}), 400
+    # If the number of features does not match the model, return an error (400)
+    if X.ndim != 2 or X.shape[1] != model.W.shape[0]:
+        return (
+            jsonify({"error": f"Expected rows with {model.W.shape[0]} features."}),
+            400,
+        )
+
+    preds = batcher.predict(model, X) if batcher is not None else model.predict(X)
+    if single:
+        return jsonify({"prediction": float(preds[0])}), 200
+    return jsonify({"predictions": preds.tolist()}), 200
 
 
 if __name__ == "__main__":
@@ -0,0 +1,241 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from loguru import logger
+
+from src.api.database import db
+from src.api.models import Recipe, RecipeIngredients
+
+
+# Number of set bits of each byte
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _bits(columns: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Locate columns in a bitmap packed with `np.packbits` (big-endian).
+
+    Args:
+        columns (np.ndarray): (M, ) Column indices
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (M, ) Byte of each column and (M, ) bit
+            mask of each column in its byte
+    """
+    columns = np.asarray(columns, dtype=np.int64)
+    return columns >> 3, (128 >> (columns & 7)).astype(np.uint8)
+
+
+class RecipeBitmapIndex:
+    """Recipe by ingredient bitmap, to query recipes by sets of ingredients.
+
+    Each recipe is a row of bits, one per ingredient, packed 8 per byte.
+    The queries only read the bytes of the requested ingredients and count
+    the matching bits of all the recipes at once, so they scale with the
+    number of recipes times the number of requested ingredients, regardless
+    of the total number of ingredients. Rows and columns are allocated with
+    spare capacity, so recipes are added, updated, and removed in place.
+    """
+
+    def __init__(self) -> None:
+        """Initialise an empty index."""
+        self._lock = threading.RLock()
+        self.built_at = None
+        self._reset()
+
+    def _reset(self, n_rows: int = 0, n_bytes: int = 0) -> None:
+        """Remove all the recipes.
+
+        Args:
+            n_rows (int, optional): Initial capacity in recipes. Defaults to 0
+            n_bytes (int, optional): Initial capacity in bytes per recipe.
+                Defaults to 0
+        """
+        self._rows: Dict[int, int] = {}
+        self._columns: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._n_rows = 0
+        self._bitmap = np.zeros((n_rows, n_bytes), dtype=np.uint8)
+        self._counts = np.zeros(n_rows, dtype=np.int64)
+        self._alive = np.zeros(n_rows, dtype=bool)
+        self._recipe_ids = np.zeros(n_rows, dtype=np.int64)
+
+    def __len__(self) -> int:
+        """Get the number of recipes."""
+        return len(self._rows)
+
+    def is_stale(self, max_age: float = 0) -> bool:
+        """Check whether the index must be (re)built.
+
+        Args:
+            max_age (float, optional): Seconds after which the index is
+                rebuilt, 0 never rebuilds it. Defaults to 0
+
+        Returns:
+            bool: True if the index was never built, was invalidated, or is
+                older than `max_age`
+        """
+        if self.built_at is None:
+            return True
+        return max_age > 0 and time.monotonic() - self.built_at > max_age
+
+    def invalidate(self) -> None:
+        """Rebuild the index before the next query."""
+        self.built_at = None
+
+    def rebuild(self) -> None:
+        """Rebuild the index from the database, with one query per table."""
+        recipe_ids = np.fromiter(
+            db.session.execute(db.select(Recipe.id)).scalars(), dtype=np.int64
+        )
+        links = db.session.execute(
+            db.select(RecipeIngredients.recipe_id, RecipeIngredients.ingredient_id)
+        ).all()
+        links = np.array(links, dtype=np.int64).reshape(-1, 2)
+        ingredient_ids, columns = np.unique(links[:, 1], return_inverse=True)
+        # Rows follow the order of the recipe IDs
+        recipe_ids = np.union1d(recipe_ids, links[:, 0])
+        rows = np.searchsorted(recipe_ids, links[:, 0])
+        with self._lock:
+            self._reset(len(recipe_ids), (len(ingredient_ids) + 7) // 8)
+            self._rows = dict(zip(recipe_ids.tolist(), range(len(recipe_ids))))
+            self._columns = dict(
+                zip(ingredient_ids.tolist(), range(len(ingredient_ids)))
+            )
+            self._n_rows = len(recipe_ids)
+            byte, bit = _bits(columns)
+            np.bitwise_or.at(self._bitmap, (rows, byte), bit)
+            self._counts[:] = np.bincount(rows, minlength=len(recipe_ids))
+            self._alive[:] = True
+            self._recipe_ids[:] = recipe_ids
+            self.built_at = time.monotonic()
+        logger.info(
+            f"Indexed {len(recipe_ids)} recipes with {len(ingredient_ids)} "
+            f"ingredients in a bitmap ."
+        )
+
+    def _grow(self, n_rows: int, n_bytes: int) -> None:
+        """Make room for at least `n_rows` recipes and `n_bytes` bytes each.
+
+        Args:
+            n_rows (int): Number of rows needed
+            n_bytes (int): Number of bytes needed per row
+        """
+        rows, width = self._bitmap.shape
+        if n_rows <= rows and n_bytes <= width:
+            return
+        if n_rows > rows:
+            rows = max(n_rows, 2 * rows, 64)
+        if n_bytes > width:
+            width = max(n_bytes, 2 * width, 8)
+        bitmap = np.zeros((rows, width), dtype=np.uint8)
+        bitmap[: self._bitmap.shape[0], : self._bitmap.shape[1]] = self._bitmap
+        self._bitmap = bitmap
+        for name in ("_counts", "_alive", "_recipe_ids"):
+            old = getattr(self, name)
+            new = np.zeros(rows, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def set_recipe(self, recipe_id: int, ingredient_ids: Iterable[int]) -> None:
+        """Add a recipe, or replace its ingredients.
+
+        Args:
+            recipe_id (int): ID of the recipe
+            ingredient_ids (Iterable[int]): IDs of the ingredients of the recipe
+        """
+        with self._lock:
+            columns = [
+                self._columns.setdefault(i, len(self._columns))
+                for i in set(ingredient_ids)
+            ]
+            row = self._rows.get(recipe_id)
+            if row is None:
+                row = self._free.pop() if self._free else self._n_rows
+                self._n_rows = max(self._n_rows, row + 1)
+                self._rows[recipe_id] = row
+            self._grow(self._n_rows, (len(self._columns) + 7) // 8)
+            self._bitmap[row] = 0
+            byte, bit = _bits(columns)
+            np.bitwise_or.at(self._bitmap[row], byte, bit)
+            self._counts[row] = len(columns)
+            self._alive[row] = True
+            self._recipe_ids[row] = recipe_id
+
+    def remove_recipe(self, recipe_id: int) -> None:
+        """Remove a recipe, if it is in the index.
+
+        Args:
+            recipe_id (int): ID of the recipe
+        """
+        with self._lock:
+            row = self._rows.pop(recipe_id, None)
+            if row is None:
+                return
+            self._bitmap[row] = 0
+            self._counts[row] = 0
+            self._alive[row] = False
+            self._free.append(row)
+
+    def _matches(self, ingredient_ids: Iterable[int]) -> Tuple[np.ndarray, int]:
+        """Count the requested ingredients used by each recipe.
+
+        Args:
+            ingredient_ids (Iterable[int]): IDs of the requested ingredients
+
+        Returns:
+            Tuple[np.ndarray, int]: (R, ) Number of requested ingredients used
+                by each row, and number of requested ingredients in the index
+        """
+        columns = [self._columns[i] for i in set(ingredient_ids) if i in self._columns]
+        n_rows = self._n_rows
+        if not columns:
+            return np.zeros(n_rows, dtype=np.int64), 0
+        # Only the bytes holding the requested ingredients are read
+        byte, bit = _bits(columns)
+        mask = np.zeros(self._bitmap.shape[1], dtype=np.uint8)
+        np.bitwise_or.at(mask, byte, bit)
+        used = np.flatnonzero(mask)
+        hits = self._bitmap[:n_rows, used] & mask[used]
+        return POPCOUNT[hits].sum(axis=1, dtype=np.int64), len(columns)
+
+    def cookable(
+        self, ingredient_ids: Iterable[int], max_missing: int = 0
+    ) -> List[Tuple[int, int]]:
+        """Find the recipes that can be made with a set of ingredients.
+
+        Args:
+            ingredient_ids (Iterable[int]): IDs of the available ingredients
+            max_missing (int, optional): Maximum number of ingredients of the
+                recipe that are not available. Defaults to 0
+
+        Returns:
+            List[Tuple[int, int]]: IDs of the recipes and their number of
+                missing ingredients, sorted by number of missing ingredients
+        """
+        with self._lock:
+            n_rows = self._n_rows
+            hits, _ = self._matches(ingredient_ids)
+            missing = self._counts[:n_rows] - hits
+            rows = np.flatnonzero(self._alive[:n_rows] & (missing <= max_missing))
+            rows = rows[np.lexsort((self._recipe_ids[rows], missing[rows]))]
+            return list(zip(self._recipe_ids[rows].tolist(), missing[rows].tolist()))
+
+    def using_all(self, ingredient_ids: Iterable[int]) -> List[int]:
+        """Find the recipes that use all the ingredients of a set.
+
+        Args:
+            ingredient_ids (Iterable[int]): IDs of the ingredients
+
+        Returns:
+            List[int]: IDs of the recipes, sorted
+        """
+        ingredient_ids = set(ingredient_ids)
+        with self._lock:
+            n_rows = self._n_rows
+            hits, n_known = self._matches(ingredient_ids)
+            if not ingredient_ids or n_known < len(ingredient_ids):
+                return []
+            rows = np.flatnonzero(self._alive[:n_rows] & (hits == n_known))
+            return np.sort(self._recipe_ids[rows]).tolist()
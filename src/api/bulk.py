@@ -0,0 +1,253 @@
+import json
+from typing import Iterable, Iterator, List, Tuple, Union
+
+from loguru import logger
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.base.utils import clean_string, name_ids
+from src.api.database import db, upsert
+from src.api.models import Recipe, Ingredient, RecipeIngredients, UnitOfMeasure
+
+
+RECIPE_COLUMNS = ("name", "method", "author", "book")
+INGREDIENT_KEYS = ("name", "unit_of_measure", "quantity")
+
+
+def parse_ndjson(
+    lines: Iterable[Union[str, bytes]]
+) -> Iterator[Tuple[int, Union[dict, str]]]:
+    """Parse NDJSON lines one at a time, skipping the empty ones.
+
+    Args:
+        lines (Iterable[Union[str, bytes]]): Lines of NDJSON
+
+    Yields:
+        Tuple[int, Union[dict, str]]: Line number (starting from 1) and either
+            the parsed object or the parsing error
+    """
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, "Expected a JSON object."
+            continue
+        yield line_no, record
+
+
+def _validate(record: dict, units: set) -> dict:
+    """Validate a recipe record and compute the IDs of its entities.
+
+    Args:
+        record (dict): Recipe with its list of ingredients
+        units (set): Names of the known units of measure
+
+    Returns:
+        dict: Rows of the `recipe` and `recipe_ingredients` tables, and rows
+            of the `ingredient` table to be created if missing
+    """
+    unknown = set(record) - set(RECIPE_COLUMNS) - {"ingredients"}
+    if unknown:
+        raise ValueError(f"Unknown attributes {sorted(unknown)}.")
+    if not isinstance(record.get("name"), str) or not clean_string(record["name"]):
+        raise ValueError("The recipe must have a name.")
+    ingredients = record.get("ingredients", [])
+    if not isinstance(ingredients, list):
+        raise ValueError("ingredients must be a list.")
+
+    # The recipe entrypoints are called with the cleaned name of the recipe
+    # (see `scripts/clean_string.py`) and clean it again to get the ID
+    recipe_id = name_ids.register(clean_string(record["name"]))
+    recipe = {"id": recipe_id, **{k: record.get(k) for k in RECIPE_COLUMNS}}
+    for ing in ingredients:
+        missing = [k for k in INGREDIENT_KEYS if k not in ing]
+        if missing:
+            raise ValueError(f"Ingredient attributes {missing} are missing.")
+        if ing["unit_of_measure"] not in units:
+            raise ValueError(f"Unknown unit of measure {ing['unit_of_measure']}.")
+        if not isinstance(ing["quantity"], (int, float)) or ing["quantity"] <= 0:
+            raise ValueError(f"Invalid quantity for ingredient {ing['name']}.")
+
+    ing_ids = name_ids.ids([ing["name"] for ing in ingredients], register=True)
+    links, new_ingredients = {}, {}
+    for ing_id, ing in zip(ing_ids, ingredients):
+        new_ingredients[ing_id] = {
+            "id": ing_id,
+            "name": ing["name"],
+            "ref_unit_of_measure": ing["unit_of_measure"],
+        }
+        links[ing_id] = {
+            "recipe_id": recipe_id,
+            "ingredient_id": ing_id,
+            "unit_of_measure": ing["unit_of_measure"],
+            "quantity": ing["quantity"],
+        }
+    return {
+        "recipe": recipe,
+        "ingredients": new_ingredients,
+        "links": list(links.values()),
+    }
+
+
+def _find_collisions(model, rows: List[dict]) -> Tuple[dict, set]:
+    """Find the rows whose ID is already used by an entity with another name.
+
+    All the IDs of the batch are resolved with a single `IN (...)` query.
+
+    Args:
+        model (db.Model): Recipe or Ingredient
+        rows (List[dict]): Rows with an `id` and a `name`
+
+    Returns:
+        Tuple[dict, set]: Mapping from the colliding IDs to the name already in
+            use, and the IDs that already exist
+    """
+    existing = dict(
+        db.session.execute(
+            db.select(model.id, model.name).where(model.id.in_([r["id"] for r in rows]))
+        ).all()
+    )
+    collisions = {
+        r["id"]: existing[r["id"]]
+        for r in rows
+        if r["id"] in existing
+        and clean_string(existing[r["id"]]) != clean_string(r["name"])
+    }
+    return collisions, set(existing)
+
+
+def _import_batch(batch: List[Tuple[int, dict]], report: dict) -> None:
+    """Upsert a batch of validated recipes in a single transaction.
+
+    Args:
+        batch (List[Tuple[int, dict]]): Line numbers and validated records
+        report (dict): Import report, updated in place
+    """
+    # Later records for the same recipe replace the earlier ones
+    records = {}
+    for line_no, rec in batch:
+        records[rec["recipe"]["id"]] = (line_no, rec)
+
+    recipe_collisions, existing_recipes = _find_collisions(
+        Recipe, [rec["recipe"] for _, rec in records.values()]
+    )
+    ingredients = {}
+    for _, rec in records.values():
+        ingredients.update(rec["ingredients"])
+    ingredient_collisions, existing_ingredients = _find_collisions(
+        Ingredient, list(ingredients.values())
+    )
+
+    recipes, links, used = [], [], {}
+    for line_no, rec in records.values():
+        recipe = rec["recipe"]
+        clashes = [i for i in rec["ingredients"] if i in ingredient_collisions]
+        if recipe["id"] in recipe_collisions or clashes:
+            name = (
+                recipe_collisions.get(recipe["id"]) or ingredient_collisions[clashes[0]]
+            )
+            report["errors"].append(
+                {"line": line_no, "error": f"ID already used by {name}."}
+            )
+            continue
+        recipes.append(recipe)
+        links.extend(rec["links"])
+        used.update(rec["ingredients"])
+    if not recipes:
+        return
+
+    # New ingredients take the unit of measure of the last recipe using them,
+    # existing ingredients are never modified
+    new_ingredients = [
+        ing for ing_id, ing in used.items() if ing_id not in existing_ingredients
+    ]
+    # The existing recipes are overwritten, so their ingredients that are not
+    # in the records anymore are removed
+    replaced = [r["id"] for r in recipes if r["id"] in existing_recipes]
+    try:
+        db.session.execute(upsert(Recipe.__table__, recipes, RECIPE_COLUMNS))
+        if replaced:
+            RecipeIngredients.query.filter(
+                RecipeIngredients.recipe_id.in_(replaced)
+            ).delete(synchronize_session=False)
+        if new_ingredients:
+            db.session.execute(upsert(Ingredient.__table__, new_ingredients, ["id"]))
+        if links:
+            db.session.execute(
+                upsert(
+                    RecipeIngredients.__table__,
+                    links,
+                    ["unit_of_measure", "quantity"],
+                )
+            )
+        db.session.commit()
+    # If the batch fails, report all its records and carry on with the next one
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Failed to import a batch of {len(recipes)} recipes: {e} .")
+        lines = {rec["recipe"]["id"]: line_no for line_no, rec in records.values()}
+        report["errors"].extend(
+            {
+                "line": lines[r["id"]],
+                "error": f"Database error: {getattr(e, 'orig', None) or e}",
+            }
+            for r in recipes
+        )
+        return
+
+    n_updated = sum(r["id"] in existing_recipes for r in recipes)
+    report["created"] += len(recipes) - n_updated
+    report["updated"] += n_updated
+    report["ingredients_created"] += len(new_ingredients)
+
+
+def import_recipes(lines: Iterable[Union[str, bytes]], batch_size: int = 500) -> dict:
+    """Create or update recipes in bulk from NDJSON.
+
+    Each line is a recipe with the same attributes as the payload of
+    `POST /recipes/<recipe_name>`, including its `name`. Recipes and
+    ingredients get the same IDs as with the single recipe entrypoints. Each
+    batch costs a constant number of queries: one `IN (...)` lookup for the
+    recipes and one for the ingredients, one multi-row `INSERT ... ON
+    DUPLICATE KEY UPDATE` for each table, and one `DELETE` of the ingredients
+    of the existing recipes. Existing recipes are overwritten, with only the
+    ingredients of their record, and existing ingredients are left as they
+    are. Invalid records are reported and skipped.
+
+    Args:
+        lines (Iterable[Union[str, bytes]]): Lines of NDJSON
+        batch_size (int, optional): Number of recipes committed together.
+            Defaults to 500
+
+    Returns:
+        dict: Number of recipes created and updated, number of ingredients
+            created, and the errors with their line number
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive.")
+    report = {"created": 0, "updated": 0, "ingredients_created": 0, "errors": []}
+    units = set(db.session.execute(db.select(UnitOfMeasure.name)).scalars())
+
+    batch = []
+    for line_no, record in parse_ndjson(lines):
+        try:
+            if isinstance(record, str):
+                raise ValueError(record)
+            batch.append((line_no, _validate(record, units)))
+        except (ValueError, TypeError, AttributeError) as e:
+            report["errors"].append({"line": line_no, "error": str(e)})
+        if len(batch) == batch_size:
+            _import_batch(batch, report)
+            batch = []
+    if batch:
+        _import_batch(batch, report)
+
+    logger.info(
+        f"Imported {report['created']} new and {report['updated']} updated recipes, "
+        f"{len(report['errors'])} errors ."
+    )
+    return report
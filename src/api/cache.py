@@ -0,0 +1,281 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from flask import Response, request
+from loguru import logger
+
+
+class CacheBackend:
+    """Key-value store used by the response cache.
+
+    Keys are strings and values are bytes. Backends may drop entries at any
+    time (e.g. when they are full), so a missing key is never an error.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Get a value, or None if the key is missing or has expired."""
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Set a value, expiring after `ttl` seconds (never if None)."""
+        raise NotImplementedError
+
+    def delete(self, *keys: str) -> None:
+        """Delete some keys, ignoring the missing ones."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Delete all the keys."""
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    """In-process LRU cache bounded in number of entries and in bytes.
+
+    Each worker process has its own copy. Expired entries are dropped when
+    they are read, and the least recently used entries are evicted when
+    either bound is exceeded.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 2**20) -> None:
+        """Initialise the cache.
+
+        Args:
+            max_entries (int, optional): Maximum number of entries. Defaults
+                to 1024
+            max_bytes (int, optional): Maximum total size of the values.
+                Defaults to 64 MB
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._n_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Get the number of entries."""
+        return len(self._entries)
+
+    @property
+    def n_bytes(self) -> int:
+        """Get the total size of the values."""
+        return self._n_bytes
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Get a value, or None if the key is missing or has expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Set a value, expiring after `ttl` seconds (never if None)."""
+        if len(value) > self.max_bytes:
+            return
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (value, expires_at)
+            self._n_bytes += len(value)
+            while (
+                len(self._entries) > self.max_entries or self._n_bytes > self.max_bytes
+            ):
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, *keys: str) -> None:
+        """Delete some keys, ignoring the missing ones."""
+        with self._lock:
+            for key in keys:
+                self._pop(key)
+
+    def clear(self) -> None:
+        """Delete all the keys."""
+        with self._lock:
+            self._entries.clear()
+            self._n_bytes = 0
+
+    def _pop(self, key: str) -> None:
+        """Remove a key, the lock must be held."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._n_bytes -= len(entry[0])
+
+
+class RedisCache(CacheBackend):
+    """Cache shared by all the workers, stored in Redis.
+
+    Any client with the `get`, `set`, `delete`, and `scan_iter` methods of
+    `redis.Redis` can be used, e.g. a local stand-in in development.
+    """
+
+    def __init__(self, client, prefix: str = "recipes-api:") -> None:
+        """Initialise the cache.
+
+        Args:
+            client (redis.Redis): Redis client
+            prefix (str, optional): Prefix of all the keys. Defaults to
+                "recipes-api:"
+        """
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisCache":
+        """Connect to Redis (requires the `redis` package).
+
+        Args:
+            url (str): URL of the Redis server, e.g. redis://localhost:6379/0
+
+        Returns:
+            RedisCache: The shared cache
+        """
+        import redis
+
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Get a value, or None if the key is missing or has expired."""
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Set a value, expiring after `ttl` seconds (never if None)."""
+        self.client.set(
+            self.prefix + key, value, px=None if ttl is None else int(ttl * 1000)
+        )
+
+    def delete(self, *keys: str) -> None:
+        """Delete some keys, ignoring the missing ones."""
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self) -> None:
+        """Delete all the keys."""
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class ResponseCache:
+    """Read-through cache of the JSON responses of the read entrypoints.
+
+    Responses are stored with a strong ETag (a hash of their body), and
+    requests with a matching `If-None-Match` header get a 304 Not Modified.
+    Each response is cached under a key built from the hashed IDs it depends
+    on (e.g. `recipe:<recipe_id>`), so writes invalidate exactly the affected
+    keys. The responses are grouped in namespaces (e.g. all the variants of a
+    recipe, or the pages of a list): the key of a response includes a random
+    generation of its namespace, and invalidating the namespace replaces the
+    generation, so the stale responses are never read again and are
+    eventually evicted. As the generation is read before the response is
+    built, a response built while a write is committed is cached under the
+    generation that the write then invalidates, and is never served.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: float = 300) -> None:
+        """Initialise the cache.
+
+        Args:
+            backend (Optional[CacheBackend]): Store of the responses, None
+                disables the caching (the ETags are still computed)
+            ttl (float, optional): Seconds before a response expires.
+                Defaults to 300
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self) -> dict:
+        """Get the number of hits and misses of this process."""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def key(self, name: str, namespace: Optional[str] = None) -> str:
+        """Build the key of a response.
+
+        Args:
+            name (str): Key of the response, e.g. `recipe:<recipe_id>`
+            namespace (Optional[str], optional): Namespace of the response,
+                whose current generation is included in the key. Defaults to
+                None
+
+        Returns:
+            str: Key of the response
+        """
+        if namespace is None or self.backend is None:
+            return name
+        gen_key = f"gen:{namespace}"
+        generation = self.backend.get(gen_key)
+        if generation is None:
+            generation = uuid.uuid4().hex.encode()
+            self.backend.set(gen_key, generation)
+        return f"{name}@{generation.decode()}"
+
+    def respond(self, key: str, build: Callable[[], Response]) -> Response:
+        """Get a response from the cache, or build and cache it.
+
+        Only 200 responses are cached. The response is conditional on the
+        `If-None-Match` header of the request.
+
+        Args:
+            key (str): Key of the response, see `key`
+            build (Callable[[], Response]): Function building the response
+
+        Returns:
+            Response: The response, or an empty 304 response
+        """
+        cached = self.backend.get(key) if self.backend is not None else None
+        if cached is not None:
+            self.hits += 1
+            entry = json.loads(cached)
+            response = Response(
+                entry["body"], headers=entry["headers"], mimetype="application/json"
+            )
+            response.set_etag(entry["etag"])
+        else:
+            self.misses += 1
+            response = build()
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+            response.set_etag(etag)
+            if self.backend is not None:
+                headers = {k: v for k, v in response.headers if k == "Link"}
+                entry = {"body": body.decode(), "headers": headers, "etag": etag}
+                self.backend.set(key, json.dumps(entry).encode(), self.ttl)
+        return response.make_conditional(request)
+
+    def invalidate(self, *keys: str) -> None:
+        """Invalidate some responses.
+
+        Args:
+            keys (str): Keys of the responses
+        """
+        if self.backend is not None and keys:
+            self.backend.delete(*keys)
+            logger.debug(f"Invalidated the cached responses {keys} .")
+
+    def invalidate_namespace(self, *namespaces: str) -> None:
+        """Invalidate all the responses of some namespaces.
+
+        Args:
+            namespaces (str): Namespaces of the responses
+        """
+        self.invalidate(*(f"gen:{namespace}" for namespace in namespaces))
+
+    def clear(self) -> None:
+        """Invalidate all the responses."""
+        if self.backend is not None:
+            self.backend.clear()
@@ -1,6 +1,50 @@
+from typing import List, Sequence
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
+from sqlalchemy import Table
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.sql.dml import Insert
 
 
 db = SQLAlchemy()
 ma = Marshmallow()
+
+
+@compiles(CreateColumn, "sqlite")
+def _create_sqlite_column(element, compiler, **kw) -> str:
+    """Create a column in SQLite, which has no `ON UPDATE` clause.
+
+    The `updated_at` columns are then only set when the rows are inserted.
+    """
+    return compiler.visit_create_column(element, **kw).replace(
+        " ON UPDATE CURRENT_TIMESTAMP", ""
+    )
+
+
+def upsert(table: Table, rows: List[dict], update_columns: Sequence[str]) -> Insert:
+    """Build a multi-row `INSERT ... ON DUPLICATE KEY UPDATE` statement.
+
+    With SQLite, the statement is an `INSERT ... ON CONFLICT DO UPDATE` on the
+    primary key instead.
+
+    Args:
+        table (Table): Table where the rows are inserted
+        rows (List[dict]): Rows to be inserted, all with the same keys
+        update_columns (Sequence[str]): Columns overwritten with the new values
+            when a row already exists. Passing only the primary key leaves the
+            existing rows unchanged
+
+    Returns:
+        Insert: The statement, to be executed in the current session
+    """
+    if db.engine.dialect.name == "sqlite":
+        stmt = sqlite.insert(table).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=list(table.primary_key.columns),
+            set_={c: stmt.excluded[c] for c in update_columns},
+        )
+    stmt = mysql.insert(table).values(rows)
+    return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in update_columns})
@@ -0,0 +1,157 @@
+import json
+import datetime
+import itertools
+from operator import itemgetter
+from typing import Iterable, Iterator, Tuple
+
+from src.api.database import db
+from src.api.models import (
+    Recipe,
+    Ingredient,
+    RecipeIngredients,
+    RecipeSchema,
+    IngredientSchema,
+)
+
+
+def _fields(schema, exclude: Iterable[str] = ()) -> Tuple[str, ...]:
+    """Get the names of the fields dumped by a schema, sorted like `jsonify`.
+
+    Args:
+        schema (ma.SQLAlchemyAutoSchema): Schema
+        exclude (Iterable[str], optional): Fields to leave out. Defaults to ()
+
+    Returns:
+        Tuple[str, ...]: Names of the fields
+    """
+    return tuple(sorted(set(schema.dump_fields) - set(exclude)))
+
+
+# Fields of the records, the same as the ones of the schemas of the API. The
+# ingredients of a recipe are dumped as (ingredient, quantity, unit_of_measure)
+RECIPE_FIELDS = _fields(RecipeSchema(), exclude=["ingredients"])
+RECIPE_INGREDIENT_FIELDS = _fields(RecipeSchema().fields["ingredients"].schema)
+INGREDIENT_FIELDS = _fields(IngredientSchema())
+
+
+def _default(value):
+    """Serialise the values that JSON does not support, as marshmallow does.
+
+    Args:
+        value: Value of a column
+
+    Returns:
+        str: The date or time in the ISO 8601 format
+    """
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serialisable.")
+
+
+# Keys sorted like `jsonify`
+_encoder = json.JSONEncoder(default=_default, separators=(",", ":"), sort_keys=True)
+
+
+def _stream(stmt, batch_size: int):
+    """Execute a query with a server-side cursor.
+
+    Args:
+        stmt (Select): Query
+        batch_size (int): Number of rows fetched at a time
+
+    Returns:
+        Result: Rows of the query, fetched `batch_size` at a time
+    """
+    return db.session.execute(
+        stmt.execution_options(stream_results=True, yield_per=batch_size)
+    )
+
+
+def _chunks(lines: Iterable[str], batch_size: int) -> Iterator[str]:
+    """Join lines in chunks, to write the response in fewer calls.
+
+    Args:
+        lines (Iterable[str]): NDJSON lines
+        batch_size (int): Number of lines per chunk
+
+    Yields:
+        str: Chunk of lines
+    """
+    lines = iter(lines)
+    while True:
+        chunk = "".join(itertools.islice(lines, batch_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def export_recipes(batch_size: int = 1000) -> Iterator[str]:
+    """Export all the recipes with their ingredients, one JSON record per line.
+
+    The recipes are read with a single query joining their ingredients,
+    sorted by recipe and fetched in batches from a server-side cursor, and
+    the consecutive rows of each recipe are grouped as they arrive. Only one
+    batch of rows is held in memory at a time, whatever the number of
+    recipes. Each record is the same as in `GET /recipes/<recipe-name>`.
+
+    Args:
+        batch_size (int, optional): Number of rows fetched, and of records
+            yielded, at a time. Defaults to 1000
+
+    Yields:
+        str: Chunk of NDJSON lines
+    """
+    # The ingredient is dumped by name
+    ingredient_columns = [
+        Ingredient.name if f == "ingredient" else getattr(RecipeIngredients, f)
+        for f in RECIPE_INGREDIENT_FIELDS
+    ]
+    stmt = (
+        db.select(*[getattr(Recipe, f) for f in RECIPE_FIELDS], *ingredient_columns)
+        .outerjoin(RecipeIngredients, RecipeIngredients.recipe_id == Recipe.id)
+        .outerjoin(Ingredient, Ingredient.id == RecipeIngredients.ingredient_id)
+        .order_by(Recipe.id)
+    )
+    n_recipe = len(RECIPE_FIELDS)
+    recipe_id = itemgetter(RECIPE_FIELDS.index("id"))
+    # Ingredient columns of the recipes without ingredients
+    no_ingredient = (None,) * len(RECIPE_INGREDIENT_FIELDS)
+
+    def records() -> Iterator[str]:
+        rows = _stream(stmt, batch_size)
+        for _, group in itertools.groupby(rows, key=recipe_id):
+            group = list(group)
+            record = dict(zip(RECIPE_FIELDS, group[0][:n_recipe]))
+            record["ingredients"] = [
+                dict(zip(RECIPE_INGREDIENT_FIELDS, row[n_recipe:]))
+                for row in group
+                if tuple(row[n_recipe:]) != no_ingredient
+            ]
+            yield _encoder.encode(record) + "\n"
+
+    yield from _chunks(records(), batch_size)
+
+
+def export_ingredients(batch_size: int = 1000) -> Iterator[str]:
+    """Export all the ingredients, one JSON record per line.
+
+    The ingredients are fetched in batches from a server-side cursor, so only
+    one batch is held in memory at a time. Each record is the same as in
+    `GET /ingredients`.
+
+    Args:
+        batch_size (int, optional): Number of rows fetched, and of records
+            yielded, at a time. Defaults to 1000
+
+    Yields:
+        str: Chunk of NDJSON lines
+    """
+    stmt = db.select(*[getattr(Ingredient, f) for f in INGREDIENT_FIELDS]).order_by(
+        Ingredient.id
+    )
+
+    def records() -> Iterator[str]:
+        for row in _stream(stmt, batch_size):
+            yield _encoder.encode(dict(zip(INGREDIENT_FIELDS, row))) + "\n"
+
+    yield from _chunks(records(), batch_size)
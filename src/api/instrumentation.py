@@ -0,0 +1,93 @@
+import time
+
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.base.telemetry import REGISTRY, Counter, Histogram
+
+
+# Buckets of the number of statements executed by a request
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Duration of the requests, by route.",
+        labels=("method", "route", "status"),
+    )
+)
+REQUEST_STATEMENTS = REGISTRY.register(
+    Histogram(
+        "http_request_db_statements",
+        "Number of SQL statements executed by each request, by route.",
+        labels=("route",),
+        buckets=STATEMENT_BUCKETS,
+    )
+)
+REQUEST_DB_SECONDS = REGISTRY.register(
+    Histogram(
+        "http_request_db_duration_seconds",
+        "Time spent executing SQL statements by each request, by route.",
+        labels=("route",),
+    )
+)
+STATEMENT_SECONDS = REGISTRY.register(
+    Histogram("db_statement_duration_seconds", "Duration of the SQL statements.")
+)
+STATEMENTS = REGISTRY.register(
+    Counter("db_statements", "Number of SQL statements executed.")
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Start timing a SQL statement."""
+    conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Record the duration of a SQL statement, and add it to the request."""
+    elapsed = time.perf_counter() - conn.info["statement_start"].pop()
+    STATEMENT_SECONDS.observe(elapsed)
+    STATEMENTS.inc()
+    if has_request_context() and "db_statements" in g:
+        g.db_statements += 1
+        g.db_seconds += elapsed
+
+
+def _route() -> str:
+    """Get the route of the current request (its rule, not its URL)."""
+    return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+
+def instrument(app: Flask) -> None:
+    """Record the duration and the SQL statements of each request of an app.
+
+    The metrics are only kept in memory (see `src.base.telemetry.REGISTRY`),
+    so recording them costs a few microseconds per request and per statement.
+
+    Args:
+        app (Flask): The app
+    """
+
+    @app.before_request
+    def start_request() -> None:
+        g.request_start = time.perf_counter()
+        g.db_statements = 0
+        g.db_seconds = 0.0
+
+    @app.after_request
+    def end_request(response):
+        if "request_start" in g:
+            route = _route()
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - g.request_start,
+                method=request.method,
+                route=route,
+                status=response.status_code,
+            )
+            REQUEST_STATEMENTS.observe(g.db_statements, route=route)
+            REQUEST_DB_SECONDS.observe(g.db_seconds, route=route)
+        return response
@@ -0,0 +1,257 @@
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from src.api.database import db
+from src.api.models import Recipe, Ingredient
+
+
+# Weight of the terms of each field, the names matter more than the methods
+FIELD_WEIGHTS = {"name": 3, "author": 1, "method": 1}
+RECIPE_FIELDS = ("name", "method", "author")
+INGREDIENT_FIELDS = ("name",)
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+Key = Tuple[str, int]
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split a text into lowercase alphanumerical terms, without accents.
+
+    Args:
+        text (Optional[str]): Text to be split
+
+    Returns:
+        List[str]: Terms of the text
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def trigrams(term: str) -> set:
+    """Get the character trigrams of a term, padded as in PostgreSQL pg_trgm.
+
+    Args:
+        term (str): Term
+
+    Returns:
+        set: Trigrams of the term
+    """
+    padded = f"  {term} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """In-memory inverted index of the recipes and the ingredients.
+
+    Each document (a recipe or an ingredient) is split into terms, weighted
+    by the field they come from, and the documents are ranked with BM25. A
+    second inverted index maps the character trigrams to the terms, so each
+    term of the query is expanded to the terms of the index with a similar
+    spelling (trigram similarity), which handles misspelt and partial names.
+    The index is built with one scan of each table and updated one document
+    at a time.
+    """
+
+    def __init__(self, min_similarity: float = 0.3, max_expansions: int = 10) -> None:
+        """Initialise an empty index.
+
+        Args:
+            min_similarity (float, optional): Minimum trigram similarity
+                between a term of the query and a term of the index.
+                Defaults to 0.3
+            max_expansions (int, optional): Maximum number of terms of the
+                index matched by each term of the query. Defaults to 10
+        """
+        self.min_similarity = min_similarity
+        self.max_expansions = max_expansions
+        self._lock = threading.RLock()
+        self.built_at = None
+        self._reset()
+
+    def _reset(self) -> None:
+        """Remove all the documents."""
+        # Term frequencies by document, postings by term, terms by trigram
+        self._docs: Dict[Key, Counter] = {}
+        self._names: Dict[Key, str] = {}
+        self._lengths: Dict[Key, int] = {}
+        self._postings: Dict[str, Dict[Key, int]] = {}
+        self._trigrams: Dict[str, set] = {}
+        self._n_trigrams: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        """Get the number of documents."""
+        return len(self._docs)
+
+    def is_stale(self, max_age: float = 0) -> bool:
+        """Check whether the index must be (re)built.
+
+        Args:
+            max_age (float, optional): Seconds after which the index is
+                rebuilt, 0 never rebuilds it. Defaults to 0
+
+        Returns:
+            bool: True if the index was never built, was invalidated, or is
+                older than `max_age`
+        """
+        if self.built_at is None:
+            return True
+        return max_age > 0 and time.monotonic() - self.built_at > max_age
+
+    def invalidate(self) -> None:
+        """Rebuild the index before the next search."""
+        self.built_at = None
+
+    def rebuild(self) -> None:
+        """Rebuild the index from the database, with one query per table."""
+        recipes = db.session.execute(
+            db.select(*(getattr(Recipe, c) for c in ("id",) + RECIPE_FIELDS))
+        ).all()
+        ingredients = db.session.execute(
+            db.select(*(getattr(Ingredient, c) for c in ("id",) + INGREDIENT_FIELDS))
+        ).all()
+        start = time.perf_counter()
+        with self._lock:
+            self._reset()
+            for row in recipes:
+                self.add("recipe", row[0], dict(zip(RECIPE_FIELDS, row[1:])))
+            for row in ingredients:
+                self.add("ingredient", row[0], dict(zip(INGREDIENT_FIELDS, row[1:])))
+            self.built_at = time.monotonic()
+        logger.info(
+            f"Indexed {len(recipes)} recipes and {len(ingredients)} ingredients "
+            f"in {time.perf_counter() - start:.3f}s ."
+        )
+
+    def add(self, kind: str, id: int, fields: dict) -> None:
+        """Add a document, replacing the previous version if any.
+
+        Args:
+            kind (str): Type of the document (`recipe` or `ingredient`)
+            id (int): ID of the document
+            fields (dict): Text of each field of the document
+        """
+        terms = Counter()
+        for field, text in fields.items():
+            for term in tokenize(text):
+                terms[term] += FIELD_WEIGHTS[field]
+        key = (kind, id)
+        with self._lock:
+            self.remove(kind, id)
+            self._docs[key] = terms
+            self._names[key] = fields.get("name")
+            self._lengths[key] = sum(terms.values())
+            self._total_length += self._lengths[key]
+            for term, tf in terms.items():
+                postings = self._postings.setdefault(term, {})
+                if not postings:
+                    term_trigrams = trigrams(term)
+                    self._n_trigrams[term] = len(term_trigrams)
+                    for trigram in term_trigrams:
+                        self._trigrams.setdefault(trigram, set()).add(term)
+                postings[key] = tf
+
+    def remove(self, kind: str, id: int) -> None:
+        """Remove a document, if it is in the index.
+
+        Args:
+            kind (str): Type of the document (`recipe` or `ingredient`)
+            id (int): ID of the document
+        """
+        key = (kind, id)
+        with self._lock:
+            terms = self._docs.pop(key, None)
+            if terms is None:
+                return
+            del self._names[key]
+            self._total_length -= self._lengths.pop(key)
+            for term in terms:
+                postings = self._postings[term]
+                del postings[key]
+                if postings:
+                    continue
+                # The term is not used anymore
+                del self._postings[term]
+                del self._n_trigrams[term]
+                for trigram in trigrams(term):
+                    self._trigrams[trigram].discard(term)
+                    if not self._trigrams[trigram]:
+                        del self._trigrams[trigram]
+
+    def _expand(self, term: str) -> Dict[str, float]:
+        """Find the terms of the index spelt similarly to a term of the query.
+
+        Args:
+            term (str): Term of the query
+
+        Returns:
+            Dict[str, float]: Similarity of the most similar terms
+        """
+        query = trigrams(term)
+        shared = Counter()
+        for trigram in query:
+            shared.update(self._trigrams.get(trigram, ()))
+        similarity = {
+            t: n / (len(query) + self._n_trigrams[t] - n) for t, n in shared.items()
+        }
+        similar = sorted(
+            (t for t, s in similarity.items() if s >= self.min_similarity),
+            key=lambda t: (-similarity[t], t),
+        )[: self.max_expansions]
+        return {t: similarity[t] for t in similar}
+
+    def search(
+        self,
+        query: str,
+        kinds: Iterable[str] = ("recipe", "ingredient"),
+        limit: int = 10,
+    ) -> List[dict]:
+        """Rank the documents matching a query.
+
+        Args:
+            query (str): Text of the query
+            kinds (Iterable[str], optional): Types of documents returned.
+                Defaults to ("recipe", "ingredient")
+            limit (int, optional): Maximum number of results. Defaults to 10
+
+        Returns:
+            List[dict]: Type, ID, name, and score of the best documents
+        """
+        kinds = set(kinds)
+        scores = Counter()
+        with self._lock:
+            n_docs = len(self._docs)
+            if n_docs == 0:
+                return []
+            avg_length = self._total_length / n_docs
+            for q_term in set(tokenize(query)):
+                for term, similarity in self._expand(q_term).items():
+                    postings = self._postings[term]
+                    df = len(postings)
+                    weight = similarity * math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                    for key, tf in postings.items():
+                        if key[0] not in kinds:
+                            continue
+                        norm = 1 - B + B * self._lengths[key] / avg_length
+                        scores[key] += weight * tf * (K1 + 1) / (tf + K1 * norm)
+            best = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+            return [
+                {
+                    "type": kind,
+                    "id": id,
+                    "name": self._names[(kind, id)],
+                    "score": round(score, 4),
+                }
+                for (kind, id), score in best
+            ]
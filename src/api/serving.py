@@ -0,0 +1,213 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+from src.base.model import GroupedLinearRegression, LinearRegression
+
+
+def load_model(file_name: os.PathLike) -> Optional[LinearRegression]:
+    """Load the model to be served, if available.
+
+    Grouped models need the group of each row, which is not part of the rows
+    sent to `/predict`, so they are not served.
+
+    Args:
+        file_name (os.PathLike): Path of the serialised model
+
+    Returns:
+        Optional[LinearRegression]: The pre-trained model, or None if the
+            file does not exist or the model cannot be served
+    """
+    if not os.path.exists(file_name):
+        logger.warning(f"Model file {file_name} not found, /predict is disabled.")
+        return None
+    model = LinearRegression.load_model(file_name)
+    if isinstance(model, GroupedLinearRegression):
+        logger.error(
+            f"The model in {file_name} is a {type(model).__name__}, which needs "
+            "the group of each row, /predict is disabled."
+        )
+        return None
+    return model
+
+
+class ModelHolder:
+    """Hold the served model and optionally hot reload it when its file changes.
+
+    A background thread polls the model file every `reload_interval` seconds.
+    When the file changes, the new model is fully loaded before replacing the
+    reference to the old one, so in-flight requests finish with the model
+    they started with and no request is dropped. If the new file cannot be
+    loaded, the old model keeps being served. Model artifacts are written
+    with an atomic rename (see `src.base.artifact`), so a partially written
+    file is never picked up.
+    """
+
+    def __init__(self, file_name: os.PathLike, reload_interval: float = 0) -> None:
+        """Load the model.
+
+        Args:
+            file_name (os.PathLike): Path of the serialised model
+            reload_interval (float, optional): Seconds between two checks of
+                the model file, 0 disables the hot reload. Defaults to 0
+        """
+        self.file_name = file_name
+        self.reload_interval = reload_interval
+        self._signature = self._file_signature()
+        self._model = load_model(file_name)
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _file_signature(self) -> Optional[tuple]:
+        """Get the inode, modification time, and size of the model file."""
+        try:
+            stat = os.stat(self.file_name)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @property
+    def model(self) -> Optional[LinearRegression]:
+        """Get the current model."""
+        if self.reload_interval > 0 and self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    threading.Thread(target=self._run, daemon=True).start()
+                    self._pid = os.getpid()
+        return self._model
+
+    def reload(self) -> bool:
+        """Reload the model if its file has changed.
+
+        Returns:
+            bool: True if a new model has been loaded
+        """
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            return False
+        try:
+            model = LinearRegression.load_model(self.file_name)
+            if isinstance(model, GroupedLinearRegression):
+                raise ValueError(f"a {type(model).__name__} cannot be served")
+        except Exception as e:
+            logger.error(f"Failed to reload the model from {self.file_name}: {e} .")
+            return False
+        # Swapping the reference is atomic, requests see either model
+        self._model = model
+        self._signature = signature
+        logger.info(f"Reloaded the model from {self.file_name} .")
+        return True
+
+    def _run(self) -> None:
+        """Check the model file for changes, forever."""
+        while True:
+            time.sleep(self.reload_interval)
+            self.reload()
+
+
+class MicroBatcher:
+    """Collect concurrent prediction requests and score them with a single call.
+
+    Each caller submits its rows with the model they were validated against
+    and blocks until they are scored. A background thread waits up to
+    `max_wait_ms` after the first pending request (or until `max_batch_size`
+    rows are pending), stacks the pending rows of each model, and runs one
+    `predict` per model. The rows are never scored with another model, so a
+    hot reload that changes the number of features while requests are
+    pending does not fail the batch. This only helps when the server handles
+    requests concurrently, e.g. with the gunicorn `gthread` worker class.
+    """
+
+    def __init__(self, max_wait_ms: float = 2.0, max_batch_size: int = 4096) -> None:
+        """Initialise the batcher.
+
+        Args:
+            max_wait_ms (float, optional): Maximum time in milliseconds that a
+                request waits for other requests. Defaults to 2
+            max_batch_size (int, optional): Maximum number of rows scored
+                together. Defaults to 4096
+        """
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self) -> None:
+        """Start the background thread in the current process.
+
+        The thread is started lazily so that it is created in each forked
+        worker rather than in the process that imported the app.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, daemon=True).start()
+                self._pid = os.getpid()
+
+    def predict(self, model: LinearRegression, X: np.ndarray) -> np.ndarray:
+        """Score a batch of inputs together with any concurrent request.
+
+        Args:
+            model (LinearRegression): Model scoring the inputs
+            X (np.ndarray): (N, p) Input data
+
+        Returns:
+            np.ndarray: (N, ) Model predictions
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((model, X, future))
+        return future.result()
+
+    def _run(self) -> None:
+        """Score the pending requests in batches, forever."""
+        while True:
+            batch = [self._queue.get()]
+            n_rows = len(batch[0][1])
+            deadline = time.monotonic() + self.max_wait
+            while n_rows < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                n_rows += len(item[1])
+
+            # Requests validated against different models (around a hot
+            # reload) are scored separately
+            groups = {}
+            for model, X, future in batch:
+                groups.setdefault(id(model), (model, []))[1].append((X, future))
+            for model, requests in groups.values():
+                self._score(model, requests)
+            logger.debug(f"Scored {len(batch)} requests with {n_rows} rows .")
+
+    @staticmethod
+    def _score(model: LinearRegression, requests: list) -> None:
+        """Score the stacked rows of the requests of one model.
+
+        Args:
+            model (LinearRegression): Model scoring the rows
+            requests (list): (X, future) of each request
+        """
+        try:
+            preds = model.predict(np.concatenate([X for X, _ in requests]))
+        except Exception as e:
+            for _, future in requests:
+                future.set_exception(e)
+            return
+        offsets = np.cumsum([len(X) for X, _ in requests])[:-1]
+        for (_, future), res in zip(requests, np.split(preds, offsets)):
+            future.set_result(res)
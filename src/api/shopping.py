@@ -0,0 +1,95 @@
+from typing import Dict
+
+import numpy as np
+
+from src.api.database import db
+from src.api.models import Recipe, Ingredient, RecipeIngredients
+from src.api.units import UnitConverter
+
+
+def shopping_list(servings: Dict[int, float], converter: UnitConverter) -> dict:
+    """Sum and price the ingredients of a meal plan.
+
+    All the ingredients of all the recipes are fetched with a single query,
+    then converted to the reference unit of measure of each ingredient,
+    scaled by the servings of their recipe, summed by ingredient, and priced
+    with the reference price of the ingredient, as array operations. The
+    quantities that cannot be converted to the reference unit are summed in
+    their own unit and are not priced.
+
+    Args:
+        servings (Dict[int, float]): Multiplier of the quantities of each
+            recipe, by recipe ID
+        converter (UnitConverter): Converter between units of measure
+
+    Returns:
+        dict: Recipes found (with their servings), total quantity and cost of
+            each ingredient, and total cost
+    """
+    rows = db.session.execute(
+        db.select(
+            Recipe.id,
+            Recipe.name,
+            RecipeIngredients.ingredient_id,
+            RecipeIngredients.unit_of_measure,
+            RecipeIngredients.quantity,
+            Ingredient.name,
+            Ingredient.ref_unit_of_measure,
+            Ingredient.ref_quantity,
+            Ingredient.ref_price,
+        )
+        .outerjoin(RecipeIngredients, RecipeIngredients.recipe_id == Recipe.id)
+        .outerjoin(Ingredient, Ingredient.id == RecipeIngredients.ingredient_id)
+        .where(Recipe.id.in_(list(servings)))
+    ).all()
+    recipes = {r[0]: r[1] for r in rows}
+    rows = [r for r in rows if r[2] is not None]
+    report = {
+        "recipes": [
+            {"id": i, "name": name, "servings": servings[i]}
+            for i, name in recipes.items()
+        ],
+        "items": [],
+        "total_cost": 0.0,
+    }
+    if not rows:
+        return report
+
+    cols = list(zip(*rows))
+    recipe_ids, ing_ids = np.array(cols[0]), np.array(cols[2])
+    uoms, quantities = np.array(cols[3], dtype=object), np.array(cols[4], dtype=float)
+    names, ref_uoms = np.array(cols[5], dtype=object), np.array(cols[6], dtype=object)
+    ref_qty, ref_price = np.array(cols[7], dtype=float), np.array(cols[8], dtype=float)
+    # Quantities in the reference unit of each ingredient, or in their own
+    # unit if they cannot be converted to it
+    factors = converter.factors[converter.indices(uoms), converter.indices(ref_uoms)]
+    convertible = np.isfinite(factors)
+    multipliers = np.array([servings[i] for i in recipe_ids.tolist()])
+    scaled = quantities * np.where(convertible, factors, 1) * multipliers
+    units = np.where(convertible, ref_uoms, uoms)
+
+    # Group by ingredient and unit
+    _, ing_codes = np.unique(ing_ids, return_inverse=True)
+    _, unit_codes = np.unique(units.astype(str), return_inverse=True)
+    groups, first, inverse = np.unique(
+        ing_codes * (unit_codes.max() + 1) + unit_codes,
+        return_index=True,
+        return_inverse=True,
+    )
+    totals = np.bincount(inverse, weights=scaled, minlength=len(groups))
+    costs = np.where(
+        convertible[first], totals / ref_qty[first] * ref_price[first], np.nan
+    )
+
+    order = np.lexsort((units[first].astype(str), names[first].astype(str)))
+    report["items"] = [
+        {
+            "ingredient": names[first[g]],
+            "quantity": float(totals[g]),
+            "unit_of_measure": units[first[g]],
+            "cost": round(float(costs[g]), 2) if np.isfinite(costs[g]) else None,
+        }
+        for g in order.tolist()
+    ]
+    report["total_cost"] = round(float(np.nansum(costs)), 2)
+    return report
@@ -0,0 +1,82 @@
+from sqlalchemy.pool import StaticPool
+
+from src.api.database import db
+from src.api.models import UnitOfMeasure, uom_conversion
+
+
+# Units of measure and conversions inserted by `scripts/db/init.sql`
+UNITS = [
+    ("unit", "unit"),
+    ("tsp", "teaspoon"),
+    ("tbsp", "tablespoon"),
+    ("g", "gram"),
+    ("kg", "kilogram"),
+    ("l", "litre"),
+    ("ml", "millilitre"),
+    ("handful", "handful"),
+    ("glass", "glass"),
+]
+CONVERSIONS = [
+    ("l", "ml", 1000),
+    ("ml", "l", 0.001),
+    ("kg", "g", 1000),
+    ("g", "kg", 0.001),
+]
+
+
+def in_memory(database_uri: str) -> bool:
+    """Check whether a database URI is an in-memory SQLite database.
+
+    Args:
+        database_uri (str): URI of the database
+
+    Returns:
+        bool: True if the database is in memory
+    """
+    return database_uri in ("sqlite://", "sqlite:///:memory:")
+
+
+def engine_options(database_uri: str) -> dict:
+    """Get the options of the engine of a SQLite database.
+
+    An in-memory database only lives as long as its connection, so all the
+    threads share a single connection, and the requests must be served one at
+    a time (e.g. `flask run --without-threads`). A database file gets a
+    connection per thread, waiting for the other writers rather than failing
+    straight away.
+
+    Args:
+        database_uri (str): URI of the database, e.g. `sqlite://` (in memory)
+            or `sqlite:////tmp/recipes.db`
+
+    Returns:
+        dict: Keyword arguments of `create_engine`
+    """
+    if in_memory(database_uri):
+        return {
+            "poolclass": StaticPool,
+            "connect_args": {"check_same_thread": False},
+        }
+    return {"connect_args": {"check_same_thread": False, "timeout": 30}}
+
+
+def create_schema() -> None:
+    """Create the tables and the units of measure, if missing.
+
+    The tables are created from the models (see `scripts/db/init.sql` for the
+    MySQL ones), and each unit of measure can be converted to itself, as the
+    MySQL trigger does. Must run in the app context.
+    """
+    db.create_all()
+    if db.session.execute(db.select(UnitOfMeasure.name).limit(1)).first():
+        return
+    db.session.execute(
+        db.insert(UnitOfMeasure.__table__),
+        [{"name": name, "name_long": name_long} for name, name_long in UNITS],
+    )
+    db.session.execute(
+        db.insert(uom_conversion),
+        [{"uom_from": u, "uom_to": u, "factor": 1} for u, _ in UNITS]
+        + [{"uom_from": u, "uom_to": v, "factor": f} for u, v, f in CONVERSIONS],
+    )
+    db.session.commit()
@@ -0,0 +1,187 @@
+import threading
+import time
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from src.api.database import db
+from src.api.models import UnitOfMeasure, uom_conversion
+
+
+class UnknownUnitError(ValueError):
+    """Raised when a unit of measure is not in the conversion matrix."""
+
+
+class UnitConverter:
+    """Convert quantities between units of measure with a dense factor matrix.
+
+    The `uom_conversion` table only stores direct conversions (e.g. l to ml).
+    The converter loads the whole table once and completes it with the
+    inverse conversions and with the transitive closure of the conversion
+    graph, keeping for each pair of units the path with the fewest hops (the
+    most precise one). `factors[i, j]` converts a quantity in unit `i` to unit
+    `j`, and is NaN if the units cannot be converted into one another.
+    """
+
+    def __init__(self) -> None:
+        """Initialise an empty converter."""
+        self._lock = threading.Lock()
+        self.built_at = None
+        self.units = np.array([], dtype=object)
+        self.factors = np.empty((0, 0))
+
+    def is_stale(self, max_age: float = 0) -> bool:
+        """Check whether the factors must be (re)loaded.
+
+        Args:
+            max_age (float, optional): Seconds after which the factors are
+                reloaded, 0 never reloads them. Defaults to 0
+
+        Returns:
+            bool: True if the factors were never loaded, were invalidated, or
+                are older than `max_age`
+        """
+        if self.built_at is None:
+            return True
+        return max_age > 0 and time.monotonic() - self.built_at > max_age
+
+    def invalidate(self) -> None:
+        """Reload the factors before the next conversion."""
+        self.built_at = None
+
+    def rebuild(self) -> None:
+        """Load the units and the conversions, with one query per table."""
+        units = db.session.execute(db.select(UnitOfMeasure.name)).scalars().all()
+        conversions = db.session.execute(
+            db.select(
+                uom_conversion.c.uom_from,
+                uom_conversion.c.uom_to,
+                uom_conversion.c.factor,
+            )
+        ).all()
+        units, factors = self.closure(units, conversions)
+        with self._lock:
+            self.units, self.factors = units, factors
+            self.built_at = time.monotonic()
+        logger.info(
+            f"Loaded {len(conversions)} conversions between {len(units)} units, "
+            f"{int(np.isfinite(factors).sum())} pairs can be converted ."
+        )
+
+    @staticmethod
+    def closure(
+        units: Sequence[str], conversions: Sequence[Tuple[str, str, float]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Compute the conversion factors between all the pairs of units.
+
+        Args:
+            units (Sequence[str]): Names of the units
+            conversions (Sequence[Tuple[str, str, float]]): Direct conversions,
+                as (from, to, factor)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (U, ) Sorted names of the units, and
+                (U, U) factors between them (NaN if they cannot be converted)
+        """
+        units = np.array(sorted(set(units)), dtype=object)
+        n_units = len(units)
+        index = {u: i for i, u in enumerate(units)}
+        factors = np.full((n_units, n_units), np.nan)
+        hops = np.full((n_units, n_units), np.inf)
+        np.fill_diagonal(factors, 1.0)
+        np.fill_diagonal(hops, 0)
+        # Direct conversions take precedence over the inverse ones
+        edges = [(u, v, f) for u, v, f in conversions if u in index and v in index]
+        for u, v, f in edges:
+            i, j = index[v], index[u]
+            if hops[i, j] > 1:
+                factors[i, j], hops[i, j] = 1 / f, 1
+        for u, v, f in edges:
+            i, j = index[u], index[v]
+            if i != j:
+                factors[i, j], hops[i, j] = f, 1
+
+        # Floyd-Warshall on the number of hops, all the pairs at once for each
+        # intermediate unit
+        for k in range(n_units):
+            through = hops[:, k, np.newaxis] + hops[np.newaxis, k, :]
+            shorter = through < hops
+            hops = np.where(shorter, through, hops)
+            factors = np.where(
+                shorter, factors[:, k, np.newaxis] * factors[np.newaxis, k, :], factors
+            )
+        return units, factors
+
+    def indices(self, units: Sequence[str]) -> np.ndarray:
+        """Get the indices of some units in the factor matrix.
+
+        Args:
+            units (Sequence[str]): Names of the units
+
+        Returns:
+            np.ndarray: (N, ) Indices of the units
+
+        Raises:
+            UnknownUnitError: If a unit is not known
+        """
+        units = np.asarray(units, dtype=object)
+        idx = np.searchsorted(self.units, units)
+        known = idx < len(self.units)
+        known[known] = self.units[idx[known]] == units[known]
+        if not known.all():
+            unknown = sorted(set(units[~known].tolist()))
+            raise UnknownUnitError(f"Unknown units of measure {unknown}.")
+        return idx
+
+    def convert(
+        self,
+        quantities: Sequence[float],
+        from_units: Sequence[str],
+        to_units: Sequence[str],
+    ) -> np.ndarray:
+        """Convert quantities between units.
+
+        Args:
+            quantities (Sequence[float]): (N, ) Quantities
+            from_units (Sequence[str]): (N, ) Unit of each quantity
+            to_units (Sequence[str]): (N, ) Unit each quantity is converted to
+
+        Returns:
+            np.ndarray: (N, ) Converted quantities, NaN if the units cannot be
+                converted into one another
+        """
+        factors = self.factors
+        return (
+            np.asarray(quantities, dtype=float)
+            * factors[self.indices(from_units), self.indices(to_units)]
+        )
+
+    def to_preferred(
+        self,
+        quantities: Sequence[float],
+        from_units: Sequence[str],
+        preferred: Sequence[str],
+    ) -> Tuple[np.ndarray, List[str]]:
+        """Convert quantities to the first preferred unit they can be converted to.
+
+        Args:
+            quantities (Sequence[float]): (N, ) Quantities
+            from_units (Sequence[str]): (N, ) Unit of each quantity
+            preferred (Sequence[str]): Units in order of preference
+
+        Returns:
+            Tuple[np.ndarray, List[str]]: (N, ) Converted quantities and their
+                units, unchanged if they cannot be converted to any of the
+                preferred units
+        """
+        quantities = np.asarray(quantities, dtype=float)
+        factors = self.factors
+        src = self.indices(from_units)
+        dst = src.copy()
+        pending = np.ones(len(src), dtype=bool)
+        for target in self.indices(preferred):
+            convertible = pending & np.isfinite(factors[src, target])
+            dst[convertible] = target
+            pending &= ~convertible
+        return quantities * factors[src, dst], self.units[dst].tolist()
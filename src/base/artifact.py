@@ -0,0 +1,233 @@
+import os
+import json
+import struct
+import hashlib
+import tempfile
+from typing import Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+
+# Layout of an artifact file:
+#   - 8 bytes magic string
+#   - 4 bytes little-endian length of the header
+#   - JSON header, padded with spaces so the data starts on an aligned offset
+#   - raw arrays, each starting on an aligned offset
+MAGIC = b"AVOMODEL"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+ARRAYS = ("W", "b", "t_scores")
+
+
+def _read_umask() -> int:
+    """Read the umask of the process.
+
+    Linux exposes it in `/proc`, elsewhere it can only be read by setting it,
+    which is done once at import time rather than while other threads may be
+    creating files.
+
+    Returns:
+        int: The umask
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except OSError:
+        pass
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+# Permissions of the files created by `open`
+FILE_MODE = 0o666 & ~_read_umask()
+
+
+def _align(offset: int) -> int:
+    """Round an offset up to the next multiple of `ALIGNMENT`."""
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def is_artifact(file_name: os.PathLike) -> bool:
+    """Check whether a file is a model artifact.
+
+    Args:
+        file_name (os.PathLike): Path of the file
+
+    Returns:
+        bool: True if the file starts with the artifact magic string
+    """
+    with open(file_name, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save_artifact(
+    model,
+    file_name: os.PathLike,
+    feature_names: Optional[Sequence[str]] = None,
+    dtype: str = "float64",
+    training_stats: Optional[dict] = None,
+) -> None:
+    """Save a linear model as a memory-mappable artifact.
+
+    The file is written next to the target and then atomically renamed, so
+    readers (e.g. a hot-reloading server) never see a partial file.
+
+    Args:
+        model (LinearRegression): Fitted model
+        file_name (os.PathLike): Path where the artifact will be saved to
+        feature_names (Sequence[str], optional): Names of the model features.
+            Defaults to None
+        dtype (str, optional): Data type of the stored arrays.
+            Defaults to `float64`
+        training_stats (dict, optional): JSON-serialisable statistics about
+            the training. Defaults to None
+    """
+    # The feature pipeline attached to the model is saved in the header, so
+    # the same transform can be applied when serving the model
+    pipeline = getattr(model, "pipeline", None)
+    if feature_names is None and pipeline is not None:
+        feature_names = pipeline.feature_names
+    dtype = np.dtype(dtype)
+    arrays = {k: np.asarray(getattr(model, k), dtype=dtype, order="C") for k in ARRAYS}
+    if feature_names is not None and len(feature_names) != arrays["W"].shape[0]:
+        raise ValueError(
+            f"Expected {arrays['W'].shape[0]} feature names, got {len(feature_names)}."
+        )
+
+    params = {
+        "solver": getattr(model, "solver", None),
+        "alpha": getattr(model, "alpha", None),
+        # Labels of the groups of a `GroupedLinearRegression`
+        "groups": getattr(model, "groups", None),
+    }
+
+    # Lay out the arrays one after the other, the header is prepended later
+    specs, data, offset = {}, b"", 0
+    for k, arr in arrays.items():
+        pad = _align(offset) - offset
+        data += b"\0" * pad
+        offset += pad
+        specs[k] = {"offset": offset, "shape": list(arr.shape)}
+        data += arr.tobytes()
+        offset += arr.nbytes
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "model_class": type(model).__name__,
+        "dtype": dtype.str,
+        "feature_names": list(feature_names) if feature_names is not None else None,
+        "params": {
+            k: v.tolist() if isinstance(v, (np.ndarray, np.generic)) else v
+            for k, v in params.items()
+            if v is not None
+        },
+        "training_stats": training_stats or {},
+        "pipeline": pipeline.to_dict() if pipeline is not None else None,
+        "arrays": specs,
+        "checksum": hashlib.sha256(data).hexdigest(),
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _align(len(MAGIC) + 4 + len(header_bytes))
+    header_bytes += b" " * (data_start - len(MAGIC) - 4 - len(header_bytes))
+
+    directory = os.path.dirname(os.path.abspath(file_name))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # `mkstemp` makes the file readable by its owner only, so it gets
+            # the permissions of a file created by `open` (e.g. for a serving
+            # user)
+            os.fchmod(f.fileno(), FILE_MODE)
+            f.write(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes + data)
+        os.replace(tmp_name, file_name)
+    except BaseException:
+        os.remove(tmp_name)
+        raise
+    logger.info(f"Saved model artifact to {file_name} .")
+
+
+def read_header(file_name: os.PathLike) -> dict:
+    """Read the JSON header of a model artifact.
+
+    Args:
+        file_name (os.PathLike): Path of the artifact
+
+    Returns:
+        dict: Header of the artifact, including the offset of the data
+    """
+    with open(file_name, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{file_name} is not a model artifact.")
+        (header_len,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    if header["format_version"] > FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported artifact version {header['format_version']}, "
+            f"the latest supported version is {FORMAT_VERSION}."
+        )
+    header["data_offset"] = len(MAGIC) + 4 + header_len
+    return header
+
+
+def load_artifact(file_name: os.PathLike, mmap: bool = True, verify: bool = True):
+    """Load a linear model from an artifact.
+
+    With `mmap`, the arrays are zero-copy views on the file, so the pages are
+    shared between all the processes that load the same artifact.
+
+    Args:
+        file_name (os.PathLike): Path of the artifact
+        mmap (bool, optional): Whether to memory-map the arrays instead of
+            reading them in memory. Defaults to True
+        verify (bool, optional): Whether to verify the checksum of the data.
+            Defaults to True
+
+    Returns:
+        LinearRegression: The pre-trained model, with the artifact header
+            available as `model.metadata` and the feature pipeline, if any,
+            as `model.pipeline`
+    """
+    from src.base.model import (
+        GroupedLinearRegression,
+        LinearRegression,
+        RidgeRegression,
+    )
+
+    header = read_header(file_name)
+    start = header["data_offset"]
+    if mmap:
+        data = np.asarray(np.memmap(file_name, dtype=np.uint8, mode="r", offset=start))
+    else:
+        with open(file_name, "rb") as f:
+            f.seek(start)
+            data = np.frombuffer(f.read(), dtype=np.uint8)
+    if verify and hashlib.sha256(data).hexdigest() != header["checksum"]:
+        raise ValueError(f"Checksum mismatch for {file_name}, the file is corrupted.")
+
+    params = header["params"]
+    if header["model_class"] == "RidgeRegression":
+        model = RidgeRegression(alphas=params["alpha"])
+        model.alpha = params["alpha"]
+    elif header["model_class"] == "GroupedLinearRegression":
+        model = GroupedLinearRegression(solver=params.get("solver", "cholesky"))
+        model.groups = np.array(params["groups"])
+    else:
+        model = LinearRegression(solver=params.get("solver", "pinv"))
+    dtype = np.dtype(header["dtype"])
+    for k, spec in header["arrays"].items():
+        count = int(np.prod(spec["shape"]))
+        buf = data[spec["offset"] : spec["offset"] + count * dtype.itemsize]
+        # Scalars (the intercept) are unpacked to match a freshly fitted model
+        setattr(model, k, buf.view(dtype).reshape(spec["shape"])[()])
+    if header.get("pipeline") is not None:
+        from src.base.preprocessing import FeaturePipeline
+
+        model.pipeline = FeaturePipeline.from_dict(header["pipeline"])
+    model.metadata = header
+    logger.info(f"Loaded model artifact from {file_name} .")
+    return model
@@ -0,0 +1,138 @@
+from typing import Mapping, Optional, Sequence, Union
+
+import numpy as np
+from loguru import logger
+
+from src.base.model import GroupedLinearRegression, LinearRegression
+from src.base.parallel import BLOCK_SIZE, SHARED, SharedPool
+
+
+def _resolve_blocks(
+    model: LinearRegression,
+    blocks: Optional[Mapping[str, Union[slice, Sequence[int]]]],
+) -> dict:
+    """Get the columns of each block of features.
+
+    Args:
+        model (LinearRegression): Fitted model
+        blocks (Mapping[str, Union[slice, Sequence[int]]], optional): Columns
+            of each block. If None, the blocks of the feature pipeline
+            attached to the model, or else one block per feature
+
+    Returns:
+        dict: (p_k, ) Column indices of each block, by name
+    """
+    p = model.W.shape[0]
+    if blocks is None:
+        pipeline = getattr(model, "pipeline", None)
+        blocks = getattr(pipeline, "blocks", None)
+    if blocks is None:
+        blocks = {f"feature_{i}": [i] for i in range(p)}
+    columns = np.arange(p)
+    return {name: columns[cols] for name, cols in blocks.items()}
+
+
+def _permuted_cross(seed: np.random.SeedSequence) -> np.ndarray:
+    """Compute the cross term of the permuted errors of all the blocks (worker task).
+
+    The permutation is applied to the rows of the contributions `Z`, so the
+    permuted input data is never materialised.
+
+    Args:
+        seed (np.random.SeedSequence): Seed of the permutation
+
+    Returns:
+        np.ndarray: (K, ) Sum over the rows of `A[i] * Z[perm[i]]` per block
+    """
+    A, Z = SHARED["A"], SHARED["Z"]
+    perm = np.random.default_rng(seed).permutation(Z.shape[0])
+    cross = np.zeros(Z.shape[1])
+    for start in range(0, len(perm), BLOCK_SIZE):
+        rows = slice(start, start + BLOCK_SIZE)
+        cross += np.einsum("ik,ik->k", A[rows], Z[perm[rows]])
+    return cross
+
+
+def permutation_importance(
+    model: LinearRegression,
+    X: np.ndarray,
+    y: np.ndarray,
+    blocks: Optional[Mapping[str, Union[slice, Sequence[int]]]] = None,
+    n_repeats: int = 5,
+    n_jobs: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> dict:
+    """Compute the permutation importance of each block of features of a linear model.
+
+    The importance of a block is the increase in RMSE when the rows of its
+    columns are shuffled together. As the model is linear, shuffling a block
+    only changes the predictions by `z[perm] - z`, where `z = X[:, block] @
+    W[block]` is the contribution of the block. With `r` the residuals and
+    `a = r + z`, the permuted mean squared error is then
+
+        mean(a ** 2) + mean(z ** 2) - 2 * mean(a * z[perm])
+
+    so `X` is read once to compute `a` and `z` for all the blocks, and each
+    repeat is a single gather and dot product of (N, K) arrays, split across
+    the worker processes. In a repeat all the blocks are shuffled with the
+    same permutation, each on its own.
+
+    Args:
+        model (LinearRegression): Fitted model
+        X (np.ndarray): (N, p) Input data
+        y (np.ndarray): (N, ) Target variable
+        blocks (Mapping[str, Union[slice, Sequence[int]]], optional): Columns
+            of each block, e.g. `FeaturePipeline.blocks`. If None, the blocks
+            of `model.pipeline`, or else one block per feature.
+            Defaults to None
+        n_repeats (int, optional): Number of permutations. Defaults to 5
+        n_jobs (int, optional): Number of worker processes, None for one per
+            CPU and 1 to run in the current process. Defaults to None
+        seed (int, optional): Seed of the permutations. Defaults to None
+
+    Returns:
+        dict: `names` of the blocks, `baseline_rmse` of the model, the
+            `importances` (n_repeats, K) of each repeat, and their `mean` and
+            `std` (K, )
+    """
+    if isinstance(model, GroupedLinearRegression):
+        raise TypeError("Grouped models are not supported.")
+    blocks = _resolve_blocks(model, blocks)
+    names = list(blocks)
+    N = X.shape[0]
+
+    # (N, K) Contribution of each block, and residuals plus contribution
+    Z = np.empty((N, len(names)))
+    A = np.empty((N, len(names)))
+    sse = 0.0
+    for start in range(0, N, BLOCK_SIZE):
+        rows = slice(start, start + BLOCK_SIZE)
+        X_rows = np.asarray(X[rows], dtype=float)
+        for k, cols in enumerate(blocks.values()):
+            Z[rows, k] = X_rows[:, cols] @ model.W[cols]
+        residuals = y[rows] - (X_rows @ model.W + model.b)
+        A[rows] = residuals[:, np.newaxis] + Z[rows]
+        sse += residuals @ residuals
+
+    baseline_mse = sse / N
+    constant = np.mean(A**2, axis=0) + np.mean(Z**2, axis=0)
+    seeds = np.random.SeedSequence(seed).spawn(n_repeats)
+    with SharedPool(n_jobs, A=A, Z=Z) as pool:
+        cross = np.stack(pool.map(_permuted_cross, seeds))
+
+    # Clipped, as the rounding errors can make an exact zero slightly negative
+    permuted_rmse = np.sqrt(np.maximum(constant - 2 * cross / N, 0))
+    importances = permuted_rmse - np.sqrt(baseline_mse)
+    mean = importances.mean(axis=0)
+    logger.info(
+        "Permutation importance: "
+        + ", ".join(f"{n} {m:,.4f}" for n, m in zip(names, mean))
+        + " ."
+    )
+    return {
+        "names": names,
+        "baseline_rmse": float(np.sqrt(baseline_mse)),
+        "importances": importances,
+        "mean": mean,
+        "std": importances.std(axis=0),
+    }
@@ -0,0 +1,169 @@
+from typing import Optional
+
+import numpy as np
+
+
+# Statistics kept for the whole dataset and for each group:
+# number of samples, mean and sum of squared deviations of the targets (for
+# the total sum of squares), mean squared error, and mean absolute error
+_N, _MEAN, _M2, _MSE, _MAE = range(5)
+
+
+def _merge(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Merge two sets of statistics with Chan's parallel update.
+
+    Args:
+        a (np.ndarray): (5, ) First set of statistics
+        b (np.ndarray): (5, ) Second set of statistics
+
+    Returns:
+        np.ndarray: (5, ) Statistics over the union of the samples
+    """
+    n = a[_N] + b[_N]
+    if n == 0:
+        return a.copy()
+    w = b[_N] / n
+    delta = b[_MEAN] - a[_MEAN]
+    res = np.empty(5)
+    res[_N] = n
+    res[_MEAN] = a[_MEAN] + delta * w
+    res[_M2] = a[_M2] + b[_M2] + delta**2 * a[_N] * w
+    res[_MSE] = a[_MSE] + (b[_MSE] - a[_MSE]) * w
+    res[_MAE] = a[_MAE] + (b[_MAE] - a[_MAE]) * w
+    return res
+
+
+def _summary(stats: np.ndarray) -> dict:
+    """Compute the metrics from a set of statistics.
+
+    Args:
+        stats (np.ndarray): (5, ) Statistics
+
+    Returns:
+        dict: Number of samples, RMSE, MAE, and R squared
+    """
+    n = stats[_N]
+    sst = stats[_M2]
+    return {
+        "n": int(n),
+        "rmse": float(np.sqrt(stats[_MSE])) if n else np.nan,
+        "mae": float(stats[_MAE]) if n else np.nan,
+        "r2": float(1 - n * stats[_MSE] / sst) if sst > 0 else np.nan,
+    }
+
+
+class RegressionMetrics:
+    """Streaming and mergeable accumulator of regression metrics.
+
+    The accumulator is updated one chunk of predictions at a time, and
+    accumulators updated on different chunks (e.g. by different processes)
+    can be merged. Means and sums of squares are combined with Chan's
+    parallel update, so the results are numerically stable and do not depend
+    on how the data was chunked. RMSE, MAE, and R squared are available for
+    all the data and for each group (e.g. each region).
+    """
+
+    def __init__(self) -> None:
+        """Initialise the accumulator."""
+        self._total = np.zeros(5)
+        self._groups = {}
+
+    def update(
+        self,
+        y_true: np.ndarray,
+        y_pred: np.ndarray,
+        groups: Optional[np.ndarray] = None,
+    ) -> "RegressionMetrics":
+        """Add a chunk of predictions.
+
+        Args:
+            y_true (np.ndarray): (N_c, ) True targets
+            y_pred (np.ndarray): (N_c, ) Model predictions
+            groups (np.ndarray, optional): (N_c, ) Group of each sample.
+                Defaults to None
+
+        Returns:
+            RegressionMetrics: The updated accumulator
+        """
+        y_true = np.asarray(y_true, dtype=float)
+        err = y_true - y_pred
+        if y_true.shape[0] == 0:
+            return self
+
+        mean = y_true.mean()
+        chunk = np.array(
+            [
+                y_true.shape[0],
+                mean,
+                np.sum(np.square(y_true - mean)),
+                np.mean(np.square(err)),
+                np.mean(np.abs(err)),
+            ]
+        )
+        self._total = _merge(self._total, chunk)
+
+        if groups is not None:
+            # Statistics of all the groups in the chunk at once
+            labels, inv = np.unique(np.asarray(groups), return_inverse=True)
+            counts = np.bincount(inv)
+            means = np.bincount(inv, y_true) / counts
+            chunks = np.column_stack(
+                [
+                    counts,
+                    means,
+                    np.bincount(inv, np.square(y_true - means[inv])),
+                    np.bincount(inv, np.square(err)) / counts,
+                    np.bincount(inv, np.abs(err)) / counts,
+                ]
+            )
+            for label, chunk in zip(labels.tolist(), chunks):
+                self._groups[label] = _merge(
+                    self._groups.get(label, np.zeros(5)), chunk
+                )
+        return self
+
+    def merge(self, other: "RegressionMetrics") -> "RegressionMetrics":
+        """Merge the statistics of another accumulator into this one.
+
+        Args:
+            other (RegressionMetrics): Accumulator to be merged
+
+        Returns:
+            RegressionMetrics: The updated accumulator
+        """
+        self._total = _merge(self._total, other._total)
+        for label, stats in other._groups.items():
+            self._groups[label] = _merge(self._groups.get(label, np.zeros(5)), stats)
+        return self
+
+    def result(self) -> dict:
+        """Get the metrics over all the data.
+
+        Returns:
+            dict: Number of samples, RMSE, MAE, and R squared
+        """
+        return _summary(self._total)
+
+    def by_group(self) -> dict:
+        """Get the metrics of each group.
+
+        Returns:
+            dict: Mapping from each group to its number of samples, RMSE,
+                MAE, and R squared
+        """
+        return {label: _summary(stats) for label, stats in sorted(self._groups.items())}
+
+    @property
+    def rmse(self) -> float:
+        """Get the Root Mean Squared Error."""
+        return self.result()["rmse"]
+
+    @property
+    def mae(self) -> float:
+        """Get the Mean Absolute Error."""
+        return self.result()["mae"]
+
+    @property
+    def r2(self) -> float:
+        """Get the coefficient of determination (R squared)."""
+        return self.result()["r2"]
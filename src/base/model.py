@@ -1,10 +1,14 @@
 import os
+from typing import Iterable, Optional, Sequence, Tuple, Union
 
 import joblib
 import numpy as np
 
 from loguru import logger
 
+from src.base.artifact import is_artifact, load_artifact, save_artifact
+from src.base.telemetry import timed
+
 
 def rmse(y_true: np.ndarray, y_pred: np.ndarray) -> float:
     """Compute the Root Mean Squared Error (RMSE).
@@ -22,6 +26,8 @@ def rmse(y_true: np.ndarray, y_pred: np.ndarray) -> float:
 def r2(y_true: np.ndarray, y_pred: np.ndarray) -> float:
     """Compute the coefficied of determination (R squared).
 
+    For chunked or parallel evaluations, see `src.base.metrics.RegressionMetrics`.
+
     Args:
         y_true (np.ndarray): (N, ) Array of true targets
         y_pred (np.ndarray): (N, ) Array of model predictions
@@ -30,18 +36,161 @@ def r2(y_true: np.ndarray, y_pred: np.ndarray) -> float:
         float: Value of the R squared
     """
     sse = np.sum((y_true - y_pred) ** 2)  # Sum of Squared Errors
-    ssr = np.sum((np.mean(y_true) - y_pred) ** 2)  # Sum of Squared Residuals
-    return ssr / (ssr + sse)  # R squared
+    sst = np.sum((y_true - np.mean(y_true)) ** 2)  # Total Sum of Squares
+    return 1 - sse / sst  # R squared
+
+
+SOLVERS = ("pinv", "qr", "cholesky", "lstsq", "auto")
+
+
+def _solve_pinv(X: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Solve the least squares problem with a thin SVD of the design matrix.
+
+    Args:
+        X (np.ndarray): (N, p) Design matrix, including the bias column
+        y (np.ndarray): (N, ) Target variable
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (p, ) Coefficients and (p, ) diagonal
+            of the (pseudo) inverse of `X^T X`
+    """
+    U, s, Vt = np.linalg.svd(X, full_matrices=False)
+    # Same cutoff as `np.linalg.pinv`
+    s_inv = np.zeros_like(s)
+    mask = s > 1e-15 * s.max()
+    s_inv[mask] = 1 / s[mask]
+    A = Vt.T @ (s_inv * (U.T @ y))
+    c_diag = np.square(Vt.T) @ np.square(s_inv)
+    return A, c_diag
+
+
+def _solve_qr(X: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Solve the least squares problem with a thin QR of the design matrix.
+
+    Since `X^T X = R^T R`, the inverse of the Gram matrix is `R^-1 R^-T` and
+    its diagonal is given by the squared row norms of `R^-1`.
+
+    Args:
+        X (np.ndarray): (N, p) Design matrix, including the bias column
+        y (np.ndarray): (N, ) Target variable
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (p, ) Coefficients and (p, ) diagonal
+            of the inverse of `X^T X`
+    """
+    Q, R = np.linalg.qr(X)
+    R_inv = np.linalg.inv(R)
+    A = R_inv @ (Q.T @ y)
+    c_diag = np.sum(np.square(R_inv), axis=1)
+    return A, c_diag
+
+
+def _solve_cholesky(G: np.ndarray, xty: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Solve the normal equations with a Cholesky factorisation of the Gram matrix.
+
+    Since `G = L L^T`, the inverse of the Gram matrix is `L^-T L^-1` and its
+    diagonal is given by the squared column norms of `L^-1`.
+
+    Args:
+        G (np.ndarray): (p, p) Gram matrix `X^T X`, including the bias
+        xty (np.ndarray): (p, ) `X^T y`, including the bias
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (p, ) Coefficients and (p, ) diagonal
+            of the inverse of `X^T X`
+    """
+    L_inv = np.linalg.inv(np.linalg.cholesky(G))
+    A = L_inv.T @ (L_inv @ xty)
+    c_diag = np.sum(np.square(L_inv), axis=0)
+    return A, c_diag
+
+
+def _solve_lstsq(G: np.ndarray, xty: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Solve the normal equations with `np.linalg.lstsq` on the Gram matrix.
+
+    `X^T y` and the identity are solved as a single multi-column right hand
+    side, so one (rank-revealing) factorisation gives both outputs.
+
+    Args:
+        G (np.ndarray): (p, p) Gram matrix `X^T X`, including the bias
+        xty (np.ndarray): (p, ) `X^T y`, including the bias
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (p, ) Coefficients and (p, ) diagonal
+            of the (pseudo) inverse of `X^T X`
+    """
+    p = G.shape[0]
+    sol = np.linalg.lstsq(G, np.column_stack([xty, np.eye(p)]), rcond=None)[0]
+    return sol[:, 0], sol[:, 1:].diagonal().copy()
+
+
+def _solve_gram_pinv(G: np.ndarray, xty: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Solve the normal equations with the pseudo-inverse of the Gram matrix.
+
+    Args:
+        G (np.ndarray): (p, p) Gram matrix `X^T X`, including the bias
+        xty (np.ndarray): (p, ) `X^T y`, including the bias
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (p, ) Coefficients and (p, ) diagonal
+            of the pseudo-inverse of `X^T X`
+    """
+    C = np.linalg.pinv(G, hermitian=True)
+    return C @ xty, C.diagonal().copy()
+
+
+def _select_solver(N: int, p: int, cond: float) -> str:
+    """Select a solver given the size and the conditioning of the problem.
+
+    Args:
+        N (int): Number of samples
+        p (int): Number of columns of the design matrix, including the bias
+        cond (float): Condition number of the Gram matrix `X^T X`
+
+    Returns:
+        str: Name of the selected solver
+    """
+    # Under-determined or numerically rank deficient: minimum norm solution
+    if N < p or not np.isfinite(cond) or cond > 1e14:
+        return "pinv"
+    # Well conditioned: working on the (p, p) Gram matrix is the cheapest
+    # option and squaring the condition number does not hurt the precision
+    if cond < 1e10:
+        return "cholesky"
+    # Badly conditioned: factorise the design matrix directly
+    return "qr"
 
 
 class LinearRegression:
     """A Linear Regression model implemented in Numpy."""
 
-    def __init__(self) -> None:
-        """Initialise the object."""
+    def __init__(self, solver: str = "pinv") -> None:
+        """Initialise the object.
+
+        Args:
+            solver (str, optional): Least squares solver, one of `pinv` (SVD of
+                the design matrix), `qr` (QR of the design matrix), `cholesky`
+                (Cholesky of the Gram matrix), `lstsq` (`np.linalg.lstsq` on the
+                Gram matrix), or `auto` (chosen from the size and the condition
+                number of the problem). Defaults to `pinv`
+        """
+        if solver not in SOLVERS:
+            raise ValueError(f"Solver must be one of {SOLVERS}, got {solver} instead.")
+        self.solver = solver
         self.W = None
         self.b = None
+        # Optional `FeaturePipeline` saved together with the model
+        self.pipeline = None
+        self._reset_statistics()
+
+    def _reset_statistics(self) -> None:
+        """Reset the sufficient statistics accumulated by `partial_fit`."""
+        self._n = 0
+        self._gram = None  # (p + 1, p + 1) Gram matrix of the inputs with bias
+        self._xty = None  # (p + 1, ) Inputs with bias times the targets
+        self._yty = 0.0  # Sum of the squared targets
 
+    @timed()
     def fit(self, X: np.ndarray, y: np.ndarray) -> None:
         """Fit the model on the training data.
 
@@ -50,18 +199,134 @@ class LinearRegression:
             y (np.ndarray): (N, ) Training target variable
         """
         N, p = X.shape
+        solver = getattr(self, "solver", "pinv")
+        self._reset_statistics()
+
+        # The Gram-based solvers never need the design matrix with the bias
+        if solver in ("auto", "cholesky", "lstsq"):
+            self._accumulate(X, y)
+            if solver == "auto":
+                solver = _select_solver(N, p + 1, np.linalg.cond(self._gram))
+                logger.debug(f"Selected solver: {solver} .")
+            if solver in ("cholesky", "lstsq"):
+                self._solve_statistics(solver)
+                self._reset_statistics()
+                return
+            self._reset_statistics()
+
         X_bias = np.concatenate([np.ones((N, 1)), X], axis=1)
-        A = np.linalg.pinv(X_bias) @ y
+        A, c_diag = _solve_qr(X_bias, y) if solver == "qr" else _solve_pinv(X_bias, y)
         self.W = A[1:]
         self.b = A[0]
 
-        # Compute the standard errors and Student's t statistics for each predictor
+        # Compute the standard errors and Student's t statistics for each
+        # predictor, reusing the factorisation used for the coefficients
         yhat = self.predict(X)
-        C = np.linalg.inv(X_bias.T @ X_bias)
         sigma_sq = np.sum(np.square(y - yhat)) / (N - p)
-        std_errs = np.sqrt((sigma_sq * C).diagonal())
+        std_errs = np.sqrt(sigma_sq * c_diag)
+        self.t_scores = A / std_errs
+
+    def _accumulate(self, X: np.ndarray, y: np.ndarray) -> None:
+        """Add a chunk of data to the sufficient statistics.
+
+        The bias column is never materialised: the Gram matrix of the inputs
+        with bias is filled block by block from the column sums and `X.T @ X`.
+
+        Args:
+            X (np.ndarray): (N_c, p) Chunk of training input data
+            y (np.ndarray): (N_c, ) Chunk of training target variable
+        """
+        N, p = X.shape
+        if self._gram is None:
+            self._gram = np.zeros((p + 1, p + 1))
+            self._xty = np.zeros(p + 1)
+        elif self._gram.shape[0] != p + 1:
+            raise ValueError(
+                f"Expected {self._gram.shape[0] - 1} features, got {p} instead."
+            )
+
+        x_sum = X.sum(axis=0)
+        self._gram[0, 0] += N
+        self._gram[0, 1:] += x_sum
+        self._gram[1:, 0] += x_sum
+        self._gram[1:, 1:] += X.T @ X
+        self._xty[0] += y.sum()
+        self._xty[1:] += X.T @ y
+        self._yty += y @ y
+        self._n += N
+
+    def _solve_statistics(self, solver: Optional[str] = None) -> None:
+        """Fit the model from the accumulated sufficient statistics.
+
+        The coefficients, the residual variance, and the Student's t statistics
+        are all derived from the (p + 1, p + 1) Gram matrix, `X^T y`, `y^T y`,
+        and N, so the cost does not depend on the number of samples. Since the
+        design matrix is not available, `qr` falls back to `lstsq` and `pinv`
+        uses the pseudo-inverse of the Gram matrix.
+
+        Args:
+            solver (str, optional): Solver to use. If not provided, the solver
+                of the model is used. Defaults to None
+        """
+        if self._n == 0:
+            raise ValueError("No data has been seen, cannot fit the model.")
+
+        N, p = self._n, self._gram.shape[0] - 1
+        solver = solver or getattr(self, "solver", "pinv")
+        if solver == "auto":
+            solver = _select_solver(N, p + 1, np.linalg.cond(self._gram))
+        if solver == "cholesky":
+            try:
+                A, c_diag = _solve_cholesky(self._gram, self._xty)
+            except np.linalg.LinAlgError:
+                logger.warning("Gram matrix is not positive definite, using lstsq.")
+                A, c_diag = _solve_lstsq(self._gram, self._xty)
+        elif solver in ("lstsq", "qr"):
+            A, c_diag = _solve_lstsq(self._gram, self._xty)
+        else:
+            A, c_diag = _solve_gram_pinv(self._gram, self._xty)
+        self.W = A[1:]
+        self.b = A[0]
+
+        # The Sum of Squared Errors expands to y^T y - 2 A^T X^T y + A^T X^T X A
+        sse = self._yty - 2 * A @ self._xty + A @ self._gram @ A
+        sigma_sq = max(sse, 0.0) / (N - p)
+        std_errs = np.sqrt(sigma_sq * c_diag)
         self.t_scores = A / std_errs
 
+    def partial_fit(self, X: np.ndarray, y: np.ndarray) -> None:
+        """Update the model with a chunk of training data.
+
+        Only the sufficient statistics are kept in memory, i.e. O(p^2) values
+        regardless of how many chunks have been seen. The coefficients and the
+        t scores are refreshed after each chunk.
+
+        Args:
+            X (np.ndarray): (N_c, p) Chunk of training input data
+            y (np.ndarray): (N_c, ) Chunk of training target variable
+        """
+        self._accumulate(X, y)
+        self._solve_statistics()
+
+    def fit_from_iterator(
+        self, chunks: Iterable[Tuple[np.ndarray, np.ndarray]]
+    ) -> None:
+        """Fit the model in a single streaming pass over chunks of training data.
+
+        Any statistics accumulated by previous calls are discarded. The model
+        is solved only once, after the last chunk.
+
+        Args:
+            chunks (Iterable[Tuple[np.ndarray, np.ndarray]]): Iterable of
+                `(X_chunk, y_chunk)` pairs with shapes (N_c, p) and (N_c, )
+        """
+        self._reset_statistics()
+        for X, y in chunks:
+            self._accumulate(X, y)
+        logger.debug(f"Accumulated statistics over {self._n} samples .")
+        self._solve_statistics()
+
+    @timed()
     def predict(self, X: np.ndarray) -> np.ndarray:
         """Generate predictions for the test data.
 
@@ -76,25 +341,40 @@ class LinearRegression:
         return preds
 
     @staticmethod
-    def load_model(file_name: os.PathLike):
+    def load_model(file_name: os.PathLike, mmap: bool = True):
         """Load the pre-trained model from a source.
 
+        Both model artifacts and `joblib` pickles are supported, the format is
+        detected from the content of the file.
+
         Args:
             file_name (os.PathLike): Path from where the model will be loaded.
+            mmap (bool, optional): Whether to memory-map the arrays of a model
+                artifact. Defaults to True
 
         Returns:
             The pre-trained model.
         """
+        if is_artifact(file_name):
+            return load_artifact(file_name, mmap=mmap)
         model = joblib.load(file_name)
         logger.info(f"Loaded model from {file_name} .")
         return model
 
-    def save_model(self, file_name: os.PathLike) -> None:
+    def save_model(self, file_name: os.PathLike, **kwargs) -> None:
         """Save the pre-trained model to a target.
 
+        Files with a `.joblib` or `.pkl` extension are pickled with `joblib`,
+        any other file is saved as a model artifact (see `src.base.artifact`).
+
         Args:
             file_name (os.PathLike): Path where the model will be saved to.
+            **kwargs: Additional arguments for `save_artifact`, e.g. the
+                `feature_names` or the `dtype`
         """
+        if not str(file_name).endswith((".joblib", ".pkl")):
+            save_artifact(self, file_name, **kwargs)
+            return
         directory = os.path.dirname(file_name)
         logger.debug(f"Model directory: {directory} .")
         os.makedirs(directory, exist_ok=True)
@@ -110,3 +390,408 @@ class LinearRegression:
                 coefficient for the intercept.
         """
         return np.concatenate([self.b[np.newaxis], self.W])
+
+
+class RidgeRegression(LinearRegression):
+    """A Ridge Regression model implemented in Numpy.
+
+    The whole regularisation path is computed from a single thin SVD of the
+    centred design matrix, so fitting a vector of alphas costs about as much
+    as fitting one. The alpha used for predictions is selected with the
+    Generalised Cross Validation (GCV) or the exact Leave One Out (LOO) error,
+    which are both available in closed form from the same decomposition. The
+    intercept is never penalised.
+    """
+
+    def __init__(
+        self, alphas: Union[float, Sequence[float]] = 1.0, cv: str = "gcv"
+    ) -> None:
+        """Initialise the object.
+
+        Args:
+            alphas (Union[float, Sequence[float]], optional): Regularisation
+                strength(s) to evaluate. Defaults to 1
+            cv (str, optional): Criterion used to select the alpha, either `gcv`
+                or `loo`. Defaults to `gcv`
+        """
+        if cv not in ("gcv", "loo"):
+            raise ValueError(f"cv must be one of ('gcv', 'loo'), got {cv} instead.")
+        super().__init__(solver="pinv")
+        self.alphas = np.atleast_1d(np.asarray(alphas, dtype=float))
+        if np.any(self.alphas < 0):
+            raise ValueError("All alphas must be non-negative.")
+        self.cv = cv
+        self.alpha = None
+
+    @timed()
+    def fit(self, X: np.ndarray, y: np.ndarray) -> None:
+        """Fit the model over all the alphas on the training data.
+
+        Args:
+            X (np.ndarray): (N, p) Training input data
+            y (np.ndarray): (N, ) Training target variable
+        """
+        N, p = X.shape
+        self._reset_statistics()
+        x_mean = X.mean(axis=0)
+        y_mean = y.mean()
+        yc = y - y_mean
+        U, s, Vt = np.linalg.svd(X - x_mean, full_matrices=False)
+        Uty = U.T @ yc
+        self._fit_path(N, s, Vt, Uty, yc @ yc, x_mean, y_mean)
+
+        if self.cv == "loo":
+            self.cv_errors = self._loo_errors(U, s, Uty, yc)
+            self._select_alpha(N, s, Vt, x_mean)
+
+    def _solve_statistics(self, solver: Optional[str] = None) -> None:
+        """Fit the model over all the alphas from the accumulated statistics.
+
+        The SVD of the centred design matrix is recovered from the eigen
+        decomposition of the centred Gram matrix. The per-sample residuals are
+        not available, so the alpha is always selected with GCV.
+
+        Args:
+            solver (str, optional): Unused, kept for compatibility with the
+                parent class. Defaults to None
+        """
+        if self._n == 0:
+            raise ValueError("No data has been seen, cannot fit the model.")
+
+        N = self._n
+        x_mean = self._gram[0, 1:] / N
+        y_mean = self._xty[0] / N
+        G_c = self._gram[1:, 1:] - N * np.outer(x_mean, x_mean)
+        xty_c = self._xty[1:] - N * x_mean * y_mean
+        eigvals, V = np.linalg.eigh(G_c)
+        s = np.sqrt(np.clip(eigvals, 0, None))
+        Vt = V.T
+        Uty = np.zeros_like(s)
+        mask = s > 1e-15 * s.max()
+        Uty[mask] = (Vt @ xty_c)[mask] / s[mask]
+        if self.cv == "loo":
+            logger.debug("LOO is not available from sufficient statistics, using GCV.")
+        self._fit_path(N, s, Vt, Uty, self._yty - N * y_mean**2, x_mean, y_mean)
+
+    def _fit_path(
+        self,
+        N: int,
+        s: np.ndarray,
+        Vt: np.ndarray,
+        Uty: np.ndarray,
+        yty: float,
+        x_mean: np.ndarray,
+        y_mean: float,
+    ) -> None:
+        """Compute the coefficients and the GCV errors for all the alphas.
+
+        Args:
+            N (int): Number of training samples
+            s (np.ndarray): (k, ) Singular values of the centred inputs
+            Vt (np.ndarray): (k, p) Right singular vectors of the centred inputs
+            Uty (np.ndarray): (k, ) Centred target projected on the left
+                singular vectors
+            yty (float): Sum of the squared centred targets
+            x_mean (np.ndarray): (p, ) Mean of the inputs
+            y_mean (float): Mean of the target
+        """
+        # Shrinkage factors s^2 / (s^2 + alpha) for all alphas at once
+        s_sq = np.square(s)
+        den = s_sq + self.alphas[:, np.newaxis]  # (n_alphas, k)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shrink = np.where(den > 0, s_sq / den, 0.0)
+            filt = np.where(den > 0, s / den, 0.0)
+
+        self.coef_path = (filt * Uty) @ Vt  # (n_alphas, p)
+        self.intercept_path = y_mean - self.coef_path @ x_mean  # (n_alphas, )
+
+        # Residual sum of squares and effective degrees of freedom (including
+        # the intercept) of each alpha
+        self._rss_path = yty - Uty @ Uty + np.square(1 - shrink) @ np.square(Uty)
+        dof = 1 + shrink.sum(axis=1)
+        self.cv_errors = (self._rss_path / N) / np.square(1 - dof / N)
+        self._select_alpha(N, s, Vt, x_mean)
+
+    def _loo_errors(
+        self, U: np.ndarray, s: np.ndarray, Uty: np.ndarray, yc: np.ndarray
+    ) -> np.ndarray:
+        """Compute the exact Leave One Out errors for all the alphas.
+
+        The LOO residual of each sample is its training residual divided by
+        `1 - h_ii`, where `h_ii` is the leverage. Rows are processed in blocks
+        to bound the memory to O(block * n_alphas).
+
+        Args:
+            U (np.ndarray): (N, k) Left singular vectors of the centred inputs
+            s (np.ndarray): (k, ) Singular values of the centred inputs
+            Uty (np.ndarray): (k, ) Centred target projected on `U`
+            yc (np.ndarray): (N, ) Centred target
+
+        Returns:
+            np.ndarray: (n_alphas, ) Mean squared LOO error of each alpha
+        """
+        N = U.shape[0]
+        s_sq = np.square(s)
+        den = s_sq + self.alphas[:, np.newaxis]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shrink = np.where(den > 0, s_sq / den, 0.0)  # (n_alphas, k)
+
+        sq_errs = np.zeros(len(self.alphas))
+        block = 65536
+        for start in range(0, N, block):
+            U_b = U[start : start + block]
+            resid = yc[start : start + block, np.newaxis] - U_b @ (shrink * Uty).T
+            leverage = 1 / N + np.square(U_b) @ shrink.T
+            sq_errs += np.sum(np.square(resid / (1 - leverage)), axis=0)
+        return sq_errs / N
+
+    def _select_alpha(
+        self, N: int, s: np.ndarray, Vt: np.ndarray, x_mean: np.ndarray
+    ) -> None:
+        """Select the best alpha and set the coefficients and the t scores.
+
+        Args:
+            N (int): Number of training samples
+            s (np.ndarray): (k, ) Singular values of the centred inputs
+            Vt (np.ndarray): (k, p) Right singular vectors of the centred inputs
+            x_mean (np.ndarray): (p, ) Mean of the inputs
+        """
+        best = int(np.argmin(self.cv_errors))
+        self.alpha = self.alphas[best]
+        self.W = self.coef_path[best]
+        self.b = self.intercept_path[best]
+        logger.debug(f"Selected alpha: {self.alpha} .")
+
+        # Covariance of the ridge estimator: sigma^2 V diag(s^2 / (s^2 + a)^2) V^T
+        p = Vt.shape[1]
+        s_sq = np.square(s)
+        den = np.square(s_sq + self.alpha)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var_factors = np.where(den > 0, s_sq / den, 0.0)
+        sigma_sq = self._rss_path[best] / (N - p)
+        var_W = sigma_sq * (var_factors @ np.square(Vt))
+        var_b = sigma_sq / N + sigma_sq * var_factors @ np.square(Vt @ x_mean)
+        self.t_scores = self.coefficients / np.sqrt(np.concatenate([[var_b], var_W]))
+
+
+class GroupedLinearRegression(LinearRegression):
+    """A set of independent Linear Regression models, one for each group.
+
+    All the groups (e.g. the regions) share the same features but have their
+    own coefficients. The per-group Gram matrices are accumulated as segment
+    sums over the rows sorted by group, and all the groups are solved at once
+    with a batched Cholesky factorisation of the stacked (G, p + 1, p + 1)
+    Gram matrices, so the cost of a Python-level loop over the groups is
+    never paid.
+    """
+
+    def __init__(self, solver: str = "cholesky") -> None:
+        """Initialise the object.
+
+        Args:
+            solver (str, optional): Least squares solver, either `cholesky`
+                (batched Cholesky of the Gram matrices, falling back to `pinv`
+                if any group is rank deficient) or `pinv` (batched
+                pseudo-inverse of the Gram matrices). Defaults to `cholesky`
+        """
+        if solver not in ("cholesky", "pinv"):
+            raise ValueError(
+                f"Solver must be one of ('cholesky', 'pinv'), got {solver} instead."
+            )
+        super().__init__(solver="pinv")
+        self.solver = solver
+        # (G, ) Sorted labels of the groups seen during training
+        self.groups = None
+
+    def _reset_statistics(self) -> None:
+        """Reset the sufficient statistics of all the groups."""
+        self._n = np.zeros(0)  # (G, ) Number of samples of each group
+        self._gram = None  # (G, p + 1, p + 1) Gram matrices with bias
+        self._xty = None  # (G, p + 1) Inputs with bias times the targets
+        self._yty = np.zeros(0)  # (G, ) Sum of the squared targets
+        self.groups = None
+
+    @timed()
+    def fit(self, X: np.ndarray, y: np.ndarray, groups: np.ndarray) -> None:
+        """Fit one model for each group on the training data.
+
+        Args:
+            X (np.ndarray): (N, p) Training input data
+            y (np.ndarray): (N, ) Training target variable
+            groups (np.ndarray): (N, ) Group of each sample
+        """
+        self._reset_statistics()
+        self._accumulate(X, y, groups)
+        self._solve_statistics()
+
+    def partial_fit(self, X: np.ndarray, y: np.ndarray, groups: np.ndarray) -> None:
+        """Update the models with a chunk of training data.
+
+        Groups that have not been seen before are added to the models.
+
+        Args:
+            X (np.ndarray): (N_c, p) Chunk of training input data
+            y (np.ndarray): (N_c, ) Chunk of training target variable
+            groups (np.ndarray): (N_c, ) Group of each sample in the chunk
+        """
+        self._accumulate(X, y, groups)
+        self._solve_statistics()
+
+    def fit_from_iterator(
+        self, chunks: Iterable[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+    ) -> None:
+        """Fit the models in a single streaming pass over chunks of training data.
+
+        Args:
+            chunks (Iterable[Tuple[np.ndarray, np.ndarray, np.ndarray]]): Iterable
+                of `(X_chunk, y_chunk, groups_chunk)` triples with shapes
+                (N_c, p), (N_c, ), and (N_c, )
+        """
+        self._reset_statistics()
+        for X, y, groups in chunks:
+            self._accumulate(X, y, groups)
+        logger.debug(f"Accumulated statistics over {int(self._n.sum())} samples .")
+        self._solve_statistics()
+
+    def _add_groups(self, labels: np.ndarray, p: int) -> None:
+        """Extend the statistics with new groups, keeping the labels sorted.
+
+        Args:
+            labels (np.ndarray): Labels of the groups in a chunk of data
+            p (int): Number of features
+        """
+        if self.groups is None:
+            new = labels
+        else:
+            new = np.union1d(self.groups, labels)
+            if len(new) == len(self.groups):
+                return
+        gram = np.zeros((len(new), p + 1, p + 1))
+        xty = np.zeros((len(new), p + 1))
+        n = np.zeros(len(new))
+        yty = np.zeros(len(new))
+        if self.groups is not None:
+            old = np.searchsorted(new, self.groups)
+            gram[old], xty[old], n[old], yty[old] = (
+                self._gram,
+                self._xty,
+                self._n,
+                self._yty,
+            )
+        self.groups, self._gram, self._xty, self._n, self._yty = new, gram, xty, n, yty
+
+    def _accumulate(self, X: np.ndarray, y: np.ndarray, groups: np.ndarray) -> None:
+        """Add a chunk of data to the sufficient statistics of its groups.
+
+        The rows are sorted by group, so the statistics of each group are
+        segment sums over contiguous rows. The per-row outer products are
+        materialised in blocks to bound the memory to O(block * p^2).
+
+        Args:
+            X (np.ndarray): (N_c, p) Chunk of training input data
+            y (np.ndarray): (N_c, ) Chunk of training target variable
+            groups (np.ndarray): (N_c, ) Group of each sample in the chunk
+        """
+        N, p = X.shape
+        if self._gram is not None and self._gram.shape[1] != p + 1:
+            raise ValueError(
+                f"Expected {self._gram.shape[1] - 1} features, got {p} instead."
+            )
+        labels, inv = np.unique(np.asarray(groups), return_inverse=True)
+        self._add_groups(labels, p)
+        idx = np.searchsorted(self.groups, labels)[inv]
+
+        order = np.argsort(idx, kind="stable")
+        idx = idx[order]
+        X_bias = np.concatenate([np.ones((N, 1)), X[order]], axis=1)
+        y = y[order]
+
+        self._n += np.bincount(idx, minlength=len(self.groups))
+        self._yty += np.bincount(idx, y * y, minlength=len(self.groups))
+        block = max(1, 2**22 // (p + 1) ** 2)
+        for start in range(0, N, block):
+            X_b = X_bias[start : start + block]
+            idx_b = idx[start : start + block]
+            # First row of each group in the block
+            starts = np.flatnonzero(np.r_[True, idx_b[1:] != idx_b[:-1]])
+            seg = idx_b[starts]
+            self._gram[seg] += np.add.reduceat(
+                X_b[:, :, np.newaxis] * X_b[:, np.newaxis, :], starts, axis=0
+            )
+            self._xty[seg] += np.add.reduceat(
+                X_b * y[start : start + block, np.newaxis], starts, axis=0
+            )
+
+    def _solve_statistics(self, solver: Optional[str] = None) -> None:
+        """Fit all the models from the accumulated sufficient statistics.
+
+        Args:
+            solver (str, optional): Solver to use. If not provided, the solver
+                of the model is used. Defaults to None
+        """
+        if self.groups is None:
+            raise ValueError("No data has been seen, cannot fit the model.")
+
+        p = self._gram.shape[1] - 1
+        solver = solver or self.solver
+        if solver == "cholesky":
+            try:
+                L_inv = np.linalg.inv(np.linalg.cholesky(self._gram))
+            except np.linalg.LinAlgError:
+                logger.warning(
+                    "Some Gram matrices are not positive definite, using pinv."
+                )
+                solver = "pinv"
+        if solver == "cholesky":
+            # Same as `_solve_cholesky`, for all the groups at once
+            A = np.einsum(
+                "gji,gj->gi", L_inv, np.einsum("gij,gj->gi", L_inv, self._xty)
+            )
+            c_diag = np.sum(np.square(L_inv), axis=1)
+        else:
+            C = np.linalg.pinv(self._gram, hermitian=True)
+            A = np.einsum("gij,gj->gi", C, self._xty)
+            c_diag = np.diagonal(C, axis1=1, axis2=2).copy()
+        self.W = A[:, 1:]
+        self.b = A[:, 0]
+
+        sse = (
+            self._yty
+            - 2 * np.einsum("gi,gi->g", A, self._xty)
+            + np.einsum("gi,gij,gj->g", A, self._gram, A)
+        )
+        # Groups with no more samples than features have undefined t scores
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sigma_sq = np.clip(sse, 0.0, None) / (self._n - p)
+            sigma_sq[self._n <= p] = np.nan
+            self.t_scores = A / np.sqrt(sigma_sq[:, np.newaxis] * c_diag)
+
+    @timed()
+    def predict(self, X: np.ndarray, groups: np.ndarray) -> np.ndarray:
+        """Generate predictions for the test data with the model of each group.
+
+        Args:
+            X (np.ndarray): (N_t, p) Test input data
+            groups (np.ndarray): (N_t, ) Group of each test sample
+
+        Returns:
+            np.ndarray: (N_t, ) Model predictions on the test data
+        """
+        groups = np.asarray(groups)
+        idx = np.clip(np.searchsorted(self.groups, groups), 0, len(self.groups) - 1)
+        unknown = self.groups[idx] != groups
+        if np.any(unknown):
+            raise ValueError(f"Unknown groups: {np.unique(groups[unknown]).tolist()}.")
+        preds = np.einsum("ij,ij->i", X, self.W[idx]) + self.b[idx]
+        logger.debug(f"Preds shape: {preds.shape} .")
+        return preds
+
+    @property
+    def coefficients(self) -> np.ndarray:
+        """Get the model coefficients.
+
+        Returns:
+            np.ndarray: (G, p + 1) Coefficients of each group, the first column
+                is the intercept.
+        """
+        return np.column_stack([self.b, self.W])
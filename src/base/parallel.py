@@ -0,0 +1,136 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+# Arrays shared with the current worker process, attached by `_init_worker`
+SHARED = {}
+# Number of rows gathered at a time by the tasks
+BLOCK_SIZE = 65536
+
+
+def _share(arr: np.ndarray) -> Tuple[dict, Optional[shared_memory.SharedMemory]]:
+    """Expose an array to the worker processes without pickling it.
+
+    C-contiguous memory-mapped arrays (or views of them) are re-opened from
+    their file by the workers, any other array is copied once into a shared
+    memory block.
+
+    Args:
+        arr (np.ndarray): Array to be shared
+
+    Returns:
+        Tuple[dict, Optional[shared_memory.SharedMemory]]: Specification used
+            by the workers to attach to the array and the shared memory block
+            to be released by the caller (None for memory-mapped arrays)
+    """
+    spec = {"shape": arr.shape, "dtype": arr.dtype.str}
+    if (
+        isinstance(arr, np.memmap)
+        and arr.filename is not None
+        and arr.flags.c_contiguous
+    ):
+        # A view keeps the offset of the memmap it was taken from, so the
+        # offset of its data is measured from the memmap over the whole file
+        root = arr
+        while isinstance(root.base, np.memmap):
+            root = root.base
+        offset = root.offset + arr.ctypes.data - root.ctypes.data
+        spec.update(filename=arr.filename, offset=offset)
+        return spec, None
+    arr = np.ascontiguousarray(arr)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    spec.update(name=shm.name)
+    return spec, shm
+
+
+def _attach(spec: dict) -> np.ndarray:
+    """Attach to an array shared by `_share`.
+
+    Args:
+        spec (dict): Specification returned by `_share`
+
+    Returns:
+        np.ndarray: Read-only view of the shared array
+    """
+    if "filename" in spec:
+        return np.memmap(
+            spec["filename"],
+            dtype=spec["dtype"],
+            mode="r",
+            offset=spec["offset"],
+            shape=spec["shape"],
+        )
+    shm = shared_memory.SharedMemory(name=spec["name"])
+    # Keep a reference to the block, otherwise the buffer is released
+    SHARED.setdefault("_blocks", []).append(shm)
+    arr = np.ndarray(spec["shape"], dtype=spec["dtype"], buffer=shm.buf)
+    arr.flags.writeable = False
+    return arr
+
+
+def _init_worker(specs: dict) -> None:
+    """Attach the worker process to all the shared arrays.
+
+    Args:
+        specs (dict): Mapping from array names to the specifications
+            returned by `_share`
+    """
+    for key, spec in specs.items():
+        SHARED[key] = _attach(spec)
+
+
+class SharedPool:
+    """Context manager running tasks over shared arrays, in a pool or in-process.
+
+    The tasks are module-level functions reading the arrays from `SHARED`,
+    so only their arguments and results are pickled.
+    """
+
+    def __init__(self, n_jobs: Optional[int], **arrays: np.ndarray) -> None:
+        """Initialise the pool.
+
+        Args:
+            n_jobs (int, optional): Number of worker processes. If 1 the tasks
+                run in the current process, if None one worker per CPU is used
+            **arrays (np.ndarray): Arrays to be shared with the workers
+        """
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.arrays = arrays
+        self._blocks = []
+        self._executor = None
+
+    def __enter__(self) -> "SharedPool":
+        """Share the arrays and start the worker processes."""
+        if self.n_jobs == 1:
+            SHARED.update(self.arrays)
+            return self
+        specs = {}
+        for key, arr in self.arrays.items():
+            specs[key], shm = _share(arr)
+            if shm is not None:
+                self._blocks.append(shm)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.n_jobs, initializer=_init_worker, initargs=(specs,)
+        )
+        return self
+
+    def map(self, fn, *iterables) -> list:
+        """Apply a task to every set of arguments and collect the results."""
+        if self._executor is None:
+            return list(map(fn, *iterables))
+        return list(self._executor.map(fn, *iterables))
+
+    def __exit__(self, *exc) -> None:
+        """Stop the worker processes and release the shared memory."""
+        if self._executor is not None:
+            self._executor.shutdown()
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        SHARED.clear()
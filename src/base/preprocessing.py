@@ -1,8 +1,84 @@
-from typing import Optional, Union
+import os
+import functools
+from typing import TYPE_CHECKING, Callable, Mapping, Optional, Sequence, Union
 
 import numpy as np
-import pandas as pd
-from numba import jit
+
+from src.base.telemetry import timed
+
+# `pandas` is only needed for type hints and `numba` is imported when a kernel
+# is first called, so importing this module is cheap
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Replaced by `numba.prange` when numba is imported
+prange = range
+
+
+@functools.lru_cache(maxsize=None)
+def _import_numba():
+    """Import numba, if available and not disabled with `NUMBA_DISABLE_JIT`.
+
+    Returns:
+        The numba module, or None if the NumPy fallbacks should be used
+    """
+    if os.environ.get("NUMBA_DISABLE_JIT", "0") != "0":
+        return None
+    try:
+        import numba
+    except ImportError:
+        return None
+    globals()["prange"] = numba.prange
+    return numba
+
+
+class _LazyKernel:
+    """Kernel compiled with numba the first time it is called.
+
+    If numba is not available, the NumPy fallback (or the undecorated
+    function, if it only uses NumPy array operations) is used instead.
+    """
+
+    def __init__(
+        self, fn: Callable, fallback: Optional[Callable] = None, **options
+    ) -> None:
+        """Initialise the kernel.
+
+        Args:
+            fn (Callable): Function to be compiled
+            fallback (Callable, optional): Pure NumPy implementation used when
+                numba is not available. Defaults to None (use `fn`)
+            **options: Options for `numba.jit`
+        """
+        functools.update_wrapper(self, fn)
+        self._fn = fn
+        self._fallback = fallback or fn
+        self._options = options
+        self._impl = None
+
+    def __call__(self, *args):
+        """Call the compiled kernel, compiling it if needed."""
+        if self._impl is None:
+            numba = _import_numba()
+            if numba is None:
+                self._impl = self._fallback
+            else:
+                self._impl = numba.jit(**self._options)(self._fn)
+        return self._impl(*args)
+
+
+def jit(fallback: Optional[Callable] = None, **options) -> Callable:
+    """Decorate a function to be lazily compiled with numba.
+
+    Args:
+        fallback (Callable, optional): Pure NumPy implementation used when
+            numba is not available. Defaults to None (use the function itself)
+        **options: Options for `numba.jit`
+
+    Returns:
+        Callable: Decorator returning a `_LazyKernel`
+    """
+    return lambda fn: _LazyKernel(fn, fallback, **options)
 
 
 @jit(cache=True, nopython=True)
@@ -33,42 +109,78 @@ def cos_transformer(arr: np.ndarray, period: float) -> np.ndarray:
     return np.cos(arr / period * 2 * np.pi)
 
 
-@jit(cache=True, nopython=True)
-def _base_distances(arr: np.ndarray, base: float) -> np.ndarray:
-    """Calculate the distances between all array values and a single base.
-
-    0 and 1 are assumed to be at the same position.
-
-    Args:
-        arr (np.ndarray): (N, ) Scaled input data
-        base (float): Base of the RBF
+def _rbf_numpy(
+    arr: np.ndarray,
+    low: float,
+    high: float,
+    bases: np.ndarray,
+    width: float,
+    out: np.ndarray,
+) -> None:
+    """Apply the repeating radial basis functions with NumPy (see `_rbf_kernel`).
 
-    Returns:
-        np.ndarray: (N, ) Distances between each element of `arr` and `base`
+    Rows are processed in blocks, updating a single temporary in place.
     """
-    abs_diff_0 = np.abs(arr - base)
-    abs_diff_1 = 1 - np.abs(arr - base)
-    return np.minimum(abs_diff_0, abs_diff_1)
-
-
-@jit(cache=True, nopython=True, parallel=True)
-def _array_bases_distances(arr: np.ndarray, bases: np.ndarray) -> np.ndarray:
-    """Calculate the distances between all arrays and bases values.
+    block = 65536
+    for start in range(0, arr.shape[0], block):
+        x = (arr[start : start + block] - low) / (high - low)
+        d = np.abs(x[:, np.newaxis] - bases)
+        np.minimum(d, 1 - d, out=d)
+        d /= width
+        np.square(d, out=d)
+        np.negative(d, out=d)
+        np.exp(d, out=d)
+        out[start : start + block] = d
+
+
+@jit(fallback=_rbf_numpy, cache=True, nopython=True, parallel=True)
+def _rbf_kernel(
+    arr: np.ndarray,
+    low: float,
+    high: float,
+    bases: np.ndarray,
+    width: float,
+    out: np.ndarray,
+) -> None:
+    """Apply the repeating radial basis functions in a single pass.
+
+    For each input value, the kernel scales it to 0-1, computes the circular
+    distance from each base (0 and 1 are assumed to be at the same position),
+    and writes the Gaussian RBF directly into the output.
 
     Args:
-        arr (np.ndarray): (N, ) Scaled input data
+        arr (np.ndarray): (N, ) Input data
+        low (float): Value of the input mapped to 0
+        high (float): Value of the input mapped to 1
         bases (np.ndarray): (n_periods, ) Bases of the RBF
-
-    Returns:
-        np.ndarray: (N, n_periods) Distances between each element of
-            `arr` and each base
+        width (float): Width of the RBF
+        out (np.ndarray): (N, n_periods) Output buffer
     """
-    res = np.empty((arr.shape[0], bases.shape[0]), dtype=np.float)
+    scale = 1.0 / (high - low)
+    for i in prange(arr.shape[0]):
+        x = (arr[i] - low) * scale
+        for j in range(bases.shape[0]):
+            d = abs(x - bases[j])
+            d = min(d, 1 - d) / width
+            out[i, j] = np.exp(-(d * d))
 
-    for e, b in enumerate(bases):
-        res[:, e] = _base_distances(arr, b)
 
-    return res
+def warmup() -> None:
+    """Compile the numba kernels for all the signatures used by the model.
+
+    The kernels are cached on disk, so running this once at build time (e.g.
+    in the Docker image) spares each new process the compilation. Calling it
+    at startup instead moves the compilation out of the first request.
+    """
+    for dtype in (np.float64, np.float32):
+        out = np.empty((2, 5), dtype=dtype)
+        for arr in (np.zeros(2), np.zeros(2, dtype=np.int64)):
+            # Contiguous output and column slice of a larger feature matrix
+            _rbf_kernel(arr, 0.0, 1.0, np.zeros(5), 1.0, out)
+            _rbf_kernel(arr, 0.0, 1.0, np.zeros(3), 1.0, out[:, 1:4])
+    for arr in (np.zeros(2), np.zeros(2, dtype=np.int64)):
+        sin_transformer(arr, 1.0)
+        cos_transformer(arr, 1.0)
 
 
 class RepeatingRadialBasisFunction:
@@ -92,7 +204,12 @@ class RepeatingRadialBasisFunction:
     """
 
     def __init__(
-        self, n_periods: int, input_range: Optional[tuple] = None, width: float = 1.0
+        self,
+        n_periods: int,
+        input_range: Optional[tuple] = None,
+        width: float = 1.0,
+        lookup_table: bool = False,
+        dtype: str = "float64",
     ) -> None:
         """Initialise the transformer.
 
@@ -105,16 +222,24 @@ class RepeatingRadialBasisFunction:
                 Defaults to None
             width (float, optional): Width of the radial basis functions.
                 Defaults to 1
+            lookup_table (bool, optional): Whether to precompute the outputs
+                for all the integers in the input range. Integer inputs (e.g.
+                day of the year) are then transformed with a single gather.
+                Defaults to False
+            dtype (str, optional): Data type of the outputs, `float32` or
+                `float64`. Defaults to `float64`
         """
         self.n_periods = n_periods
         self.input_range = input_range
         self.width = width
+        self.lookup_table = lookup_table
+        self.dtype = dtype
 
-    def fit(self, X: Union[pd.Series, np.ndarray]) -> None:
+    def fit(self, X: Union["pd.Series", np.ndarray]) -> None:
         """Fit the transformer over an input column.
 
         Args:
-            X (Union[pd.Series, np.ndarray]): (N, ) Values for the
+            X (Union["pd.Series", np.ndarray]): (N, ) Values for the
             circular feature.
         """
         # If X is an array, ensure it has only one dimension
@@ -132,15 +257,30 @@ class RepeatingRadialBasisFunction:
         self._bases = np.linspace(0, 1, self.n_periods + 1)[:-1]
 
         # The curves should be narrower (wider) when there are more (fewer)
-        # periods
-        self.width /= self.n_periods
-
-    def transform(self, X: Union[pd.Series, np.ndarray]) -> np.ndarray:
+        # periods. The width is not modified, so refitting is idempotent
+        self._width = self.width / self.n_periods
+
+        # Precompute the outputs for all the integers in the input range
+        self._table = None
+        if self.lookup_table:
+            low, high = self.input_range
+            values = np.arange(np.ceil(low), np.floor(high) + 1)
+            self._table = np.empty((len(values), self.n_periods), dtype=self.dtype)
+            _rbf_kernel(
+                values, float(low), float(high), self._bases, self._width, self._table
+            )
+
+    @timed()
+    def transform(
+        self, X: Union["pd.Series", np.ndarray], out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
         """Transform the inputs by applying the Repeating RBFs.
 
         Args:
-            X (Union[pd.Series, np.ndarray]): (N, ) Values for the circular
+            X (Union["pd.Series", np.ndarray]): (N, ) Values for the circular
                 feature
+            out (np.ndarray, optional): (N, self.n_periods) Output buffer. If
+                not provided, a new one is allocated. Defaults to None
 
         Returns:
             np.ndarray: (N, self.n_periods) Transformed input values
@@ -148,16 +288,272 @@ class RepeatingRadialBasisFunction:
         # If X is an Numpy array, ensure it has only one dimension
         if isinstance(X, np.ndarray):
             assert len(X.shape) == 1
-            X_copy = X.copy()
         else:
-            X_copy = X.values.copy()
+            X = X.values
+
+        if out is None:
+            dtype = getattr(self, "dtype", "float64")
+            out = np.empty((X.shape[0], self.n_periods), dtype=dtype)
+        elif out.shape != (X.shape[0], self.n_periods):
+            raise ValueError(
+                f"Expected an output of shape {(X.shape[0], self.n_periods)} ."
+            )
+
+        # Integer inputs within the range are looked up in the precomputed table
+        table = getattr(self, "_table", None)
+        if table is not None and np.issubdtype(X.dtype, np.integer) and X.shape[0] > 0:
+            idx = X - int(np.ceil(self.input_range[0]))
+            if idx.min() >= 0 and idx.max() < table.shape[0]:
+                return np.take(table, idx, axis=0, out=out, mode="clip")
+
+        # Old pickled transformers stored the fitted width in `width`
+        width = getattr(self, "_width", self.width)
+        low, high = self.input_range
+        _rbf_kernel(X, float(low), float(high), self._bases, width, out)
+        return out
+
+
+def _category_codes(values: np.ndarray, categories: np.ndarray) -> np.ndarray:
+    """Map categorical values to the index of their category.
+
+    Args:
+        values (np.ndarray): (N, ) Categorical values
+        categories (np.ndarray): (n_categories, ) Known categories
 
-        # MinMax Scale to 0-1
-        X_copy = X_copy - self.input_range[0]
-        X_copy = X_copy / (self.input_range[1] - self.input_range[0])
+    Returns:
+        np.ndarray: (N, ) Index of the category of each value
+    """
+    order = np.argsort(categories)
+    sorted_cats = categories[order]
+    pos = np.minimum(np.searchsorted(sorted_cats, values), len(sorted_cats) - 1)
+    unknown = sorted_cats[pos] != values
+    if np.any(unknown):
+        raise ValueError(f"Unknown categories: {np.unique(values[unknown]).tolist()} .")
+    return order[pos]
+
+
+def day_of_year(dates: Union["pd.Series", np.ndarray]) -> np.ndarray:
+    """Compute the day of the year of an array of dates.
+
+    Args:
+        dates (Union["pd.Series", np.ndarray]): (N, ) Dates, either as
+            datetime objects or as ISO formatted strings
+
+    Returns:
+        np.ndarray: (N, ) Day of the year, starting from 1
+    """
+    days = np.asarray(dates, dtype="datetime64[D]")
+    return (days - days.astype("datetime64[Y]")).astype(np.int64) + 1
+
+
+class FeaturePipeline:
+    """Feature engineering pipeline for the avocado price model.
+
+    The pipeline standardises the numerical columns, encodes the `type` as a
+    binary column, one-hot encodes the `region` (dropping the first one),
+    encodes the month of the year with repeating radial basis functions, and
+    the week of the year with the sine / cosine transformations. All the
+    transformers are fitted at once, and every block is written directly into
+    a single preallocated output matrix.
+
+    The inputs can be a `pd.DataFrame` or any mapping from column names to
+    arrays (e.g. parsed JSON records), so the same pipeline can be applied
+    when serving the model.
+    """
+
+    def __init__(
+        self,
+        num_cols: Sequence[str],
+        type_col: str = "type",
+        region_col: str = "region",
+        date_col: str = "Date",
+        n_month_periods: int = 12,
+        week_period: float = 52,
+        dtype: str = "float64",
+    ) -> None:
+        """Initialise the pipeline.
+
+        Args:
+            num_cols (Sequence[str]): Names of the numerical columns
+            type_col (str, optional): Name of the type column. Defaults to `type`
+            region_col (str, optional): Name of the region column.
+                Defaults to `region`
+            date_col (str, optional): Name of the date column. Defaults to `Date`
+            n_month_periods (int, optional): Number of radial basis functions
+                for the month of the year. Defaults to 12
+            week_period (float, optional): Period of the sine / cosine
+                transformations of the week of the year. Defaults to 52
+            dtype (str, optional): Data type of the output, `float32` or
+                `float64`. Defaults to `float64`
+        """
+        self.num_cols = list(num_cols)
+        self.type_col = type_col
+        self.region_col = region_col
+        self.date_col = date_col
+        self.n_month_periods = n_month_periods
+        self.week_period = week_period
+        self.dtype = np.dtype(dtype)
+
+    def _set_layout(self) -> None:
+        """Define the position of each block in the output matrix."""
+        sizes = {
+            "num": len(self.num_cols),
+            "type": 1,
+            "region": len(self.regions) - 1,
+            "month": self.n_month_periods,
+            "week": 2,
+        }
+        self.blocks, start = {}, 0
+        for name, size in sizes.items():
+            self.blocks[name] = slice(start, start + size)
+            start += size
+        self.n_features = start
+        self.feature_names = (
+            self.num_cols
+            + [f"{self.type_col}_{self.types[1]}"]
+            + [f"{self.region_col}_{r}" for r in self.regions[1:]]
+            + [f"month_rbf_{i}" for i in range(self.n_month_periods)]
+            + ["week_sin", "week_cos"]
+        )
+
+    def fit(self, data: Mapping[str, np.ndarray]) -> "FeaturePipeline":
+        """Fit all the transformers at once.
+
+        Args:
+            data (Mapping[str, np.ndarray]): Training data, with the columns
+                used by the pipeline
+
+        Returns:
+            FeaturePipeline: The fitted pipeline
+        """
+        X_num = np.column_stack(
+            [np.asarray(data[c], dtype=float) for c in self.num_cols]
+        )
+        self.means = X_num.mean(axis=0)
+        self.stds = X_num.std(axis=0)
+        # Keep the categories in order of appearance
+        types, idx = np.unique(np.asarray(data[self.type_col]), return_index=True)
+        self.types = types[np.argsort(idx)]
+        regions, idx = np.unique(np.asarray(data[self.region_col]), return_index=True)
+        self.regions = regions[np.argsort(idx)]
+        if len(self.types) != 2:
+            raise ValueError(f"Expected 2 types, got {len(self.types)} instead.")
+
+        self.rbf_month = RepeatingRadialBasisFunction(
+            n_periods=self.n_month_periods, lookup_table=True, dtype=self.dtype.name
+        )
+        self.rbf_month.fit(day_of_year(data[self.date_col]))
+        self._set_layout()
+        return self
+
+    @timed()
+    def transform(
+        self, data: Mapping[str, np.ndarray], out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Transform the data into the model features.
 
-        # Calculate the distances of the input data from the bases
-        base_distances = _array_bases_distances(X_copy, self._bases)
+        Args:
+            data (Mapping[str, np.ndarray]): Data with the columns used by the
+                pipeline
+            out (np.ndarray, optional): (N, n_features) Output buffer. If not
+                provided, a new one is allocated. Defaults to None
 
-        # Create and return the Gaussian RBFs
-        return np.exp(-((base_distances / self.width) ** 2))
+        Returns:
+            np.ndarray: (N, n_features) Model features
+        """
+        doy = day_of_year(data[self.date_col])
+        N = doy.shape[0]
+        if out is None:
+            out = np.empty((N, self.n_features), dtype=self.dtype)
+        elif out.shape != (N, self.n_features):
+            raise ValueError(f"Expected an output of shape {(N, self.n_features)} .")
+
+        # Numerical columns, standardised in place
+        block = out[:, self.blocks["num"]]
+        for i, c in enumerate(self.num_cols):
+            block[:, i] = data[c]
+        block -= self.means
+        block /= self.stds
+
+        # Type as a binary column
+        type_codes = _category_codes(np.asarray(data[self.type_col]), self.types)
+        out[:, self.blocks["type"].start] = type_codes
+
+        # Region one-hot encoded by index, the first region is dropped
+        block = out[:, self.blocks["region"]]
+        block[...] = 0
+        region_codes = _category_codes(np.asarray(data[self.region_col]), self.regions)
+        rows = np.flatnonzero(region_codes)
+        block[rows, region_codes[rows] - 1] = 1
+
+        # Month and week of the year
+        self.rbf_month.transform(doy, out=out[:, self.blocks["month"]])
+        week = self.blocks["week"].start
+        out[:, week] = sin_transformer(doy.astype(float), self.week_period)
+        out[:, week + 1] = cos_transformer(doy.astype(float), self.week_period)
+        return out
+
+    def fit_transform(self, data: Mapping[str, np.ndarray]) -> np.ndarray:
+        """Fit the pipeline and transform the data.
+
+        Args:
+            data (Mapping[str, np.ndarray]): Training data
+
+        Returns:
+            np.ndarray: (N, n_features) Model features
+        """
+        return self.fit(data).transform(data)
+
+    def to_dict(self) -> dict:
+        """Get a JSON-serialisable representation of the fitted pipeline.
+
+        Returns:
+            dict: Parameters and fitted state of the pipeline
+        """
+        return {
+            "num_cols": self.num_cols,
+            "type_col": self.type_col,
+            "region_col": self.region_col,
+            "date_col": self.date_col,
+            "n_month_periods": self.n_month_periods,
+            "week_period": self.week_period,
+            "dtype": self.dtype.name,
+            "means": self.means.tolist(),
+            "stds": self.stds.tolist(),
+            "types": self.types.tolist(),
+            "regions": self.regions.tolist(),
+            "month_input_range": [float(v) for v in self.rbf_month.input_range],
+        }
+
+    @classmethod
+    def from_dict(cls, params: dict) -> "FeaturePipeline":
+        """Restore a fitted pipeline from its representation.
+
+        Args:
+            params (dict): Representation returned by `to_dict`
+
+        Returns:
+            FeaturePipeline: The fitted pipeline
+        """
+        pipeline = cls(
+            num_cols=params["num_cols"],
+            type_col=params["type_col"],
+            region_col=params["region_col"],
+            date_col=params["date_col"],
+            n_month_periods=params["n_month_periods"],
+            week_period=params["week_period"],
+            dtype=params["dtype"],
+        )
+        pipeline.means = np.array(params["means"])
+        pipeline.stds = np.array(params["stds"])
+        pipeline.types = np.array(params["types"])
+        pipeline.regions = np.array(params["regions"])
+        pipeline.rbf_month = RepeatingRadialBasisFunction(
+            n_periods=params["n_month_periods"],
+            input_range=tuple(params["month_input_range"]),
+            lookup_table=True,
+            dtype=params["dtype"],
+        )
+        pipeline.rbf_month.fit(np.empty(0))
+        pipeline._set_layout()
+        return pipeline
@@ -0,0 +1,252 @@
+import bisect
+import contextlib
+import functools
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+
+# Upper bounds of the buckets of the duration histograms, in seconds
+DURATION_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value) -> str:
+    """Escape the value of a label (backslashes, double quotes, and newlines)."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Format the labels of a sample in the Prometheus text format.
+
+    Args:
+        names (Sequence[str]): Names of the labels
+        values (Sequence[str]): Values of the labels
+        extra (str, optional): Additional formatted label. Defaults to ""
+
+    Returns:
+        str: Formatted labels, e.g. `{route="/recipes",le="0.1"}`
+    """
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter, optionally with labels."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        """Initialise the counter.
+
+        Args:
+            name (str): Name of the metric
+            help (str): Description of the metric
+            labels (Sequence[str], optional): Names of the labels. Defaults to ()
+        """
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increase the counter.
+
+        Args:
+            amount (float, optional): Increment. Defaults to 1
+            labels: Value of each label
+        """
+        key = tuple(labels[n] for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        """Format the samples of the counter."""
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in sorted(values):
+            yield f"{self.name}_total{_labels(self.labels, key)} {value}"
+
+
+class Histogram:
+    """Histogram of observations with cumulative buckets, optionally with labels."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DURATION_BUCKETS,
+    ) -> None:
+        """Initialise the histogram.
+
+        Args:
+            name (str): Name of the metric
+            help (str): Description of the metric
+            labels (Sequence[str], optional): Names of the labels. Defaults to ()
+            buckets (Sequence[float], optional): Upper bounds of the buckets.
+                Defaults to DURATION_BUCKETS
+        """
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Count of each bucket (plus +Inf), sum, and count of each label set
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        """Add an observation.
+
+        Args:
+            value (float): Observed value
+            labels: Value of each label
+        """
+        key = tuple(labels[n] for n in self.labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i] += 1
+            counts[-1] += value
+
+    def samples(self) -> Iterator[str]:
+        """Format the samples of the histogram."""
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in sorted(values):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _labels(self.labels, key, f'le="{le}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, key)} {counts[-1]}"
+            yield f"{self.name}_count{_labels(self.labels, key)} {cumulative}"
+
+
+class Gauge:
+    """Value read from a callback when the metrics are collected."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, callback: Callable[[], float]) -> None:
+        """Initialise the gauge.
+
+        Args:
+            name (str): Name of the metric
+            help (str): Description of the metric
+            callback (Callable[[], float]): Function returning the value
+        """
+        self.name = name
+        self.help = help
+        self.callback = callback
+
+    def samples(self) -> Iterator[str]:
+        """Format the sample of the gauge."""
+        yield f"{self.name} {self.callback()}"
+
+
+class Registry:
+    """Collection of metrics, exported in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        """Initialise an empty registry."""
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric, or get the metric already registered with its name.
+
+        Args:
+            metric (Union[Counter, Histogram, Gauge]): Metric
+
+        Returns:
+            Union[Counter, Histogram, Gauge]: The registered metric
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        """Format all the metrics in the Prometheus text format.
+
+        Returns:
+            str: Metrics, one sample per line
+        """
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+OPERATION_SECONDS = REGISTRY.register(
+    Histogram(
+        "operation_duration_seconds",
+        "Duration of the instrumented operations (model, preprocessing, serialisation).",
+        labels=("operation",),
+    )
+)
+
+
+@contextlib.contextmanager
+def timer(operation: str) -> Iterator[None]:
+    """Time a block of code in `operation_duration_seconds`.
+
+    Args:
+        operation (str): Name of the operation
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        OPERATION_SECONDS.observe(time.perf_counter() - start, operation=operation)
+
+
+def timed(operation: Optional[str] = None) -> Callable:
+    """Time every call of a function in `operation_duration_seconds`.
+
+    Args:
+        operation (Optional[str], optional): Name of the operation. Defaults
+            to the qualified name of the function (e.g. `LinearRegression.fit`)
+
+    Returns:
+        Callable: Decorator
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        name = operation or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                OPERATION_SECONDS.observe(time.perf_counter() - start, operation=name)
+
+        return wrapper
+
+    return decorator
@@ -1,18 +1,31 @@
 import re
 import hashlib
+import functools
+import threading
+from typing import Dict, Iterable, List, Set, Tuple
+
+from loguru import logger
+
+
+# Compiled once rather than on every call of `clean_string`
+_NON_ALPHA = re.compile(r"[^A-Za-z\s]")
+_WHITESPACE = re.compile(r"\s")
+# Strings that `clean_string` could have returned
+_CLEANED = re.compile(r"[a-z_]+")
 
 
 def clean_string(string: str) -> str:
     """Clean a string.
 
     Args:
-        string (str): _description_
+        string (str): String to be cleaned
 
     Returns:
-        str: _description_
+        str: Lowercase string with only letters, and underscores instead of
+            whitespaces
     """
-    res = re.sub(r"[^A-Za-z\s]", "", string)
-    res = re.sub(r"\s", "_", res)
+    res = _NON_ALPHA.sub("", string)
+    res = _WHITESPACE.sub("_", res)
     return res.lower()
 
 
@@ -26,4 +39,166 @@ def hash_string(string: str, lenght: int) -> int:
     Returns:
         int: Integer ID obtained by hashing the input string
     """
-    return int(hashlib.sha256(string.encode("utf-8")).hexdigest(), 16) % (10**lenght)
+    # Same value as parsing the hexadecimal digest, without the formatting
+    digest = hashlib.sha256(string.encode("utf-8")).digest()
+    return int.from_bytes(digest, "big") % (10**lenght)
+
+
+class NameIds:
+    """Derive the IDs of names, as `hash_string(clean_string(name), length)`.
+
+    The IDs of the most recent names are kept in an LRU cache, and `ids`
+    derives the IDs of many names at once, cleaning and hashing each distinct
+    name only once. The names written with `register` are also kept in a
+    registry of the cleaned name of each ID, which detects two different
+    names sharing an ID as soon as the second one is registered. The
+    registry grows with the number of distinct names, and can be turned off.
+    """
+
+    def __init__(
+        self, length: int = 18, cache_size: int = 65536, registry: bool = True
+    ) -> None:
+        """Initialise the cache and an empty registry.
+
+        Args:
+            length (int, optional): Length of the IDs. Defaults to 18
+            cache_size (int, optional): Maximum number of names whose ID is
+                cached. Defaults to 65536
+            registry (bool, optional): Whether to keep the registry of the
+                names and detect the collisions. Defaults to True
+        """
+        self.length = length
+        self.registry = registry
+        self._modulo = 10**length
+        self._cached_id = functools.lru_cache(maxsize=cache_size)(self._derive)
+        self._registry: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        # Distinct collisions, as (ID, registered name, new name)
+        self.collisions: Set[Tuple[int, str, str]] = set()
+
+    def _hash(self, clean_name: str) -> int:
+        """Hash a cleaned name.
+
+        Args:
+            clean_name (str): Cleaned name
+
+        Returns:
+            int: ID of the name
+        """
+        digest = hashlib.sha256(clean_name.encode("utf-8")).digest()
+        return int.from_bytes(digest, "big") % self._modulo
+
+    def _derive(self, name: str) -> Tuple[str, int]:
+        """Clean and hash a name.
+
+        Args:
+            name (str): Name
+
+        Returns:
+            Tuple[str, int]: Cleaned name and ID
+        """
+        clean_name = clean_string(name)
+        return clean_name, self._hash(clean_name)
+
+    def id(self, name: str) -> int:
+        """Get the ID of a name.
+
+        Args:
+            name (str): Name
+
+        Returns:
+            int: ID of the name
+        """
+        return self._cached_id(name)[1]
+
+    def lookup(self, name: str) -> int:
+        """Get the ID of a name, given either as is or already cleaned.
+
+        Cleaning is not idempotent, as the underscores are dropped, so a name
+        made only of lowercase letters and underscores (e.g. `olive_oil` in the
+        URLs of the entrypoints) is hashed without cleaning it again.
+
+        Args:
+            name (str): Name, or cleaned name
+
+        Returns:
+            int: ID of the name
+        """
+        if _CLEANED.fullmatch(name):
+            return self._hash(name)
+        return self.id(name)
+
+    def ids(self, names: Iterable[str], register: bool = False) -> List[int]:
+        """Get the IDs of many names, without going through the LRU cache.
+
+        Args:
+            names (Iterable[str]): Names
+            register (bool, optional): Whether to add the names to the
+                registry. Defaults to False
+
+        Returns:
+            List[int]: ID of each name
+        """
+        names = list(names)
+        derived = {name: self._derive(name) for name in dict.fromkeys(names)}
+        if register:
+            self._register(derived.values())
+        return [derived[name][1] for name in names]
+
+    def register(self, name: str) -> int:
+        """Get the ID of a name, and add it to the registry.
+
+        A collision, i.e. another cleaned name already registered with the
+        same ID, is logged and recorded in `collisions` the first time it
+        happens. Nothing is registered if the registry is turned off.
+
+        Args:
+            name (str): Name
+
+        Returns:
+            int: ID of the name
+        """
+        clean_name, name_id = self._cached_id(name)
+        self._register([(clean_name, name_id)])
+        return name_id
+
+    def _register(self, derived: Iterable[Tuple[str, int]]) -> None:
+        """Add cleaned names to the registry, and record the new collisions.
+
+        Args:
+            derived (Iterable[Tuple[str, int]]): Cleaned names and their IDs
+        """
+        if not self.registry:
+            return
+        collisions = []
+        with self._lock:
+            for clean_name, name_id in derived:
+                known = self._registry.setdefault(name_id, clean_name)
+                collision = (name_id, known, clean_name)
+                if known != clean_name and collision not in self.collisions:
+                    self.collisions.add(collision)
+                    collisions.append(collision)
+        for name_id, known, clean_name in collisions:
+            logger.warning(
+                f"The names {known} and {clean_name} have the same ID {name_id} ."
+            )
+
+    def name(self, name_id: int) -> str:
+        """Get the cleaned name registered with an ID.
+
+        Args:
+            name_id (int): ID
+
+        Returns:
+            str: Cleaned name, or None if the ID was not registered (or the
+                registry is turned off)
+        """
+        return self._registry.get(name_id)
+
+    def cache_info(self):
+        """Get the hits, misses, and size of the LRU cache."""
+        return self._cached_id.cache_info()
+
+
+# IDs of the recipes and the ingredients
+name_ids = NameIds(length=18)
@@ -0,0 +1,245 @@
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+from src.base.metrics import RegressionMetrics
+from src.base.model import LinearRegression
+from src.base.parallel import BLOCK_SIZE, SHARED, SharedPool
+
+
+def _statistics(idx: np.ndarray, weights: Optional[np.ndarray] = None) -> tuple:
+    """Compute the (weighted) sufficient statistics over a subset of rows.
+
+    Rows are gathered in blocks, so the memory used on top of the shared
+    arrays is bounded by the block size.
+
+    Args:
+        idx (np.ndarray): Indices of the rows to be included
+        weights (np.ndarray, optional): Weight of each row in `idx`. Defaults
+            to None (all ones)
+
+    Returns:
+        tuple: Number of samples, (p + 1, p + 1) Gram matrix, (p + 1, )
+            `X^T y`, and `y^T y`, all including the bias
+    """
+    X, y = SHARED["X"], SHARED["y"]
+    p = X.shape[1]
+    gram = np.zeros((p + 1, p + 1))
+    xty = np.zeros(p + 1)
+    yty = 0.0
+    n = 0.0
+    for start in range(0, len(idx), BLOCK_SIZE):
+        rows = idx[start : start + BLOCK_SIZE]
+        X_b, y_b = X[rows], y[rows]
+        w = (
+            np.ones(len(rows))
+            if weights is None
+            else weights[start : start + BLOCK_SIZE]
+        )
+        Xw = X_b * w[:, np.newaxis]
+        x_sum = Xw.sum(axis=0)
+        gram[0, 0] += w.sum()
+        gram[0, 1:] += x_sum
+        gram[1:, 0] += x_sum
+        gram[1:, 1:] += Xw.T @ X_b
+        xty[0] += w @ y_b
+        xty[1:] += Xw.T @ y_b
+        yty += (w * y_b) @ y_b
+        n += w.sum()
+    return n, gram, xty, yty
+
+
+def _model_from_statistics(stats: tuple, solver: str) -> LinearRegression:
+    """Solve a model from its sufficient statistics.
+
+    Args:
+        stats (tuple): Statistics returned by `_statistics`
+        solver (str): Solver of the model
+
+    Returns:
+        LinearRegression: Fitted model
+    """
+    model = LinearRegression(solver=solver)
+    model._n, model._gram, model._xty, model._yty = stats
+    model._solve_statistics()
+    return model
+
+
+def _fold_rows(fold: int, n_folds: int) -> np.ndarray:
+    """Get the indices of the rows in a fold.
+
+    Args:
+        fold (int): Index of the fold
+        n_folds (int): Total number of folds
+
+    Returns:
+        np.ndarray: Indices of the rows in the fold
+    """
+    perm = SHARED["perm"]
+    bounds = np.linspace(0, len(perm), n_folds + 1).astype(int)
+    return perm[bounds[fold] : bounds[fold + 1]]
+
+
+def _fold_statistics(fold: int, n_folds: int) -> tuple:
+    """Compute the sufficient statistics of a fold (worker task)."""
+    return _statistics(_fold_rows(fold, n_folds))
+
+
+def _evaluate_fold(fold: int, n_folds: int, train_stats: tuple, solver: str) -> tuple:
+    """Solve the model of a fold and evaluate it on the held out rows (worker task).
+
+    Args:
+        fold (int): Index of the held out fold
+        n_folds (int): Total number of folds
+        train_stats (tuple): Sufficient statistics of the training folds
+        solver (str): Solver of the model
+
+    Returns:
+        tuple: Metrics accumulator, coefficients, and t scores of the fold
+    """
+    model = _model_from_statistics(train_stats, solver)
+    metrics = RegressionMetrics()
+    rows = _fold_rows(fold, n_folds)
+    for start in range(0, len(rows), BLOCK_SIZE):
+        block = rows[start : start + BLOCK_SIZE]
+        metrics.update(SHARED["y"][block], SHARED["X"][block] @ model.W + model.b)
+    return metrics, model.coefficients, model.t_scores
+
+
+def _bootstrap_resample(seed: np.random.SeedSequence, solver: str) -> tuple:
+    """Fit the model on a bootstrap resample of the data (worker task).
+
+    The resample is represented by the number of times each row is drawn,
+    so it is never materialised.
+
+    Args:
+        seed (np.random.SeedSequence): Seed of the resample
+        solver (str): Solver of the model
+
+    Returns:
+        tuple: Coefficients and t scores of the resample
+    """
+    N = SHARED["y"].shape[0]
+    counts = np.bincount(np.random.default_rng(seed).integers(0, N, N), minlength=N)
+    rows = np.flatnonzero(counts)
+    model = _model_from_statistics(
+        _statistics(rows, counts[rows].astype(float)), solver
+    )
+    return model.coefficients, model.t_scores
+
+
+def _percentile_ci(samples: np.ndarray, confidence: float) -> np.ndarray:
+    """Compute percentile confidence intervals over the first axis.
+
+    Args:
+        samples (np.ndarray): (n_samples, p) Samples of the statistic
+        confidence (float): Confidence level, e.g. 0.95
+
+    Returns:
+        np.ndarray: (2, p) Lower and upper bounds of the intervals
+    """
+    tail = (1 - confidence) / 2 * 100
+    return np.nanpercentile(samples, [tail, 100 - tail], axis=0)
+
+
+def cross_validate(
+    X: np.ndarray,
+    y: np.ndarray,
+    n_folds: int = 5,
+    solver: str = "auto",
+    n_jobs: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> dict:
+    """Run a k-fold cross validation of a `LinearRegression` model.
+
+    The sufficient statistics of each fold are computed once, in parallel.
+    The training statistics of a fold are then the total minus those of the
+    held out fold, so no fold is ever refitted from the raw data.
+
+    Args:
+        X (np.ndarray): (N, p) Input data. Memory-mapped arrays are shared
+            with the workers through their file
+        y (np.ndarray): (N, ) Target variable
+        n_folds (int, optional): Number of folds. Defaults to 5
+        solver (str, optional): Solver of the models. Defaults to `auto`
+        n_jobs (int, optional): Number of worker processes, None for one per
+            CPU and 1 to run in the current process. Defaults to None
+        seed (int, optional): Seed used to shuffle the rows. Defaults to None
+
+    Returns:
+        dict: Per-fold `rmse`, `mae`, and `r2` (n_folds, ), `coefficients` and
+            `t_scores` (n_folds, p + 1), and the `pooled` metrics over all the
+            held out predictions
+    """
+    perm = np.random.default_rng(seed).permutation(X.shape[0])
+    folds = list(range(n_folds))
+    with SharedPool(n_jobs, X=X, y=y, perm=perm) as pool:
+        fold_stats = pool.map(_fold_statistics, folds, [n_folds] * n_folds)
+        total = [sum(s[i] for s in fold_stats) for i in range(4)]
+        train_stats = [
+            tuple(t - s for t, s in zip(total, stats)) for stats in fold_stats
+        ]
+        results = pool.map(
+            _evaluate_fold, folds, [n_folds] * n_folds, train_stats, [solver] * n_folds
+        )
+
+    metrics, coefs, t_scores = zip(*results)
+    folds = [m.result() for m in metrics]
+    rmses = np.array([f["rmse"] for f in folds])
+    logger.info(
+        f"Cross validation RMSE: {np.mean(rmses):,.4f} +/- {np.std(rmses):,.4f} ."
+    )
+    pooled = RegressionMetrics()
+    for m in metrics:
+        pooled.merge(m)
+    return {
+        "rmse": rmses,
+        "mae": np.array([f["mae"] for f in folds]),
+        "r2": np.array([f["r2"] for f in folds]),
+        "pooled": pooled.result(),
+        "coefficients": np.stack(coefs),
+        "t_scores": np.stack(t_scores),
+    }
+
+
+def bootstrap(
+    X: np.ndarray,
+    y: np.ndarray,
+    n_resamples: int = 200,
+    confidence: float = 0.95,
+    solver: str = "auto",
+    n_jobs: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> dict:
+    """Compute bootstrap percentile confidence intervals for a `LinearRegression` model.
+
+    Args:
+        X (np.ndarray): (N, p) Input data. Memory-mapped arrays are shared
+            with the workers through their file
+        y (np.ndarray): (N, ) Target variable
+        n_resamples (int, optional): Number of bootstrap resamples.
+            Defaults to 200
+        confidence (float, optional): Confidence level of the intervals.
+            Defaults to 0.95
+        solver (str, optional): Solver of the models. Defaults to `auto`
+        n_jobs (int, optional): Number of worker processes, None for one per
+            CPU and 1 to run in the current process. Defaults to None
+        seed (int, optional): Seed of the resamples. Defaults to None
+
+    Returns:
+        dict: `coefficients` and `t_scores` (n_resamples, p + 1) of each
+            resample, and their (2, p + 1) intervals `coefficients_ci` and
+            `t_scores_ci`
+    """
+    seeds = np.random.SeedSequence(seed).spawn(n_resamples)
+    with SharedPool(n_jobs, X=X, y=y) as pool:
+        results = pool.map(_bootstrap_resample, seeds, [solver] * n_resamples)
+
+    coefs, t_scores = (np.stack(r) for r in zip(*results))
+    return {
+        "coefficients": coefs,
+        "t_scores": t_scores,
+        "coefficients_ci": _percentile_ci(coefs, confidence),
+        "t_scores_ci": _percentile_ci(t_scores, confidence),
+    }
@@ -0,0 +1,83 @@
+import os
+import unittest
+
+# The app reads its configuration when imported: an in-memory SQLite database
+# with the schema created on start-up, no shared cache, and no model
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ["MODEL_PATH"] = ""
+os.environ.pop("CACHE_REDIS_URL", None)
+
+from sqlalchemy import event  # noqa: E402
+
+from src.api.app import app  # noqa: E402
+from src.api.database import db  # noqa: E402
+from src.base.utils import clean_string  # noqa: E402
+
+
+def _letters(i: int) -> str:
+    """Spell a number with letters, as `clean_string` drops the digits."""
+    return chr(97 + i // 26) + chr(97 + i % 26)
+
+
+def _recipe(name: str, n_ingredients: int, quantity: float = 1) -> dict:
+    """Create the payload of a recipe with its own new ingredients."""
+    return {
+        "name": name,
+        "method": "Mix everything.",
+        "ingredients": [
+            {
+                "name": f"{name} ingredient {_letters(i)}",
+                "unit_of_measure": "g",
+                "quantity": quantity + i,
+            }
+            for i in range(n_ingredients)
+        ],
+    }
+
+
+class TestRecipeStatements(unittest.TestCase):
+    """The writes of a recipe run a fixed number of SQL statements."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Count the statements run against the database."""
+        cls.client = app.test_client()
+        cls.statements = []
+        with app.app_context():
+            cls.engine = db.engine
+        event.listen(cls.engine, "before_cursor_execute", cls._count)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Stop counting the statements."""
+        event.remove(cls.engine, "before_cursor_execute", cls._count)
+
+    @classmethod
+    def _count(cls, conn, cursor, statement, parameters, context, executemany):
+        cls.statements.append(statement)
+
+    def _write(self, method: str, name: str, payload: dict) -> int:
+        """Send a write of a recipe and count its statements."""
+        self.statements.clear()
+        response = self.client.open(
+            f"/recipes/{clean_string(name)}", method=method, json=payload
+        )
+        self.assertLess(response.status_code, 300, response.get_data(as_text=True))
+        return len(self.statements)
+
+    def _post_and_put(self, name: str, n_ingredients: int) -> tuple:
+        """Create a recipe, then update its quantities and add an ingredient."""
+        post = self._write("POST", name, _recipe(name, n_ingredients))
+        payload = _recipe(name, n_ingredients + 1, quantity=2)
+        put = self._write("PUT", name, payload)
+        return post, put
+
+    def test_statements_do_not_depend_on_the_ingredients(self):
+        """POST and PUT run as many statements for 5 ingredients as for 40."""
+        small = self._post_and_put("Small salad", 5)
+        large = self._post_and_put("Large stew", 40)
+        self.assertEqual(small, large)
+
+
+if __name__ == "__main__":
+    unittest.main()